@@ -4,6 +4,7 @@ from requests.packages.urllib3.exceptions import InsecureRequestWarning
 from dotenv import load_dotenv
 import os
 import logging
+import threading
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -202,4 +203,93 @@ def add_dhcp_reservation_known_ip(mac, seat, ip, dhcp_server_id):
         return None
 
 def ip_in_range(ip, start_ip, end_ip):
-    return ip_to_int(start_ip) <= ip_to_int(ip) <= ip_to_int(end_ip)
\ No newline at end of file
+    return ip_to_int(start_ip) <= ip_to_int(ip) <= ip_to_int(end_ip)
+
+def get_dhcp_network(dhcp_server_id):
+    """
+    Network settings a DHCP server hands out, for configuring a seat statically.
+    
+    Returns:
+        dict: prefix_length, gateway and dns_servers, or None if the server config could not be read
+    """
+    dhcp_config = get_dhcp_server_config(dhcp_server_id)
+    if not dhcp_config:
+        return None
+    gateway = dhcp_config.get('default-gateway')
+    netmask = dhcp_config.get('netmask', '255.255.255.0')
+    if dhcp_config.get('dns-service') == 'specify':
+        dns_servers = [dhcp_config.get(f'dns-server{i}') for i in range(1, 5)]
+        dns_servers = [server for server in dns_servers if server and server != '0.0.0.0']
+    else:
+        # 'default' and 'local' both point clients at the FortiGate interface, which is the gateway
+        dns_servers = [gateway] if gateway else []
+    return {
+        'prefix_length': bin(ip_to_int(netmask)).count('1'),
+        'gateway': gateway,
+        'dns_servers': dns_servers
+    }
+
+# MAC to IP index built from the DHCP lease monitor and the ARP table, refreshed in bulk when stale
+mac_index_ttl = int(os.getenv('FGT_MAC_INDEX_TTL', 10))  # Seconds before the tables are fetched again
+mac_index = {}  # Format: {mac: {'ip': str, 'source': 'dhcp' or 'arp', 'interface': str}}
+mac_index_refreshed_at = 0.0
+mac_index_lock = threading.Lock()
+
+def get_dhcp_leases():
+    url = f"{FGT_ADDR}/api/v2/monitor/system/dhcp"
+    response = requests.get(url, headers=headers, params=params, verify=False)
+    if response.status_code == 200:
+        return response.json().get('results', [])
+    logger.error(f"Failed to get DHCP leases. Status code: {response.status_code}")
+    return None
+
+def get_arp_table():
+    url = f"{FGT_ADDR}/api/v2/monitor/network/arp"
+    response = requests.get(url, headers=headers, params=params, verify=False)
+    if response.status_code == 200:
+        return response.json().get('results', [])
+    logger.error(f"Failed to get ARP table. Status code: {response.status_code}")
+    return None
+
+def refresh_mac_index():
+    """Fetch the DHCP leases and the ARP table once and index them by MAC. Leases win over ARP entries."""
+    global mac_index, mac_index_refreshed_at
+    leases = get_dhcp_leases()
+    arp_entries = get_arp_table()
+    if leases is None and arp_entries is None:
+        return mac_index
+    
+    index = {}
+    for entry in arp_entries or []:
+        if entry.get('mac') and entry.get('ip'):
+            index[entry['mac'].lower()] = {'ip': entry['ip'], 'source': 'arp', 'interface': entry.get('interface')}
+    for lease in leases or []:
+        if lease.get('mac') and lease.get('ip') and lease.get('status', 'leased') == 'leased':
+            index[lease['mac'].lower()] = {'ip': lease['ip'], 'source': 'dhcp', 'interface': lease.get('interface')}
+    
+    mac_index = index
+    mac_index_refreshed_at = time.time()
+    logger.debug(f"MAC index refreshed: {len(leases or [])} DHCP leases, {len(arp_entries or [])} ARP entries")
+    return mac_index
+
+def lookup_ips_by_mac(macs):
+    """
+    Resolve MAC addresses to IPs from the DHCP lease and ARP tables.
+    
+    Args:
+        macs: MAC addresses, in any case
+        
+    Returns:
+        dict: {mac: {'ip', 'source', 'interface'}} for the MACs that were found, keyed as given
+    """
+    with mac_index_lock:
+        if time.time() - mac_index_refreshed_at > mac_index_ttl:
+            try:
+                refresh_mac_index()
+            except Exception as e:
+                logger.error(f"Failed to refresh MAC index: {str(e)}")
+        index = mac_index
+    return {mac: index[mac.lower()] for mac in macs if mac.lower() in index}
+
+def lookup_ip_by_mac(mac):
+    return lookup_ips_by_mac([mac]).get(mac)
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from pve import state_db
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+LEADER_LEASE = 'leader'
+lease_ttl = int(os.getenv('LEADER_LEASE_TTL', 30))  # Seconds a leader may stay silent before another worker takes over
+holder_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+leader = False
+last_renewed = 0.0
+acquire_callbacks = []  # Coroutine functions awaited whenever this worker becomes leader
+election_task = None
+
+def _init_leases():
+    with state_db() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                name TEXT PRIMARY KEY,
+                holder TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                acquired_at REAL NOT NULL
+            )
+        """)
+
+def try_acquire_lease(name, ttl):
+    """
+    Take or renew a named lease. Succeeds if the lease is free, expired or already held by this worker.
+
+    Args:
+        name: Lease name
+        ttl: Seconds until the lease expires unless renewed
+
+    Returns:
+        bool: True if this worker holds the lease now
+    """
+    now = time.time()
+    with state_db() as conn:
+        # A single statement, so two workers can never both win the same lease
+        cursor = conn.execute("""
+            INSERT INTO leases (name, holder, expires_at, acquired_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET
+                holder = excluded.holder,
+                expires_at = excluded.expires_at,
+                acquired_at = CASE WHEN leases.holder = excluded.holder THEN leases.acquired_at ELSE excluded.acquired_at END
+            WHERE leases.holder = excluded.holder OR leases.expires_at < ?
+        """, (name, holder_id, now + ttl, now, now))
+        return cursor.rowcount > 0
+
+def release_lease(name):
+    """Give up a lease held by this worker so another one can take it right away."""
+    with state_db() as conn:
+        conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder_id))
+
+def is_leader():
+    # Step down on our own if the lease could not be renewed in time, another worker may already have it
+    return leader and time.time() - last_renewed < lease_ttl
+
+def on_acquire(callback):
+    acquire_callbacks.append(callback)
+
+async def _renew():
+    global leader, last_renewed
+    try:
+        acquired = await asyncio.to_thread(try_acquire_lease, LEADER_LEASE, lease_ttl)
+    except Exception as e:
+        logger.warning(f"Could not renew leader lease: {str(e)}")
+        return
+    if acquired:
+        last_renewed = time.time()
+        if not leader:
+            leader = True
+            logger.info(f"Worker {holder_id} became leader")
+            for callback in acquire_callbacks:
+                try:
+                    await callback()
+                except Exception as e:
+                    logger.error(f"Error in leader callback: {str(e)}")
+    elif leader:
+        leader = False
+        logger.warning(f"Worker {holder_id} lost leadership")
+
+async def _election_loop():
+    while True:
+        await asyncio.sleep(lease_ttl / 3)
+        await _renew()
+
+async def start():
+    """Try to become leader now and keep trying, or renewing, in the background."""
+    global election_task
+    await asyncio.to_thread(_init_leases)
+    await _renew()
+    election_task = asyncio.create_task(_election_loop())
+    logger.info(f"Worker {holder_id} started as {'leader' if leader else 'follower'}")
+
+async def stop():
+    global leader
+    if election_task:
+        election_task.cancel()
+        await asyncio.gather(election_task, return_exceptions=True)
+    if leader:
+        leader = False
+        await asyncio.to_thread(release_lease, LEADER_LEASE)
+        logger.info(f"Worker {holder_id} released leadership")
+
+def get_status():
+    with state_db() as conn:
+        row = conn.execute("SELECT * FROM leases WHERE name = ?", (LEADER_LEASE,)).fetchone()
+    return {
+        'worker': holder_id,
+        'is_leader': is_leader(),
+        'leader': row['holder'] if row and row['expires_at'] > time.time() else None,
+        'leader_since': row['acquired_at'] if row else None,
+        'lease_ttl': lease_ttl
+    }
@@ -1,6 +1,7 @@
 from fastapi import FastAPI, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from pywebio.platform.fastapi import asgi_app
-from models import RecordA, TrainingSeat, ProxyHost, ProxyHostCreate, VM, CreateUserInput, CreateUserRequest, AddTagsRequest, LinkedClone, AddUserToGroupInput, GuacamoleConnectionRequest, AddConnectionToUserRequest, AddUserToConnectionGroupRequest, CreateAuthentikUserInput, AddAuthentikUserToGroupInput, DHCPRemovalRequest, DHCPReservationRequest, DHCPReservationKnownIPRequest, ConnectionGroupCreate
+from models import RecordA, TrainingSeat, ProxyHost, ProxyHostCreate, VM, CreateUserInput, CreateUserRequest, AddTagsRequest, LinkedClone, SeatPlacementRequest, VmidBlockRequest, CloneBatchRequest, SeatIpRequest, SeatMacRequest, SeatAddressRequest, SpareClaimRequest, AddUserToGroupInput, GuacamoleConnectionRequest, AddConnectionToUserRequest, AddUserToConnectionGroupRequest, CreateAuthentikUserInput, AddAuthentikUserToGroupInput, DHCPRemovalRequest, DHCPReservationRequest, DHCPReservationKnownIPRequest, ConnectionGroupCreate
 import cf
 import pve
 import guacamole
@@ -8,17 +9,52 @@ import lldap
 import authentik
 import nginx_proxy_manager
 import fortigate
+import scheduler
+import leader
 from pywebio_app import pywebio_main
 import logging
 import traceback
 from datetime import datetime
 import requests
 import json
+from contextlib import asynccontextmanager
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    for name, cron, func, catch_up, leader_only in pve.scheduled_jobs():
+        scheduler.add_job(name, cron, func, catch_up=catch_up, leader_only=leader_only)
+    await leader.start()
+    await scheduler.start()
+    yield
+    await scheduler.stop()
+    await leader.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+# Scheduler endpoints
+@app.get("/api/v1/scheduler/jobs")
+def list_scheduler_jobs():
+    return {"jobs": scheduler.list_jobs()}
+
+@app.get("/api/v1/scheduler/history")
+def get_scheduler_history(job: str = None, limit: int = Query(50, ge=1, le=1000)):
+    """Most recent job runs with trigger, duration and outcome."""
+    return {"runs": scheduler.job_history(job, limit)}
+
+@app.get("/api/v1/scheduler/leader")
+def get_scheduler_leader():
+    """Which worker currently runs the leader-only jobs."""
+    return leader.get_status()
+
+@app.post("/api/v1/scheduler/jobs/{name}/run")
+async def run_scheduler_job(name: str):
+    result = await scheduler.trigger_job(name)
+    if "error" in result:
+        raise HTTPException(status_code=404 if "not found" in result["error"] else 409, detail=result["error"])
+    return result
 
 # Cloudflare endpoints
 @app.post("/api/v1/dns/remove-record-a")
@@ -34,32 +70,117 @@ def list_seats():
     return cf.list_seats()
 
 # PVE endpoints
+def _placement_template(training):
+    if not training:
+        return None
+    template = pve.find_template_for_training(training)
+    if not template:
+        raise HTTPException(status_code=404, detail=f"No template found for training: {training}")
+    return template
+
 @app.get("/api/v1/pve/evaluate-nodes")
-async def get_best_node():
+def get_best_node(training: str = Query(None)):
+    template = _placement_template(training)
     try:
-        best_node = pve.evaluate_nodes()
-        if best_node:
-            return {"best_node": best_node}
-        else:
-            raise HTTPException(status_code=404, detail="No suitable node found")
+        scores = pve.score_nodes(template=template)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+    best_node = pve.best_scored_node(scores)
+    if best_node:
+        return {"best_node": best_node, "scores": scores}
+    else:
+        raise HTTPException(status_code=404, detail="No suitable node found")
     
 @app.get("/api/v1/pve/evaluate-nodes-for-date/{target_date}")
-async def get_best_node_for_date(target_date: str):
+def get_best_node_for_date(target_date: str, training: str = Query(None)):
     try:
         # Validate the date format
-        datetime.strptime(target_date, "%d-%m-%Y")
-        
-        best_node = pve.evaluate_nodes_for_date(target_date)
-        if best_node:
-            return {"best_node": best_node, "target_date": target_date}
-        else:
-            raise HTTPException(status_code=404, detail="No suitable node found for the given date")
+        date_obj = datetime.strptime(target_date, "%d-%m-%Y").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Please use DD-MM-YYYY")
+    template = _placement_template(training)
+    try:
+        scores = pve.score_nodes(date_obj, template)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+    best_node = pve.best_scored_node(scores)
+    if best_node:
+        return {"best_node": best_node, "target_date": target_date, "scores": scores}
+    else:
+        raise HTTPException(status_code=404, detail="No suitable node found for the given date")
+
+@app.get("/api/v1/pve/peak-load/{start_date}/{end_date}")
+def get_peak_load(start_date: str, end_date: str):
+    """Get the peak committed memory of every node across a date range."""
+    try:
+        start = datetime.strptime(start_date, "%d-%m-%Y").date()
+        end = datetime.strptime(end_date, "%d-%m-%Y").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Please use DD-MM-YYYY")
+    if end < start:
+        raise HTTPException(status_code=400, detail="End date cannot be before start date")
+    try:
+        return {"start_date": start_date, "end_date": end_date, "nodes": pve.peak_load(start, end)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+@app.get("/api/v1/pve/memory-forecast")
+def get_memory_forecast(days: int = Query(None, ge=1)):
+    """Get the committed memory per node and day for capacity planning."""
+    try:
+        return pve.get_memory_forecast_matrix(days)
+    except Exception as e:
+        logger.error(f"Error building memory forecast: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+@app.post("/api/v1/pve/place-seats")
+def place_seats(request: SeatPlacementRequest):
+    """Assign a batch of seats to nodes across the whole training window."""
+    try:
+        start = datetime.strptime(request.start_date, "%d-%m-%Y").date()
+        end = datetime.strptime(request.end_date, "%d-%m-%Y").date()
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Please use DD-MM-YYYY")
+    if end < start:
+        raise HTTPException(status_code=400, detail="End date cannot be before start date")
+    try:
+        result = pve.place_seats(request.vm_names, request.template_ids, start, end)
     except Exception as e:
+        logger.error(f"Error placing seats: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    return result
+
+@app.get("/api/v1/pve/storage-capacity")
+def get_storage_capacity():
+    """Get usage, thin pool metadata and estimated clone growth of the VM storages per node."""
+    try:
+        return {
+            "nodes": pve.get_storage_model(force_refresh=True),
+            "usage_limit": pve.storage_usage_limit,
+            "metadata_limit": pve.thin_metadata_limit
+        }
+    except Exception as e:
+        logger.error(f"Error getting storage capacity: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/v1/pve/placement-reservations")
+def get_placement_reservations():
+    """List memory claims of placements that are planned but not yet cloned."""
+    try:
+        reservations = pve.list_placement_reservations()
+        return {"reservations": reservations, "total": len(reservations)}
+    except Exception as e:
+        logger.error(f"Error listing placement reservations: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/api/v1/pve/placement-reservations/{vm_name}")
+def release_placement_reservation(vm_name: str):
+    """Release the memory claim of a seat that will not be deployed."""
+    if pve.release_placement_reservation(vm_name):
+        return {"message": f"Placement reservation for {vm_name} released"}
+    raise HTTPException(status_code=404, detail=f"No placement reservation found for {vm_name}")
 
 @app.post("/api/v1/pve/create-training-seat")
 def create_training_seat(vm: VM):
@@ -70,7 +191,7 @@ def remove_training_seat(seat: TrainingSeat):
     return pve.remove_training_seat(seat)
 
 @app.post("/api/v1/pve/remove-vm")
-async def remove_vm(vm: VM):
+def remove_vm(vm: VM):
     try:
         result = pve.remove_vm(vm)
         return {"message": result}
@@ -82,7 +203,7 @@ def list_vms():
     return pve.list_vms()
 
 @app.get("/api/v1/pve/find-seat-ip/{vm_name}")
-async def get_seat_ip(vm_name: str):
+def get_seat_ip(vm_name: str):
     ip_address = pve.find_seat_ip(vm_name)
     if ip_address:
         return {"vm_name": vm_name, "ip_address": ip_address}
@@ -90,15 +211,36 @@ async def get_seat_ip(vm_name: str):
         raise HTTPException(status_code=404, detail="VM not found or IP not configured")
     
 @app.get("/api/v1/pve/find-seat-ip-pve/{vm_name}")
-async def get_seat_ip_pve(vm_name: str):
+def get_seat_ip_pve(vm_name: str):
     ip_address = pve.find_seat_ip_pve(vm_name)
     if ip_address:
         return {"vm_name": vm_name, "ip_address": ip_address}
     else:
         raise HTTPException(status_code=404, detail="VM not found or IP not configured")
 
+@app.post("/api/v1/pve/seat-ips")
+def discover_seat_ips(request: SeatIpRequest):
+    """Discover the IPs of many seats concurrently. Unknown IPs are null and keep being discovered in the background."""
+    return {"seats": pve.discover_seat_ips(request.vm_names, min(request.wait, 300))}
+
+@app.get("/api/v1/pve/seat-ip/{vm_name}/wait")
+def wait_for_seat_ip(vm_name: str, timeout: float = Query(120, ge=0, le=300)):
+    """Wait until the seat's guest agent reports an IP."""
+    ip_address = pve.wait_for_seat_ip(vm_name, timeout)
+    if ip_address:
+        return {"vm_name": vm_name, "ip_address": ip_address}
+    raise HTTPException(status_code=404, detail=f"No IP for {vm_name} within {timeout:.0f}s")
+
+@app.get("/api/v1/pve/seat-ready/{vm_name}/wait")
+def wait_for_guest_ready(vm_name: str, timeout: float = Query(240, ge=0, le=300)):
+    """Wait until the seat's guest is up, e.g. before the first snapshot or shutdown of a cloud-init seat."""
+    seat = pve.wait_for_guest_ready(vm_name, timeout)
+    if seat:
+        return {"vm_name": vm_name, "ip_address": seat}
+    raise HTTPException(status_code=404, detail=f"Guest of {vm_name} not ready within {timeout:.0f}s")
+
 @app.post("/api/v1/pve/add-tags-to-vm")
-async def add_tags_to_vm_endpoint(request: AddTagsRequest):
+def add_tags_to_vm_endpoint(request: AddTagsRequest):
     logger.debug(f"Received request to add tags: {request.dict()}")
     try:
         result = pve.add_tags_to_vm(request)
@@ -113,7 +255,99 @@ async def add_tags_to_vm_endpoint(request: AddTagsRequest):
 
 @app.post("/api/v1/pve/create-linked-clone")
 def create_vm_from_template(vm: LinkedClone):
-    return pve.create_linked_clone(vm.name, vm.template_id, vm.node)
+    return pve.create_linked_clone(vm.name, vm.template_id, vm.node, vm.owner, vm.mac, vm.ip_address, vm.dhcp_server_id)
+
+@app.get("/api/v1/pve/tasks/{upid}")
+async def await_task(upid: str, timeout: float = Query(30, ge=0, le=300)):
+    """Long-poll a Proxmox task: returns as soon as it has finished, or after the timeout with status 'running'."""
+    try:
+        return await run_in_threadpool(pve.await_task, upid, timeout)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/v1/pve/clone-batch")
+def clone_batch(request: CloneBatchRequest):
+    """Clone many VMs in parallel, limited per node and per storage."""
+    jobs = pve.clone_batch([clone.dict() for clone in request.clones])
+    failed = [job for job in jobs if job["status"] != "done"]
+    return {
+        "message": f"{len(jobs) - len(failed)} clones completed, {len(failed)} failed",
+        "clones": jobs
+    }
+
+@app.get("/api/v1/pve/clone-scheduler")
+def get_clone_scheduler_stats():
+    return pve.get_clone_scheduler_stats()
+
+@app.get("/api/v1/pve/clone-jobs/{job_id}")
+def get_clone_job(job_id: str):
+    job = pve.get_clone_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Clone job {job_id} not found")
+    return job
+
+@app.post("/api/v1/pve/seats/{vm_name}/clean-snapshot")
+def take_clean_snapshot(vm_name: str, cohort: str = Query(None)):
+    """Snapshot a freshly deployed seat as the state it is reset to."""
+    result = pve.take_clean_snapshot(vm_name, cohort)
+    if "error" in result:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
+
+@app.post("/api/v1/pve/seats/{vm_name}/reset")
+def reset_seat(vm_name: str):
+    """Roll a seat back to its clean snapshot, keeping its MAC, IP, tags and external accounts."""
+    result = pve.reset_seat(vm_name)
+    if "error" in result:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
+
+@app.post("/api/v1/pve/cohorts/{cohort}/reset")
+def reset_cohort(cohort: str):
+    """Reset all seats snapshotted for a cohort in parallel across nodes."""
+    vm_names = pve.get_cohort_seats(cohort)
+    if not vm_names:
+        raise HTTPException(status_code=404, detail=f"No seats with a clean snapshot for cohort {cohort}")
+    return pve.reset_seats(vm_names)
+
+@app.get("/api/v1/pve/spare-pools")
+def get_spare_pools():
+    """Target size and ready and cloning spares per template and node."""
+    return {"pools": pve.get_spare_pools()}
+
+@app.post("/api/v1/pve/spare-seats/claim")
+def claim_spare_seats(request: SpareClaimRequest):
+    """Claim ready spares for seats. Seats without a spare are listed as unclaimed and need a regular clone."""
+    claimed, unclaimed = {}, []
+    for vm_name, node in request.seats.items():
+        spare = pve.claim_spare_seat(vm_name, request.template_ids, node)
+        if spare:
+            claimed[vm_name] = spare
+        else:
+            unclaimed.append(vm_name)
+    return {"claimed": claimed, "unclaimed": unclaimed}
+
+@app.post("/api/v1/pve/vmid-blocks")
+def allocate_vmid_block(request: VmidBlockRequest):
+    """Reserve a contiguous range of VMIDs for a deployment."""
+    if request.count < 1:
+        raise HTTPException(status_code=400, detail="Count must be at least 1")
+    result = pve.allocate_vmid_block(request.owner, request.count)
+    if "error" in result:
+        raise HTTPException(status_code=409, detail=result["error"])
+    return result
+
+@app.get("/api/v1/pve/vmid-blocks")
+def list_vmid_blocks():
+    return {"vmid_blocks": pve.list_vmid_blocks()}
+
+@app.delete("/api/v1/pve/vmid-blocks/{owner}")
+def release_vmid_block(owner: str):
+    """Release a deployment's VMID block, returning its unused IDs."""
+    result = pve.release_vmid_block(owner)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No VMID block found for {owner}")
+    return result
 
 @app.post("/api/v1/pve/start-vm/{vm_name}")
 def start_vm(vm_name: str):
@@ -123,25 +357,36 @@ def start_vm(vm_name: str):
     return result
 
 @app.post("/api/v1/pve/run-check-now")
-async def run_pve_check_now():
-    """Run all checks immediately."""
+def run_pve_check_now(dry_run: bool = False):
+    """Run all checks immediately in one lifecycle sweep. With dry_run the plan is returned without executing it."""
     try:
-        pve.run_check_now()
+        report = pve.run_check_now(dry_run)
         return {
-            "message": "All PVE checks completed successfully",
-            "steps": [
-                "Schedule updates completed",
-                "VM start checks completed",
-                "Deletion checks completed"
-            ],
+            "message": "Lifecycle plan computed" if dry_run else "All PVE checks completed successfully",
+            "report": report,
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
         logger.error(f"Error running PVE checks: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/v1/pve/boot-storm")
+def get_boot_state():
+    """Boot concurrency limit, booting VMs and queued starts per node while a start run is active."""
+    return pve.get_boot_state()
+
+@app.get("/api/v1/pve/boot-times")
+def get_boot_time_stats():
+    """Learned time from start to guest agent and to first IP per template, in seconds."""
+    return pve.get_boot_time_stats()
+
+@app.get("/api/v1/pve/start-plan")
+def get_start_plan(days: int = Query(1, ge=0, le=30)):
+    """Just-in-time start times of stopped seats whose training starts within the given number of days."""
+    return {"starts": pve.get_start_plan(days)}
+
 @app.post("/api/v1/pve/run-start-check")
-async def run_vm_start_check():
+def run_vm_start_check():
     """Run only the VM start check process."""
     try:
         result = pve.check_vm_start_status()
@@ -156,7 +401,7 @@ async def run_vm_start_check():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/v1/pve/run-deletion-check")
-async def run_deletion_check():
+def run_deletion_check():
     """Run only the VM deletion check process."""
     try:
         result = pve.remove_due_vms()
@@ -166,10 +411,10 @@ async def run_deletion_check():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/v1/pve/update-schedules")
-async def update_vm_schedules():
-    """Update deletion schedules for all VMs with end tags."""
+def update_vm_schedules(full: bool = True):
+    """Update deletion schedules for all VMs with end tags. With full=false only changed VMs are processed."""
     try:
-        result = pve.update_all_vm_schedules()
+        result = pve.sync_vm_schedules(full=full)
         return {
             "message": "VM schedules updated successfully",
             "updated_vms": result["updated"],
@@ -181,7 +426,7 @@ async def update_vm_schedules():
         raise HTTPException(status_code=500, detail=f"Failed to update VM schedules: {str(e)}")
 
 @app.get("/api/v1/pve/scheduled-deletions")
-async def get_scheduled_deletions():
+def get_scheduled_deletions():
     """Get the current list of scheduled deletions."""
     try:
         result = pve.get_scheduled_deletions()
@@ -196,7 +441,7 @@ async def get_scheduled_deletions():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/v1/pve/scheduled-deletions")
-async def clear_scheduled_deletions_endpoint():
+def clear_scheduled_deletions_endpoint():
     try:
         result = pve.clear_scheduled_deletions()
         return result
@@ -208,27 +453,77 @@ async def clear_scheduled_deletions_endpoint():
 def shutdown_vm(vm_name: str):
     return pve.shutdown_vm(vm_name)
 
+@app.post("/api/v1/pve/hibernate-vm/{vm_name}")
+def hibernate_vm(vm_name: str):
+    """Suspend a VM to disk. Starting it again resumes it instead of booting."""
+    result = pve.hibernate_vm(vm_name)
+    if "error" in result:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
+
 @app.post("/api/v1/pve/remove-due")
-async def remove_due_vms():
+def remove_due_vms():
     """Remove all VMs that are past their deletion date."""
     try:
         result = pve.remove_due_vms()
-        return result
     except Exception as e:
         logger.error(f"Error removing due VMs: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    if "error" in result:
+        raise HTTPException(status_code=409, detail=result["error"])
+    return result
 
 @app.post("/api/v1/pve/remove-all-scheduled")
-async def remove_all_scheduled_vms():
+def remove_all_scheduled_vms():
     try:
         result = pve.remove_all_scheduled_vms()
-        return result
     except Exception as e:
         logger.error(f"Error removing all scheduled VMs: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    if "error" in result:
+        raise HTTPException(status_code=409, detail=result["error"])
+    return result
+
+@app.get("/api/v1/pve/removal-progress")
+def get_removal_progress():
+    """Progress of the current or last removal run."""
+    return pve.get_removal_progress()
+
+@app.post("/api/v1/pve/seat-macs")
+def assign_seat_macs(request: SeatMacRequest):
+    """Assign stable MAC addresses to seats before they are cloned, so DHCP can be reserved up front."""
+    macs = {vm_name: pve.assign_seat_mac(vm_name) for vm_name in request.vm_names}
+    missing = [vm_name for vm_name, mac in macs.items() if mac is None]
+    if missing:
+        raise HTTPException(status_code=409, detail=f"No free MAC address for: {', '.join(missing)}")
+    return {"macs": macs}
+
+@app.post("/api/v1/pve/seat-addresses")
+def allocate_seat_addresses(request: SeatAddressRequest):
+    """Reserve IPs for cloud-init seats before they are cloned. Seats that could not get one are listed under errors."""
+    addresses, errors = {}, {}
+    for vm_name, seat in request.seats.items():
+        result = pve.allocate_seat_address(vm_name, seat, request.dhcp_server_id)
+        if "error" in result:
+            errors[vm_name] = result["error"]
+        else:
+            addresses[vm_name] = result
+    return {"addresses": addresses, "errors": errors}
+
+@app.delete("/api/v1/pve/seat-addresses/{vm_name}")
+def release_seat_address(vm_name: str):
+    """Release the MAC, IP and DHCP reservation of a seat that ended up without a VM."""
+    try:
+        result = pve.release_seat_address(vm_name)
+    except Exception as e:
+        logger.error(f"Error releasing the address of seat {vm_name}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if "error" in result:
+        raise HTTPException(status_code=409, detail=result["error"])
+    return result
 
 @app.get("/api/v1/pve/get-vm-mac-address/{vm_name}")
-async def get_vm_mac_address_endpoint(vm_name: str):
+def get_vm_mac_address_endpoint(vm_name: str):
     try:
         mac_address = pve.get_vm_mac_address(vm_name)
         if mac_address:
@@ -240,7 +535,7 @@ async def get_vm_mac_address_endpoint(vm_name: str):
         raise HTTPException(status_code=500, detail=f"Failed to get MAC address: {str(e)}")
 
 @app.get("/api/v1/pve/vm-mac-addresses")
-async def get_vm_mac_addresses():
+def get_vm_mac_addresses():
     """Get MAC addresses for all VMs."""
     try:
         mac_addresses = pve.get_all_vm_mac_addresses()
@@ -626,6 +921,14 @@ async def validate_dhcp_reservation(seat: str, dhcp_server_id: int):
         logger.error(f"Error validating DHCP reservation: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to validate DHCP reservation: {str(e)}")
 
+@app.get("/api/v1/fortigate/ip-by-mac/{mac}")
+def get_ip_by_mac(mac: str):
+    """Resolve a MAC address from the DHCP lease and ARP tables."""
+    entry = fortigate.lookup_ip_by_mac(mac)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"No DHCP lease or ARP entry for MAC: {mac}")
+    return {"mac": mac, **entry}
+
 @app.get("/api/v1/fortigate/get-dhcp-server-config/{dhcp_server_id}")
 async def get_dhcp_server_config(dhcp_server_id: int):
     try:
@@ -74,6 +74,38 @@ class LinkedClone(BaseModel):
     name: str
     template_id: int
     node: str
+    owner: Optional[str] = None  # Take the VMID from this owner's reserved block
+    mac: Optional[str] = None  # Set net0 to this MAC right after cloning
+    ip_address: Optional[str] = None  # Static cloud-init IP, allocated with /pve/seat-addresses
+    dhcp_server_id: Optional[int] = None  # DHCP server the IP was reserved on, for netmask and gateway
+
+class CloneBatchRequest(BaseModel):
+    clones: List[LinkedClone]
+
+class SeatMacRequest(BaseModel):
+    vm_names: List[str]
+
+class SeatAddressRequest(BaseModel):
+    seats: Dict[str, str]  # Format: {vm_name: DHCP reservation description}
+    dhcp_server_id: int
+
+class SpareClaimRequest(BaseModel):
+    seats: Dict[str, str]  # Format: {vm_name: preferred node}
+    template_ids: Dict[str, int]
+
+class SeatIpRequest(BaseModel):
+    vm_names: List[str]
+    wait: float = 0  # Seconds to wait for IPs that are not known yet
+
+class VmidBlockRequest(BaseModel):
+    owner: str
+    count: int
+
+class SeatPlacementRequest(BaseModel):
+    vm_names: List[str]
+    template_ids: Dict[str, int]
+    start_date: str
+    end_date: str
     
 class AddUserToGroupInput(BaseModel):
     userId: str
@@ -8,9 +8,16 @@ import time
 import threading
 import json
 import logging
-from datetime import datetime, date, timedelta
-import schedule
+from datetime import datetime, date, time as dt_time, timedelta
 import re
+import sqlite3
+from contextlib import contextmanager
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import uuid
+import hashlib
+import numpy as np
 import fortigate
 
 # Set up logging
@@ -47,20 +54,13 @@ def authenticate_proxmox():
 # Authenticate initially
 authenticate_proxmox()
 
-# Function to refresh the authentication ticket periodically
+# Refresh the authentication ticket periodically, scheduled as a job in every worker
 def refresh_ticket():
-    while True:
-        time.sleep(7200 - 600)  # Sleep for 1 hour and 50 minutes
-        try:
-            authenticate_proxmox()
-            print("Proxmox API ticket refreshed")
-        except Exception as e:
-            print(f"Failed to refresh Proxmox API ticket: {e}")
-
-# Start the ticket refresh thread
-ticket_refresh_thread = threading.Thread(target=refresh_ticket)
-ticket_refresh_thread.daemon = True
-ticket_refresh_thread.start()
+    try:
+        authenticate_proxmox()
+        print("Proxmox API ticket refreshed")
+    except Exception as e:
+        print(f"Failed to refresh Proxmox API ticket: {e}")
 
 # Dynamically get all PVE_NODE variables from .env
 proxmox_nodes = []
@@ -73,18 +73,319 @@ while True:
         break
     index += 1
 
-vms_scheduled_for_deletion = {}  # Format: {vm_name: {'id': vmid, 'end_date': date_obj, 'deletion_date': date_obj}}
-deletion_lock = threading.Lock()
+# Local SQLite database for state that has to survive a restart
+state_db_path = os.getenv('PVE_STATE_DB', 'pve_state.db')
 
-def parse_date_from_tag(tag):
-    """Parse date from tag string in format 'end-DD-MM-YYYY'"""
+@contextmanager
+def state_db():
+    """Open a connection to the state database, committing on success and rolling back on error."""
+    conn = sqlite3.connect(state_db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous=NORMAL")
     try:
-        date_str = tag[4:]  # Remove 'end-' prefix
-        return datetime.strptime(date_str, '%d-%m-%Y').date()
-    except ValueError:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def _init_state_db():
+    # WAL lets the API and the background threads read while another connection writes
+    with state_db() as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+
+# Cluster-wide locks and concurrency slots, held as leases in the state database so they apply across uvicorn workers
+slot_lease_ttl = 60  # Seconds a slot outlives a worker that died holding it; slots in use are renewed
+slot_poll_interval = 0.5  # Seconds between attempts while waiting for a slot
+held_slots = {}  # Format: {lease_id: slot}, slots held by this process
+held_slots_lock = threading.Lock()
+slot_renewer = None
+
+def _init_slot_leases():
+    with state_db() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS slot_leases (
+                lease_id TEXT PRIMARY KEY,
+                slot TEXT NOT NULL,
+                acquired_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_slot_leases ON slot_leases (slot)")
+
+def _renew_slots():
+    while True:
+        time.sleep(slot_lease_ttl / 3)
+        with held_slots_lock:
+            lease_ids = list(held_slots)
+        if not lease_ids:
+            continue
+        try:
+            with state_db() as conn:
+                conn.executemany("UPDATE slot_leases SET expires_at = ? WHERE lease_id = ?",
+                                 [(time.time() + slot_lease_ttl, lease_id) for lease_id in lease_ids])
+        except Exception as e:
+            logger.warning(f"Could not renew {len(lease_ids)} slot leases: {str(e)}")
+
+def acquire_slot(slot, limit=1, wait=True):
+    """
+    Take one of limit concurrent slots of a named resource, shared by every worker on the state database.
+    
+    Args:
+        slot: Name of the resource, e.g. 'clone:node:pve1'
+        limit: Number of holders allowed at the same time
+        wait: Wait until a slot is free instead of giving up right away
+        
+    Returns:
+        str: Lease ID to release the slot with, None if no slot was free and wait is False
+    """
+    global slot_renewer
+    while True:
+        now = time.time()
+        with state_db() as conn:
+            # An immediate transaction, so counting the holders and adding one cannot interleave with another worker
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM slot_leases WHERE expires_at <= ?", (now,))
+            held = conn.execute("SELECT COUNT(*) FROM slot_leases WHERE slot = ?", (slot,)).fetchone()[0]
+            lease_id = uuid.uuid4().hex if held < limit else None
+            if lease_id:
+                conn.execute("INSERT INTO slot_leases VALUES (?, ?, ?, ?)", (lease_id, slot, now, now + slot_lease_ttl))
+        if lease_id:
+            with held_slots_lock:
+                held_slots[lease_id] = slot
+                if slot_renewer is None:
+                    slot_renewer = threading.Thread(target=_renew_slots, name='slot-renewer', daemon=True)
+                    slot_renewer.start()
+            return lease_id
+        if not wait:
+            return None
+        time.sleep(slot_poll_interval)
+
+def release_slot(lease_id):
+    with held_slots_lock:
+        held_slots.pop(lease_id, None)
+    with state_db() as conn:
+        conn.execute("DELETE FROM slot_leases WHERE lease_id = ?", (lease_id,))
+
+@contextmanager
+def cluster_slot(slot, limit=1):
+    """Hold one of limit slots of a named resource across all workers, waiting until one is free."""
+    lease_id = acquire_slot(slot, limit)
+    try:
+        yield lease_id
+    finally:
+        release_slot(lease_id)
+
+# VM inventory cache, filled from a single /cluster/resources call
+inventory_ttl = int(os.getenv('PVE_INVENTORY_TTL', 30))  # Seconds before the inventory is considered stale
+vm_inventory = {}  # Format: {vmid: {'vmid': int, 'name': str, 'node': str, 'status': str, 'tags': str, 'maxmem': int, ...}}
+vm_inventory_by_name = {}  # Format: {vm_name: inventory entry}
+cluster_vmids = set()  # IDs in use by any guest, including containers
+inventory_refreshed_at = 0.0
+inventory_lock = threading.Lock()
+
+def refresh_vm_inventory():
+    """
+    Rebuild the VM inventory from a single /cluster/resources?type=vm call.
+    
+    Returns:
+        dict: The refreshed inventory keyed by VM ID
+    """
+    with inventory_lock:
+        return _refresh_vm_inventory_locked()
+
+def _refresh_vm_inventory_locked():
+    global vm_inventory, vm_inventory_by_name, cluster_vmids, inventory_refreshed_at
+    
+    resources = proxmox.cluster.resources.get(type='vm')
+    by_id = {}
+    by_name = {}
+    for resource in sorted(resources, key=lambda r: r.get('vmid', 0)):
+        if resource.get('type') != 'qemu':
+            continue
+        entry = dict(resource)
+        entry.setdefault('name', '')
+        entry.setdefault('tags', '')
+        by_id[entry['vmid']] = entry
+        # Keep the first match for duplicate names, like the old node-by-node search did
+        by_name.setdefault(entry['name'], entry)
+    
+    # Swap in new dicts so readers holding the old ones never see a half-built inventory
+    vm_inventory = by_id
+    vm_inventory_by_name = by_name
+    cluster_vmids = {resource['vmid'] for resource in resources if 'vmid' in resource}
+    inventory_refreshed_at = time.time()
+    
+    # Drop cached configs of VMs that no longer exist
+    with config_cache_lock:
+        for vmid in [vmid for vmid in vm_config_cache if vmid not in by_id]:
+            del vm_config_cache[vmid]
+    logger.debug(f"VM inventory refreshed: {len(by_id)} VMs")
+    return vm_inventory
+
+def get_vm_inventory(force_refresh=False):
+    """
+    Return the VM inventory keyed by VM ID, refreshing it when the TTL has expired.
+    
+    Args:
+        force_refresh: Refresh from the cluster even if the cached inventory is still fresh
+        
+    Returns:
+        dict: {vmid: inventory entry}
+    """
+    with inventory_lock:
+        if force_refresh or time.time() - inventory_refreshed_at > inventory_ttl:
+            _refresh_vm_inventory_locked()
+        return vm_inventory
+
+def lookup_vm(vm_name):
+    """Return the inventory entry for a VM name, or None if the VM does not exist."""
+    get_vm_inventory()
+    vm = vm_inventory_by_name.get(vm_name)
+    if vm is None:
+        # The VM may have been created since the last refresh
+        get_vm_inventory(force_refresh=True)
+        vm = vm_inventory_by_name.get(vm_name)
+    return vm
+
+def invalidate_vm_inventory():
+    """Mark the inventory as stale so the next lookup refreshes it."""
+    global inventory_refreshed_at
+    with inventory_lock:
+        inventory_refreshed_at = 0.0
+
+# VM config cache, validated against the inventory
+config_cache_ttl = int(os.getenv('PVE_CONFIG_CACHE_TTL', 600))  # Seconds before a cached config is re-read
+config_fetch_workers = int(os.getenv('PVE_CONFIG_FETCH_WORKERS', 8))  # Parallel config requests per sweep
+vm_config_cache = {}  # Format: {vmid: {'config': dict, 'fingerprint': tuple, 'fetched_at': float}}
+config_cache_lock = threading.Lock()
+
+def _config_fingerprint(vm):
+    """
+    Inventory fields that change with the VM's location and most config edits. A changed NIC does not
+    show up in the inventory, so MAC lookups read the config fresh.
+    """
+    return (vm['node'], vm['name'], vm['tags'], vm.get('maxmem'), vm.get('maxdisk'))
+
+def _fetch_vm_config(vm):
+    try:
+        config = proxmox.nodes(vm['node']).qemu(vm['vmid']).config.get()
+    except Exception as e:
+        logger.error(f"Error getting config for VM {vm['name']} (ID: {vm['vmid']}): {str(e)}")
         return None
+    return {
+        'config': config,
+        'fingerprint': _config_fingerprint(vm),
+        'fetched_at': time.time()
+    }
 
-def update_vm_schedule(vm_name: str, vm_id: int, end_date: date) -> bool:
+def get_vm_configs(vms):
+    """
+    Return the configs for a list of inventory entries.
+    
+    Cached configs are reused while their inventory fingerprint matches and the TTL
+    has not expired. Everything else is fetched in parallel with a bounded worker pool.
+    
+    Args:
+        vms: Inventory entries as returned by get_vm_inventory() or lookup_vm()
+        
+    Returns:
+        dict: {vmid: config} for every VM whose config could be read
+    """
+    now = time.time()
+    configs = {}
+    stale = []
+    
+    with config_cache_lock:
+        for vm in vms:
+            cached = vm_config_cache.get(vm['vmid'])
+            if (cached and cached['fingerprint'] == _config_fingerprint(vm)
+                    and now - cached['fetched_at'] < config_cache_ttl):
+                configs[vm['vmid']] = cached['config']
+            else:
+                stale.append(vm)
+    
+    if stale:
+        logger.debug(f"Fetching {len(stale)} VM configs ({len(configs)} served from cache)")
+        with ThreadPoolExecutor(max_workers=max(1, min(config_fetch_workers, len(stale)))) as executor:
+            fetched = list(executor.map(_fetch_vm_config, stale))
+        
+        with config_cache_lock:
+            for vm, entry in zip(stale, fetched):
+                if entry is None:
+                    continue
+                vm_config_cache[vm['vmid']] = entry
+                configs[vm['vmid']] = entry['config']
+    
+    return configs
+
+def get_vm_config(vm, fresh=False):
+    """Return the config for a single inventory entry, or None if it could not be read. fresh skips the cache."""
+    if fresh:
+        invalidate_vm_config(vm['vmid'])
+    return get_vm_configs([vm]).get(vm['vmid'])
+
+def invalidate_vm_config(vmid):
+    """Forget the cached config of a VM after writing to it."""
+    with config_cache_lock:
+        vm_config_cache.pop(vmid, None)
+
+DELETION_GRACE_DAYS = 3  # VMs are deleted this many days after their end date
+schedule_sync_interval = int(os.getenv('PVE_SCHEDULE_SYNC_INTERVAL', 5))  # Minutes between incremental schedule syncs
+
+def _init_deletion_schedule():
+    with state_db() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS deletion_schedule (
+                vm_name TEXT PRIMARY KEY,
+                vmid INTEGER NOT NULL,
+                node TEXT,
+                end_date TEXT NOT NULL,
+                deletion_date TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_deletion_schedule_date ON deletion_schedule (deletion_date)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_deletion_schedule_node ON deletion_schedule (node)")
+        count = conn.execute("SELECT COUNT(*) FROM deletion_schedule").fetchone()[0]
+    logger.info(f"Loaded deletion schedule with {count} VMs")
+
+def _schedule_entry(row):
+    return {
+        'id': row['vmid'],
+        'node': row['node'],
+        'end_date': date.fromisoformat(row['end_date']),
+        'deletion_date': date.fromisoformat(row['deletion_date'])
+    }
+
+def get_deletion_schedule(due_by: date = None, node: str = None):
+    """
+    Read the deletion schedule.
+    
+    Args:
+        due_by: Only VMs whose deletion date is on or before this date
+        node: Only VMs on this node
+        
+    Returns:
+        dict: {vm_name: {'id': vmid, 'node': str, 'end_date': date, 'deletion_date': date}}
+    """
+    query = "SELECT * FROM deletion_schedule WHERE 1=1"
+    args = []
+    if due_by is not None:
+        query += " AND deletion_date <= ?"
+        args.append(due_by.isoformat())
+    if node is not None:
+        query += " AND node = ?"
+        args.append(node)
+    with state_db() as conn:
+        rows = conn.execute(query + " ORDER BY deletion_date, vm_name", args).fetchall()
+    return {row['vm_name']: _schedule_entry(row) for row in rows}
+
+def unschedule_vm_deletion(vm_name: str) -> bool:
+    """Drop a VM from the deletion schedule. Returns True if it was scheduled."""
+    with state_db() as conn:
+        return conn.execute("DELETE FROM deletion_schedule WHERE vm_name = ?", (vm_name,)).rowcount > 0
+
+def update_vm_schedule(vm_name: str, vm_id: int, end_date: date, node: str = None) -> bool:
     """
     Updates or adds a VM to the deletion schedule without attempting to delete it.
     Only sets or updates the deletion_date based on the end_date.
@@ -93,29 +394,33 @@ def update_vm_schedule(vm_name: str, vm_id: int, end_date: date) -> bool:
         vm_name: Name of the VM
         vm_id: ID of the VM
         end_date: The end date from the VM's tag
+        node: Node the VM runs on
         
     Returns:
         bool: True if schedule was updated, False if there was an error
     """
     try:
-        deletion_date = end_date + timedelta(days=3)
-        
-        with deletion_lock:
-            if vm_name in vms_scheduled_for_deletion:
-                current_end_date = vms_scheduled_for_deletion[vm_name]['end_date']
-                if current_end_date != end_date:
-                    logger.info(f"Updating deletion schedule for VM {vm_name} due to end date change "
-                              f"(Old: {current_end_date.strftime('%d-%m-%Y')}, "
-                              f"New: {end_date.strftime('%d-%m-%Y')})")
-            else:
+        deletion_date = end_date + timedelta(days=DELETION_GRACE_DAYS)
+        changed = True
+        
+        with state_db() as conn:
+            row = conn.execute("SELECT end_date FROM deletion_schedule WHERE vm_name = ?", (vm_name,)).fetchone()
+            if row is None:
                 logger.info(f"Adding VM {vm_name} to deletion schedule")
+            elif row['end_date'] != end_date.isoformat():
+                logger.info(f"Updating deletion schedule for VM {vm_name} due to end date change "
+                          f"(Old: {date.fromisoformat(row['end_date']).strftime('%d-%m-%Y')}, "
+                          f"New: {end_date.strftime('%d-%m-%Y')})")
+            else:
+                changed = False
+            conn.execute("""
+                INSERT INTO deletion_schedule (vm_name, vmid, node, end_date, deletion_date, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (vm_name) DO UPDATE SET vmid = excluded.vmid, node = excluded.node,
+                    end_date = excluded.end_date, deletion_date = excluded.deletion_date, updated_at = excluded.updated_at
+            """, (vm_name, vm_id, node, end_date.isoformat(), deletion_date.isoformat(), time.time()))
             
-            vms_scheduled_for_deletion[vm_name] = {
-                'id': vm_id,
-                'end_date': end_date,
-                'deletion_date': deletion_date
-            }
-            
+        if changed:
             logger.info(f"VM {vm_name} (ID: {vm_id}) scheduled - End date: {end_date.strftime('%d-%m-%Y')}, "
                        f"Deletion date: {deletion_date.strftime('%d-%m-%Y')}")
         return True
@@ -124,88 +429,126 @@ def update_vm_schedule(vm_name: str, vm_id: int, end_date: date) -> bool:
         logger.error(f"Error updating deletion schedule for VM {vm_name}: {str(e)}")
         return False
 
-def update_all_vm_schedules():
+def _init_vm_tag_state():
+    with state_db() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS vm_tag_state (
+                vmid INTEGER PRIMARY KEY,
+                vm_name TEXT NOT NULL,
+                node TEXT,
+                tags TEXT NOT NULL,
+                seen_at REAL NOT NULL
+            )
+        """)
+
+def sync_vm_schedules(full=False):
     """
-    Check all VMs for end tags and update their deletion schedules.
-    Only handles schedule updates, no deletions.
+    Bring the deletion schedule in line with the VMs' end tags.
+    
+    The name, node and tags last seen for every VM are kept in the state database, so only
+    VMs that changed, appeared or vanished since the previous sync are processed.
+    
+    Args:
+        full: Process every VM and drop schedule entries of VMs that no longer exist
+        
+    Returns:
+        dict: updated, removed and total_scheduled
     """
-    logger.info("Starting VM schedule update process")
-    today = date.today()
-    logger.info(f"Checking VMs for date: {today.strftime('%d-%m-%Y')}")
+    inventory = get_vm_inventory(force_refresh=True)
+    names = {vm['name'] for vm in inventory.values()}
+    with state_db() as conn:
+        seen = {row['vmid']: row for row in conn.execute("SELECT * FROM vm_tag_state")}
+    scheduled = get_deletion_schedule()
     
-    valid_vms = set()
     updated_schedules = []
     removed_schedules = []
+    changed_state = []
     
-    # Scan all VMs across all nodes
-    for node in proxmox.nodes.get():
-        logger.info(f"Checking node: {node['node']}")
-        for vm in proxmox.nodes(node['node']).qemu.get():
-            logger.info(f"Checking VM: {vm['name']} (ID: {vm['vmid']})")
-            valid_vms.add(vm['name'])
-            
-            if 'tags' in vm and vm['tags']:
-                tags = vm['tags'].split(';')
-                logger.info(f"VM {vm['name']} has tags: {tags}")
-                
-                # Look for end date tag
-                end_date = None
-                for tag in tags:
-                    tag = tag.strip()
-                    if tag.startswith('end-'):
-                        end_date = parse_date_from_tag(tag)
-                
-                # Update or remove from schedule based on end date
-                if end_date:
-                    if update_vm_schedule(vm['name'], vm['vmid'], end_date):
-                        updated_schedules.append({
-                            'vm_name': vm['name'],
-                            'vm_id': vm['vmid'],
-                            'end_date': end_date.strftime('%d-%m-%Y'),
-                            'deletion_date': (end_date + timedelta(days=3)).strftime('%d-%m-%Y')
-                        })
-                elif vm['name'] in vms_scheduled_for_deletion:
-                    with deletion_lock:
-                        logger.info(f"Removing {vm['name']} from deletion schedule as end tag was removed")
-                        removed_schedules.append(vm['name'])
-                        del vms_scheduled_for_deletion[vm['name']]
-    
-    # Clean up non-existent VMs
-    with deletion_lock:
-        scheduled_vms = list(vms_scheduled_for_deletion.keys())
-        for vm_name in scheduled_vms:
-            if vm_name not in valid_vms:
-                logger.info(f"Removing {vm_name} from deletion schedule as it no longer exists")
-                removed_schedules.append(vm_name)
-                del vms_scheduled_for_deletion[vm_name]
-    
-    logger.info(f"Schedule update completed: {len(updated_schedules)} updated, "
-           f"{len(removed_schedules)} removed, "
-           f"{len(vms_scheduled_for_deletion)} total scheduled")
+    def unschedule(vm_name, reason):
+        if vm_name in scheduled and vm_name not in removed_schedules:
+            logger.info(f"Removing {vm_name} from deletion schedule as {reason}")
+            unschedule_vm_deletion(vm_name)
+            removed_schedules.append(vm_name)
+    
+    for vm in inventory.values():
+        tags = vm['tags'] or ''
+        previous = seen.get(vm['vmid'])
+        if not full and previous is not None and \
+                (previous['vm_name'], previous['node'], previous['tags']) == (vm['name'], vm['node'], tags):
+            continue
+        logger.debug(f"Syncing schedule of VM {vm['name']} (ID: {vm['vmid']}), tags: {tags}")
+        changed_state.append((vm['vmid'], vm['name'], vm['node'], tags, time.time()))
+        
+        if previous is not None and previous['vm_name'] != vm['name'] and previous['vm_name'] not in names:
+            unschedule(previous['vm_name'], f"it was renamed to {vm['name']}")
+        
+        end_date = parse_lifecycle_tags(tags)[1]
+        if end_date:
+            current = scheduled.get(vm['name'])
+            if full or current is None or (current['id'], current['node'], current['end_date']) != (vm['vmid'], vm['node'], end_date):
+                if update_vm_schedule(vm['name'], vm['vmid'], end_date, vm['node']):
+                    updated_schedules.append({
+                        'vm_name': vm['name'],
+                        'vm_id': vm['vmid'],
+                        'end_date': end_date.strftime('%d-%m-%Y'),
+                        'deletion_date': (end_date + timedelta(days=DELETION_GRACE_DAYS)).strftime('%d-%m-%Y')
+                    })
+        else:
+            unschedule(vm['name'], "end tag was removed")
+    
+    vanished = [vmid for vmid in seen if vmid not in inventory]
+    for vmid in vanished:
+        if seen[vmid]['vm_name'] not in names:
+            unschedule(seen[vmid]['vm_name'], "it no longer exists")
+    if full:
+        # Also covers entries that were scheduled before their VM's tags were tracked
+        for vm_name in scheduled:
+            if vm_name not in names:
+                unschedule(vm_name, "it no longer exists")
+    
+    with state_db() as conn:
+        conn.executemany("INSERT OR REPLACE INTO vm_tag_state (vmid, vm_name, node, tags, seen_at) VALUES (?, ?, ?, ?, ?)",
+                         changed_state)
+        conn.executemany("DELETE FROM vm_tag_state WHERE vmid = ?", [(vmid,) for vmid in vanished])
+        total_scheduled = conn.execute("SELECT COUNT(*) FROM deletion_schedule").fetchone()[0]
+    
+    summary = (f"Schedule sync completed: {len(changed_state)} of {len(inventory)} VMs changed, "
+               f"{len(updated_schedules)} updated, {len(removed_schedules)} removed, {total_scheduled} total scheduled")
+    if updated_schedules or removed_schedules or full:
+        logger.info(summary)
+    else:
+        logger.debug(summary)
     
     return {
         "updated": updated_schedules,
         "removed": removed_schedules,
-        "total_scheduled": len(vms_scheduled_for_deletion)
+        "total_scheduled": total_scheduled
     }
 
+def update_all_vm_schedules():
+    """
+    Check all VMs for end tags and update their deletion schedules.
+    Only handles schedule updates, no deletions.
+    """
+    logger.info("Starting full VM schedule update process")
+    return sync_vm_schedules(full=True)
+
 def check_scheduled_deletions():
     """Check for and process VMs scheduled for deletion today or in the past."""
     logger.info("Checking scheduled deletions")
     today = date.today()
     to_delete = []
     
-    with deletion_lock:
-        for vm_name, info in vms_scheduled_for_deletion.items():
-            if info['deletion_date'] <= today:
-                logger.info(f"VM {vm_name} marked for deletion (Deletion date {info['deletion_date'].strftime('%d-%m-%Y')} "
-                          f"has passed or is today)")
-                to_delete.append((vm_name, info['id']))
-            else:
-                days_until_deletion = (info['deletion_date'] - today).days
-                logger.info(f"VM {vm_name} scheduled for deletion in {days_until_deletion} days "
-                           f"(End date: {info['end_date'].strftime('%d-%m-%Y')}, "
-                           f"Deletion date: {info['deletion_date'].strftime('%d-%m-%Y')})")
+    for vm_name, info in get_deletion_schedule().items():
+        if info['deletion_date'] <= today:
+            logger.info(f"VM {vm_name} marked for deletion (Deletion date {info['deletion_date'].strftime('%d-%m-%Y')} "
+                      f"has passed or is today)")
+            to_delete.append((vm_name, info['id']))
+        else:
+            days_until_deletion = (info['deletion_date'] - today).days
+            logger.info(f"VM {vm_name} scheduled for deletion in {days_until_deletion} days "
+                       f"(End date: {info['end_date'].strftime('%d-%m-%Y')}, "
+                       f"Deletion date: {info['deletion_date'].strftime('%d-%m-%Y')})")
     
     if to_delete:
         logger.info(f"Found {len(to_delete)} VMs to delete")
@@ -213,104 +556,50 @@ def check_scheduled_deletions():
         logger.info("No VMs need to be deleted at this time")
         return
 
-    # Load templates once for all VMs
-    templates = get_training_templates()
-    if not templates:
-        logger.warning("Could not load training templates, DHCP reservations will not be removed")
-    
-    # Process deletions
-    for vm_name, vm_id in to_delete:
-        logger.info(f"Processing deletion for VM {vm_name} (ID: {vm_id})")
-        
-        # Get MAC address BEFORE removing the VM
-        vm_mac = None
-        dhcp_server_id = None
-        
-        if templates:
-            # Try to find matching template and get MAC address
-            vm_mac = get_vm_mac_address(vm_name)
-            if vm_mac:
-                logger.info(f"Retrieved MAC address for VM {vm_name}: {vm_mac}")
-                # Find matching template
-                matching_template = find_matching_template(vm_name, templates)
-                if matching_template:
-                    dhcp_server_id = matching_template.get('dhcp_server_id')
-                    if dhcp_server_id:
-                        logger.info(f"Found matching template for VM {vm_name}")
-                    else:
-                        logger.warning(f"Matching template found but no DHCP server ID for VM {vm_name}")
-                else:
-                    logger.warning(f"No matching template found for VM {vm_name}")
-            else:
-                logger.warning(f"Could not retrieve MAC address for VM {vm_name}")
-
-        # Now proceed with VM removal
-        result = remove_vm(VM(name=vm_name, template_id=None))
-        
-        if "has been stopped and removed" in result:
-            logger.info(f"Successfully removed VM {vm_name} (ID: {vm_id})")
-            
-            # Handle DHCP reservation removal if we have the necessary information
-            if vm_mac and dhcp_server_id:
-                try:
-                    fortigate.remove_dhcp_reservations(vm_mac, dhcp_server_id)
-                    logger.info(f"Successfully removed DHCP reservation for {vm_name}")
-                except Exception as e:
-                    logger.error(f"Failed to remove DHCP reservation for {vm_name}: {str(e)}")
-            
-            # Remove from scheduled deletions
-            with deletion_lock:
-                if vm_name in vms_scheduled_for_deletion:
-                    del vms_scheduled_for_deletion[vm_name]
-        else:
-            logger.error(f"Failed to remove VM {vm_name} (ID: {vm_id}). Result: {result}")
+    return remove_vms_pipeline([vm_name for vm_name, vm_id in to_delete])
 
 def get_scheduled_deletions():
     """Get the current list of scheduled deletions and VMs due for removal."""
-    today = date.today()
-    total_due = 0
-    due_vms = []
-    
-    with deletion_lock:
-        scheduled_deletions = {
-            vm_name: {
-                'id': info['id'],
-                'end_date': info['end_date'].strftime('%d-%m-%Y'),
-                'deletion_date': info['deletion_date'].strftime('%d-%m-%Y')
-            }
-            for vm_name, info in vms_scheduled_for_deletion.items()
-        }
-        
-        # Get VMs due for deletion
-        due_vms = [
-            {'name': vm_name, 'info': info}
-            for vm_name, info in vms_scheduled_for_deletion.items()
-            if info['deletion_date'] <= today
-        ]
-        
-        return {
-            "scheduled_deletions": scheduled_deletions,
-            "total_due": len(due_vms),
-            "due_vms": due_vms
+    scheduled = get_deletion_schedule()
+    scheduled_deletions = {
+        vm_name: {
+            'id': info['id'],
+            'end_date': info['end_date'].strftime('%d-%m-%Y'),
+            'deletion_date': info['deletion_date'].strftime('%d-%m-%Y')
         }
+        for vm_name, info in scheduled.items()
+    }
+    
+    # Get VMs due for deletion
+    due_vms = [
+        {'name': vm_name, 'info': info}
+        for vm_name, info in get_deletion_schedule(due_by=date.today()).items()
+    ]
+    
+    return {
+        "scheduled_deletions": scheduled_deletions,
+        "total_due": len(due_vms),
+        "due_vms": due_vms
+    }
 
 def clear_scheduled_deletions():
     """Clear all scheduled deletions without removing VMs."""
     logger.info("Clearing all scheduled deletions")
     
-    with deletion_lock:
+    with state_db() as conn:
         cleared_entries = {
-            vm_name: {
-                'id': info['id'],
-                'end_date': info['end_date'].strftime('%d-%m-%Y'),
-                'deletion_date': info['deletion_date'].strftime('%d-%m-%Y')
+            row['vm_name']: {
+                'id': row['vmid'],
+                'end_date': date.fromisoformat(row['end_date']).strftime('%d-%m-%Y'),
+                'deletion_date': date.fromisoformat(row['deletion_date']).strftime('%d-%m-%Y')
             }
-            for vm_name, info in vms_scheduled_for_deletion.items()
+            for row in conn.execute("SELECT * FROM deletion_schedule")
         }
-        count = len(vms_scheduled_for_deletion)
-        vms_scheduled_for_deletion.clear()
+        count = conn.execute("DELETE FROM deletion_schedule").rowcount
+        # Forget the seen tags too, so the next sync schedules the VMs again like a full update would
+        conn.execute("DELETE FROM vm_tag_state")
         
-        logger.info(f"Cleared {count} entries from scheduled deletions")
+    logger.info(f"Cleared {count} entries from scheduled deletions")
         
     return {
         "message": f"Successfully cleared {count} scheduled deletions",
@@ -318,6 +607,423 @@ def clear_scheduled_deletions():
         "cleared_entries": cleared_entries
     }
 
+# Boot-storm controller: starts are queued per node and released as the node's CPU and IO wait allow,
+# with an additive-increase / multiplicative-decrease limit on concurrent boots
+boot_initial_concurrency = int(os.getenv('PVE_BOOT_CONCURRENCY', 2))
+boot_max_concurrency = int(os.getenv('PVE_BOOT_MAX_CONCURRENCY', 8))
+boot_max_node_cpu = float(os.getenv('PVE_BOOT_MAX_NODE_CPU', 0.85))
+boot_max_node_iowait = float(os.getenv('PVE_BOOT_MAX_NODE_IOWAIT', 0.15))
+boot_settle_seconds = int(os.getenv('PVE_BOOT_SETTLE_SECONDS', 45))  # Boot time assumed for VMs without guest agent
+boot_max_wait = int(os.getenv('PVE_BOOT_MAX_WAIT', 300))  # A VM stops counting as booting after this many seconds; also the longest a busy node holds back its queue
+boot_poll_interval = 5
+resume_seconds = int(os.getenv('PVE_RESUME_SECONDS', 60))  # Time a hibernated seat needs to resume, instead of a cold boot
+default_class_start = datetime.strptime(os.getenv('PVE_DEFAULT_CLASS_START', '09:00'), '%H:%M').time()
+boot_state = {}  # Format: {node: {'limit': float, 'booting': [vm_name], 'queued': int, 'cpu': float, 'iowait': float}}
+boot_state_lock = threading.Lock()
+
+def parse_start_time(tags):
+    """Return the class start time from an optional 'starttime-HHMM' tag, or None."""
+    for tag in tags.split(';') if tags else []:
+        tag = tag.strip()
+        if tag.startswith('starttime-'):
+            try:
+                return datetime.strptime(tag[10:], '%H%M').time()
+            except ValueError:
+                logger.warning(f"Invalid time format in tag: {tag}")
+    return None
+
+def _boot_priority(entry):
+    return (entry['start_date'], entry.get('start_time') or default_class_start, entry['vm_name'])
+
+def _hibernated(vm):
+    """A seat suspended to disk: stopped and locked until the next start resumes it from its saved RAM."""
+    return vm.get('status') == 'stopped' and vm.get('lock') == 'suspended'
+
+def _agent_enabled(vm_config):
+    agent = str((vm_config or {}).get('agent', '0'))
+    return agent.startswith('1') or 'enabled=1' in agent
+
+def _vm_booted(entry, started_at):
+    """A VM has booted once its guest agent answers, or after the settle time if it has no agent."""
+    if entry.get('upid'):
+        task = get_task(entry['upid'])
+        if task and task['status'] != 'stopped':
+            return False
+    if entry.get('resumed'):
+        return True  # The start task of a resume only ends once the guest runs again
+    with boot_measurements_lock:
+        measurement = boot_measurements.get(entry['vm_id'])
+    if measurement is None:
+        return time.time() - started_at >= boot_settle_seconds
+    return measurement['agent_ready_at'] is not None
+
+def _run_node_boot_queue(node, entries, results, results_lock):
+    queue = sorted(entries, key=_boot_priority)
+    limit = float(boot_initial_concurrency)
+    booting = {}  # Format: {vm_name: (entry, started_at)}
+    last_decrease = 0.0
+    throttled_since = None
+    
+    while queue or booting:
+        for vm_name, (entry, started_at) in list(booting.items()):
+            elapsed = time.time() - started_at
+            if _vm_booted(entry, started_at) or elapsed > boot_max_wait:
+                del booting[vm_name]
+                with results_lock:
+                    results['boot_seconds'][vm_name] = round(elapsed, 1)
+                if elapsed <= boot_max_wait:
+                    # Additive increase: every clean boot allows one more concurrent boot
+                    limit = min(float(boot_max_concurrency), limit + 1)
+        
+        try:
+            cpu, iowait = _node_load(node)
+        except Exception as e:
+            logger.warning(f"Could not read load of node {node}: {str(e)}")
+            cpu, iowait = 0.0, 0.0
+        pressure = cpu > boot_max_node_cpu or iowait > boot_max_node_iowait
+        if pressure and time.time() - last_decrease > 30:
+            # Multiplicative decrease, at most once per 30 seconds so a single busy sample does not collapse the limit
+            limit = max(1.0, limit / 2)
+            last_decrease = time.time()
+            logger.info(f"Node {node} under boot pressure (CPU {cpu:.0%}, IO wait {iowait:.0%}), "
+                        f"boot concurrency lowered to {int(limit)}")
+        
+        # A node that stays busy holds back the queue for at most boot_max_wait seconds, then boots go on one at a time
+        throttled_since = (throttled_since or time.time()) if pressure else None
+        if not pressure:
+            capacity = int(limit)
+        elif time.time() - throttled_since >= boot_max_wait:
+            if queue and not booting:
+                logger.warning(f"Node {node} still busy after {boot_max_wait}s, starting the next VM anyway")
+            capacity = 1
+        else:
+            capacity = 0
+        while queue and len(booting) < capacity:
+            entry = queue.pop(0)
+            result = _start_vm_on_node(entry['vm_name'], entry['vm_id'], node)
+            with results_lock:
+                if "error" in result:
+                    results['failed'].append({'name': entry['vm_name'], 'id': entry['vm_id'], 'error': result['error']})
+                    continue
+                results['started'].append({'name': entry['vm_name'], 'id': entry['vm_id'],
+                                           'start_date': entry['start_date'].strftime('%d-%m-%Y'),
+                                           'resumed': result['resumed']})
+            booting[entry['vm_name']] = (dict(entry, upid=result['upid'], resumed=result['resumed']), time.time())
+        
+        with boot_state_lock:
+            boot_state[node] = {'limit': int(limit), 'booting': list(booting), 'queued': len(queue),
+                                'cpu': round(cpu, 3), 'iowait': round(iowait, 3)}
+        if queue or booting:
+            time.sleep(boot_poll_interval)
+    
+    with boot_state_lock:
+        boot_state.pop(node, None)
+
+def start_vms_staggered(entries):
+    """
+    Start VMs spread out per node, earliest training start first, as fast as the nodes can boot them.
+    
+    Args:
+        entries: List of dicts with vm_name, vm_id, node, start_date and optionally start_time
+        
+    Returns:
+        dict: started, failed and boot_seconds per VM
+    """
+    results = {'started': [], 'failed': [], 'boot_seconds': {}}
+    results_lock = threading.Lock()
+    by_node = {}
+    for entry in entries:
+        by_node.setdefault(entry['node'], []).append(entry)
+    if not by_node:
+        return results
+    
+    logger.info(f"Starting {len(entries)} VMs across {len(by_node)} nodes, "
+                f"initially {boot_initial_concurrency} concurrent boots per node")
+    with ThreadPoolExecutor(max_workers=len(by_node)) as executor:
+        futures = {node: executor.submit(_run_node_boot_queue, node, node_entries, results, results_lock)
+                   for node, node_entries in by_node.items()}
+    for node, future in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            logger.error(f"Start queue of node {node} failed: {str(e)}")
+            with results_lock:
+                done = {seat['name'] for seat in results['started'] + results['failed']}
+                results['failed'].extend({'name': entry['vm_name'], 'id': entry['vm_id'], 'error': f"start queue failed: {str(e)}"}
+                                         for entry in by_node[node] if entry['vm_name'] not in done)
+            with boot_state_lock:
+                boot_state.pop(node, None)
+    logger.info(f"Staggered start completed: {len(results['started'])} started, {len(results['failed'])} failed")
+    return results
+
+def get_boot_state():
+    """Return boot concurrency, booting VMs and queue length of nodes with a running start queue."""
+    with boot_state_lock:
+        return {node: dict(state) for node, state in boot_state.items()}
+
+# Boot-time model: time from start to guest agent and to first IP per template, used for just-in-time starts
+boot_sample_window = int(os.getenv('PVE_BOOT_SAMPLE_WINDOW', 50))  # Most recent samples per template used for predictions
+default_boot_seconds = int(os.getenv('PVE_DEFAULT_BOOT_SECONDS', 300))  # Prediction for templates without samples
+start_margin = timedelta(minutes=int(os.getenv('PVE_START_MARGIN_MINUTES', 15)))
+jit_start_enabled = os.getenv('PVE_JIT_START', 'true').lower() == 'true'
+jit_max_attempts = int(os.getenv('PVE_JIT_MAX_ATTEMPTS', 5))  # Failed just-in-time starts are retried this often per start date
+jit_retry_backoff = 60  # Seconds before the first retry of a failed just-in-time start, doubled on every retry
+boot_measure_timeout = 900
+boot_measurements = {}  # Format: {vmid: {'vm_name': str, 'started_at': float, 'agent': bool, 'agent_ready_at': float, 'ip_at': float}}
+boot_measurements_lock = threading.Lock()
+
+def _init_boot_model():
+    with state_db() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS vm_origins (
+                vmid INTEGER PRIMARY KEY,
+                template_id INTEGER NOT NULL,
+                cloned_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS boot_samples (
+                template_id INTEGER,
+                vmid INTEGER NOT NULL,
+                started_at REAL NOT NULL,
+                agent_seconds REAL,
+                ip_seconds REAL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_boot_samples ON boot_samples (template_id, started_at)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jit_starts (
+                vmid INTEGER NOT NULL,
+                start_date TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                last_attempt_at REAL NOT NULL,
+                error TEXT,
+                PRIMARY KEY (vmid, start_date)
+            )
+        """)
+
+def record_vm_origin(vmid, template_id):
+    """Remember which template a VM was cloned from."""
+    with state_db() as conn:
+        conn.execute("INSERT OR REPLACE INTO vm_origins (vmid, template_id, cloned_at) VALUES (?, ?, ?)",
+                     (vmid, template_id, time.time()))
+
+def _vm_template_id(vmid, vm_config):
+    """Template a VM was cloned from: recorded at clone time, else the base image of a linked clone disk."""
+    with state_db() as conn:
+        row = conn.execute("SELECT template_id FROM vm_origins WHERE vmid = ?", (vmid,)).fetchone()
+    if row:
+        return row['template_id']
+    for key, value in (vm_config or {}).items():
+        if DISK_KEY_PATTERN.match(key):
+            match = re.search(r'base-(\d+)-disk', str(value))
+            if match:
+                return int(match.group(1))
+    return None
+
+def _record_boot_sample(measurement):
+    started_at = measurement['started_at']
+    agent_seconds = measurement['agent_ready_at'] - started_at if measurement['agent_ready_at'] else None
+    ip_seconds = measurement['ip_at'] - started_at if measurement['ip_at'] else None
+    with state_db() as conn:
+        conn.execute("INSERT INTO boot_samples (template_id, vmid, started_at, agent_seconds, ip_seconds) VALUES (?, ?, ?, ?, ?)",
+                     (measurement['template_id'], measurement['vmid'], started_at, agent_seconds, ip_seconds))
+    logger.info(f"Boot of {measurement['vm_name']} (template {measurement['template_id']}): "
+                f"agent after {agent_seconds or 0:.0f}s, IP after {ip_seconds or 0:.0f}s")
+
+def _measure_boot_worker(measurement, node):
+    vmid = measurement['vmid']
+    while time.time() - measurement['started_at'] < boot_measure_timeout:
+        time.sleep(2)
+        try:
+            if measurement['agent_ready_at'] is None:
+                proxmox.nodes(node).qemu(vmid).agent.ping.post()
+                measurement['agent_ready_at'] = time.time()
+            if _agent_seat_ip(node, vmid):
+                measurement['ip_at'] = time.time()
+                break
+        except Exception:
+            continue  # Agent not up yet
+    try:
+        if measurement['agent_ready_at']:
+            _record_boot_sample(measurement)
+    finally:
+        with boot_measurements_lock:
+            if boot_measurements.get(vmid) is measurement:
+                del boot_measurements[vmid]
+
+def measure_boot(vm_name, vmid, node):
+    """Time a VM's boot until its guest agent answers and it has an IP, in a background thread."""
+    vm = get_vm_inventory().get(vmid)
+    vm_config = get_vm_config(vm) if vm else None
+    measurement = {
+        'vm_name': vm_name,
+        'vmid': vmid,
+        'template_id': _vm_template_id(vmid, vm_config),
+        'started_at': time.time(),
+        'agent': _agent_enabled(vm_config),
+        'agent_ready_at': None,
+        'ip_at': None
+    }
+    if not measurement['agent']:
+        return  # Without a guest agent there is nothing to measure
+    with boot_measurements_lock:
+        boot_measurements[vmid] = measurement
+    threading.Thread(target=_measure_boot_worker, args=(measurement, node), daemon=True).start()
+
+def get_boot_time_stats():
+    """
+    Boot statistics per template over the most recent samples.
+    
+    Returns:
+        dict: {template_id or 'unknown': {'samples', 'agent_median', 'agent_p90', 'ip_median', 'ip_p90', 'predicted_ready'}}
+    """
+    with state_db() as conn:
+        rows = conn.execute("""
+            SELECT template_id, agent_seconds, ip_seconds FROM (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY template_id ORDER BY started_at DESC) AS recent
+                FROM boot_samples
+            ) WHERE recent <= ?
+        """, (boot_sample_window,)).fetchall()
+    samples = {}
+    for row in rows:
+        samples.setdefault(row['template_id'], []).append(row)
+    
+    stats = {}
+    for template_id, template_rows in samples.items():
+        agent = [r['agent_seconds'] for r in template_rows if r['agent_seconds'] is not None]
+        ip = [r['ip_seconds'] for r in template_rows if r['ip_seconds'] is not None]
+        entry = {'samples': len(template_rows)}
+        for name, values in (('agent', agent), ('ip', ip)):
+            entry[f'{name}_median'] = round(float(np.median(values)), 1) if values else None
+            entry[f'{name}_p90'] = round(float(np.percentile(values, 90)), 1) if values else None
+        # A seat is ready once it has an IP; the agent time is the fallback if IPs were never seen
+        entry['predicted_ready'] = entry['ip_p90'] or entry['agent_p90'] or default_boot_seconds
+        stats['unknown' if template_id is None else template_id] = entry
+    return stats
+
+def _class_start(entry):
+    return datetime.combine(entry['start_date'], entry.get('start_time') or default_class_start)
+
+def plan_jit_starts(entries):
+    """
+    Compute when each seat has to be started to be ready for its class.
+    
+    Seats of the same class on the same node are pulled forward in waves of the initial boot
+    concurrency, so the boot-storm controller does not delay the last of them past class start.
+    Hibernated seats only need their resume time.
+    
+    Args:
+        entries: List of dicts with vm_name, vm_id, node, start_date and optionally start_time
+        
+    Returns:
+        list: The entries with start_at, class_start and predicted_ready added, ordered by start_at
+    """
+    stats = get_boot_time_stats()
+    inventory = get_vm_inventory()
+    groups = {}
+    for entry in entries:
+        groups.setdefault((entry['node'], _class_start(entry)), []).append(entry)
+    
+    planned = []
+    for (node, class_start), group in groups.items():
+        for entry in group:
+            if entry.get('hibernated'):
+                # Resumes are short and light on IO, they do not wait for a boot wave
+                start_at = class_start - timedelta(seconds=resume_seconds) - start_margin
+                planned.append(dict(entry, start_at=start_at, class_start=class_start, predicted_ready=resume_seconds))
+        cold_boots = [entry for entry in group if not entry.get('hibernated')]
+        for index, entry in enumerate(sorted(cold_boots, key=lambda e: e['vm_name'])):
+            vm = inventory.get(entry['vm_id'])
+            template_id = _vm_template_id(entry['vm_id'], get_vm_config(vm) if vm else None)
+            predicted = stats.get('unknown' if template_id is None else template_id, {}).get('predicted_ready', default_boot_seconds)
+            wave = index // max(boot_initial_concurrency, 1)
+            start_at = class_start - timedelta(seconds=predicted * (wave + 1)) - start_margin
+            planned.append(dict(entry, start_at=start_at, class_start=class_start, predicted_ready=predicted))
+    return sorted(planned, key=lambda e: e['start_at'])
+
+def _jit_start_allowed(attempt, now):
+    """Whether a seat may be started by the just-in-time job, given its recorded attempt for the start date."""
+    if attempt is None:
+        return True
+    if attempt['status'] == 'started' or attempt['attempts'] >= jit_max_attempts:
+        return False
+    return now >= attempt['last_attempt_at'] + jit_retry_backoff * 2 ** (attempt['attempts'] - 1)
+
+def _select_pending_starts(vms, today, until, due_for_deletion, attempts, now):
+    """
+    Pick the seats the just-in-time job has to start from inventory entries.
+    
+    Args:
+        vms: Inventory entries
+        today: Current date, seats of trainings that started before it are left to the lifecycle sweep
+        until: Last start date to include
+        due_for_deletion: Names of VMs whose deletion date has come
+        attempts: {(vmid, start date ISO): recorded just-in-time start}
+        now: Current timestamp, for the retry backoff
+        
+    Returns:
+        list: Start entries of stopped seats whose training starts between today and until
+    """
+    entries = []
+    for vm in vms:
+        start_date, end_date = parse_lifecycle_tags(vm['tags'])
+        if start_date is None or start_date < today or start_date > until or vm['status'] == 'running':
+            continue
+        if (end_date is not None and end_date < today) or vm['name'] in due_for_deletion:
+            continue
+        # A seat is started once per start date, so one an operator stopped on purpose stays stopped
+        if not _jit_start_allowed(attempts.get((vm['vmid'], start_date.isoformat())), now):
+            continue
+        entries.append({'vm_name': vm['name'], 'vm_id': vm['vmid'], 'node': vm['node'],
+                        'start_date': start_date, 'start_time': parse_start_time(vm['tags']),
+                        'hibernated': _hibernated(vm)})
+    return entries
+
+def _jit_start_attempts(today):
+    with state_db() as conn:
+        conn.execute("DELETE FROM jit_starts WHERE start_date < ?", ((today - timedelta(days=30)).isoformat(),))
+        rows = conn.execute("SELECT * FROM jit_starts WHERE start_date >= ?", (today.isoformat(),)).fetchall()
+    return {(row['vmid'], row['start_date']): dict(row) for row in rows}
+
+def _record_jit_starts(entries, results):
+    start_dates = {entry['vm_id']: entry['start_date'].isoformat() for entry in entries}
+    outcomes = [(seat['id'], 'started', None) for seat in results['started']]
+    outcomes += [(seat['id'], 'failed', seat['error']) for seat in results['failed']]
+    with state_db() as conn:
+        for vmid, status, error in outcomes:
+            conn.execute("""
+                INSERT INTO jit_starts (vmid, start_date, status, attempts, last_attempt_at, error) VALUES (?, ?, ?, 1, ?, ?)
+                ON CONFLICT (vmid, start_date) DO UPDATE SET
+                    status = excluded.status,
+                    attempts = jit_starts.attempts + 1,
+                    last_attempt_at = excluded.last_attempt_at,
+                    error = excluded.error
+            """, (vmid, start_dates[vmid], status, time.time(), error))
+
+def _pending_start_entries(today, until=None):
+    """Stopped seats whose training starts between today and until (default today) and still need a just-in-time start."""
+    return _select_pending_starts(get_vm_inventory(force_refresh=True).values(), today, until or today,
+                                  set(get_deletion_schedule(due_by=today)), _jit_start_attempts(today), time.time())
+
+def get_start_plan(days: int = 1):
+    """Planned just-in-time start times for stopped seats whose training starts within the next days."""
+    today = date.today()
+    plan = plan_jit_starts(_pending_start_entries(today, today + timedelta(days=days)))
+    return [{key: _format_plan_value(value) for key, value in entry.items()} for entry in plan]
+
+def run_jit_starts():
+    """Start every stopped seat whose just-in-time start time has come, once per start date."""
+    now = datetime.now()
+    due = [entry for entry in plan_jit_starts(_pending_start_entries(now.date())) if entry['start_at'] <= now]
+    if not due:
+        return None
+    logger.info(f"Just-in-time start of {len(due)} seats")
+    results = start_vms_staggered(due)
+    _record_jit_starts(due, results)
+    return results
+
 def check_vm_start_status():
     """
     Check VMs for start tags and start them if:
@@ -329,82 +1035,186 @@ def check_vm_start_status():
     """
     logger.info("Starting VM start status check")
     today = date.today()
-    started_vms = []
     already_running = []
-    failed_starts = []
-
-    for node in proxmox.nodes.get():
-        logger.info(f"Checking node: {node['node']}")
-        for vm in proxmox.nodes(node['node']).qemu.get():
-            if 'tags' in vm and vm['tags']:
-                tags = vm['tags'].split(';')
-                logger.debug(f"Checking start tags for VM {vm['name']}")
-                
-                # Look for start date tag
-                for tag in tags:
-                    tag = tag.strip()
-                    if tag.startswith('start-'):
-                        try:
-                            start_date = datetime.strptime(tag[6:], '%d-%m-%Y').date()
-                            if start_date <= today:
-                                # Check if VM is already running
-                                status = proxmox.nodes(node['node']).qemu(vm['vmid']).status.current.get()
-                                
-                                if status['status'] == 'running':
-                                    logger.info(f"VM {vm['name']} already running")
-                                    already_running.append(vm['name'])
-                                else:
-                                    logger.info(f"Starting VM {vm['name']} (ID: {vm['vmid']}) as start date "
-                                              f"{start_date.strftime('%d-%m-%Y')} has passed")
-                                    result = start_vm(vm['name'])
-                                    
-                                    if "error" not in result:
-                                        started_vms.append({
-                                            'name': vm['name'],
-                                            'id': vm['vmid'],
-                                            'start_date': start_date.strftime('%d-%m-%Y')
-                                        })
-                                    else:
-                                        failed_starts.append({
-                                            'name': vm['name'],
-                                            'id': vm['vmid'],
-                                            'error': result['error']
-                                        })
-                        except ValueError:
-                            logger.error(f"Invalid date format in start tag for VM {vm['name']}: {tag}")
+    to_start = []
+
+    for vm in get_vm_inventory(force_refresh=True).values():
+        start_date = parse_lifecycle_tags(vm['tags'])[0]
+        if start_date is None or start_date > today:
+            continue
+        # The inventory was just refreshed, so its status is current
+        if vm['status'] == 'running':
+            logger.debug(f"VM {vm['name']} already running")
+            already_running.append(vm['name'])
+        else:
+            to_start.append({'vm_name': vm['name'], 'vm_id': vm['vmid'], 'node': vm['node'],
+                             'start_date': start_date, 'start_time': parse_start_time(vm['tags']),
+                             'hibernated': _hibernated(vm)})
 
+    results = start_vms_staggered(to_start)
     return {
-        "started": started_vms,
+        "started": results['started'],
         "already_running": already_running,
-        "failed": failed_starts
+        "failed": results['failed']
     }
 
-def schedule_daily_check():
-    """Schedule the daily background tasks."""
-    # Update schedules at 3:00 AM
-    schedule.every().day.at("03:00").do(run_schedule_update)
-    # Check VMs to start at 3:30 AM
-    schedule.every().day.at("03:30").do(run_start_check)
-    # Remove due VMs at 4:00 AM
-    schedule.every().day.at("04:00").do(remove_due_vms)
+# Lifecycle sweep: one cluster read, one plan, then schedule changes, deletions and starts
+
+def plan_lifecycle_sweep(today: date = None):
+    """
+    Compute all lifecycle actions from a single inventory refresh without changing anything.
+    
+    Args:
+        today: Date to plan for, defaults to today
+        
+    Returns:
+        dict: schedule_updates, schedule_removals, starts, already_running and deletions
+    """
+    today = today or date.today()
+    inventory = get_vm_inventory(force_refresh=True)
+    scheduled = get_deletion_schedule()
+    names = {vm['name'] for vm in inventory.values()}
+    plan = {
+        'date': today,
+        'schedule_updates': [],
+        'schedule_removals': [],
+        'starts': [],
+        'already_running': [],
+        'deferred_starts': [],
+        'deletions': []
+    }
+    
+    for vm in inventory.values():
+        start_date = parse_lifecycle_tags(vm['tags'])[0]
+        end_date = parse_lifecycle_tags(vm['tags'])[1]
+        current = scheduled.get(vm['name'])
+        deletion_date = None
+        
+        if end_date:
+            deletion_date = end_date + timedelta(days=DELETION_GRACE_DAYS)
+            if current is None or (current['id'], current['node'], current['end_date']) != (vm['vmid'], vm['node'], end_date):
+                plan['schedule_updates'].append({
+                    'vm_name': vm['name'],
+                    'vm_id': vm['vmid'],
+                    'node': vm['node'],
+                    'end_date': end_date,
+                    'deletion_date': deletion_date
+                })
+        elif current is not None:
+            plan['schedule_removals'].append({'vm_name': vm['name'], 'reason': "end tag was removed"})
+        
+        if deletion_date is not None and deletion_date <= today:
+            plan['deletions'].append({'vm_name': vm['name'], 'vm_id': vm['vmid'], 'node': vm['node'],
+                                      'deletion_date': deletion_date})
+        elif start_date is not None and start_date <= today:
+            # VMs about to be deleted are never started
+            entry = {'vm_name': vm['name'], 'vm_id': vm['vmid'], 'node': vm['node'], 'start_date': start_date,
+                     'start_time': parse_start_time(vm['tags']), 'hibernated': _hibernated(vm)}
+            plan['already_running' if vm['status'] == 'running' else 'starts'].append(entry)
     
-    logger.info("Daily tasks scheduled: "
-                "schedule update at 3:00 AM, "
-                "VM start check at 3:30 AM, "
-                "due VM removal at 4:00 AM")
+    if jit_start_enabled and plan['starts']:
+        # Seats that do not have to boot yet are left to the just-in-time start job
+        now = datetime.now()
+        jit_plan = plan_jit_starts(plan['starts'])
+        plan['starts'] = [entry for entry in jit_plan if entry['start_at'] <= now]
+        plan['deferred_starts'] = [entry for entry in jit_plan if entry['start_at'] > now]
+    
+    for vm_name in scheduled:
+        if vm_name not in names:
+            plan['schedule_removals'].append({'vm_name': vm_name, 'reason': "it no longer exists"})
+    
+    logger.info(f"Lifecycle plan for {today.strftime('%d-%m-%Y')}: "
+                f"{len(plan['schedule_updates'])} schedule updates, {len(plan['schedule_removals'])} schedule removals, "
+                f"{len(plan['starts'])} starts, {len(plan['deferred_starts'])} deferred starts, {len(plan['deletions'])} deletions")
+    return plan
 
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  # Sleep for 1 minute
+def execute_lifecycle_plan(plan):
+    """
+    Apply a plan from plan_lifecycle_sweep. Deletions go through the removal pipeline, starts through the
+    boot-storm controller.
+    
+    Returns:
+        dict: Per-action results
+    """
+    for update in plan['schedule_updates']:
+        update_vm_schedule(update['vm_name'], update['vm_id'], update['end_date'], update['node'])
+    for removal in plan['schedule_removals']:
+        logger.info(f"Removing {removal['vm_name']} from deletion schedule as {removal['reason']}")
+        unschedule_vm_deletion(removal['vm_name'])
+    
+    # Deletions free node resources first, then the remaining starts boot in a staggered way
+    deletions = {"removed_vms": [], "failed_removals": []}
+    if plan['deletions']:
+        deletions = remove_vms_pipeline([entry['vm_name'] for entry in plan['deletions']])
+    
+    starts = start_vms_staggered(plan['starts'])
+    
+    return {
+        'schedule_updated': len(plan['schedule_updates']),
+        'schedule_removed': len(plan['schedule_removals']),
+        'started': starts['started'],
+        'failed_starts': starts['failed'],
+        'boot_seconds': starts['boot_seconds'],
+        'deletions': deletions
+    }
 
-def run_schedule_update():
-    """Run the schedule update process."""
-    logger.info("Running VM schedule update process")
-    try:
-        update_all_vm_schedules()
-        logger.info("Completed VM schedule update process")
-    except Exception as e:
-        logger.error(f"Error in VM schedule update process: {e}")
+def _format_plan_value(value):
+    if isinstance(value, datetime):
+        return value.strftime('%d-%m-%Y %H:%M')
+    if isinstance(value, date):
+        return value.strftime('%d-%m-%Y')
+    if isinstance(value, dt_time):
+        return value.strftime('%H:%M')
+    return value
+
+def _format_plan(plan):
+    """Make dates and times in a plan JSON friendly, in the formats used by the tags."""
+    return {
+        key: _format_plan_value(value) if not isinstance(value, list) else [
+            {k: _format_plan_value(v) for k, v in entry.items()} for entry in value
+        ]
+        for key, value in plan.items()
+    }
+
+def run_lifecycle_sweep(dry_run: bool = False):
+    """
+    Plan and, unless dry_run is set, execute all lifecycle actions in one pass.
+    
+    Returns:
+        dict: The plan and, when executed, the results and duration
+    """
+    started_at = time.time()
+    plan = plan_lifecycle_sweep()
+    report = {'dry_run': dry_run, 'plan': _format_plan(plan)}
+    if not dry_run:
+        report['results'] = execute_lifecycle_plan(plan)
+    report['duration_seconds'] = round(time.time() - started_at, 1)
+    logger.info(f"Lifecycle sweep {'planned' if dry_run else 'completed'} in {report['duration_seconds']}s")
+    return report
+
+lifecycle_sweep_cron = os.getenv('PVE_LIFECYCLE_SWEEP_CRON', '0 3 * * *')
+
+def scheduled_jobs():
+    """
+    Background jobs of this module, registered with the scheduler at startup.
+    
+    Returns:
+        list: (name, cron expression, function, catch up missed runs, leader only)
+    """
+    jobs = [
+        # Every worker has its own Proxmox client
+        ("proxmox-auth-refresh", "0 * * * *", refresh_ticket, False, False),
+        # Schedule updates, deletions and starts in one sweep, caught up if the app was down at 03:00
+        ("lifecycle-sweep", lifecycle_sweep_cron, run_lifecycle_sweep, True, True),
+        # Follow tag edits between the nightly runs
+        ("schedule-sync", f"*/{schedule_sync_interval} * * * *", sync_vm_schedules, False, True),
+        # Keep the spare pools of training_templates.json topped up
+        ("spare-refill", spare_refill_cron, refill_spare_pools, False, True)
+    ]
+    if jit_start_enabled:
+        # Start seats as late as their learned boot time allows
+        jobs.append(("jit-start", "* * * * *", run_jit_starts, False, True))
+    return jobs
 
 def run_deletion_check():
     """Run the deletion check process."""
@@ -415,202 +1225,1658 @@ def run_deletion_check():
     except Exception as e:
         logger.error(f"Error in VM deletion check process: {e}")
 
-def run_start_check():
-    """Run the VM start check process."""
-    logger.info("Running VM start check process")
-    try:
-        result = check_vm_start_status()
-        logger.info(f"VM start check completed: "
-                   f"{len(result['started'])} VMs started, "
-                   f"{len(result['already_running'])} already running, "
-                   f"{len(result['failed'])} failed to start")
-    except Exception as e:
-        logger.error(f"Error in VM start check process: {e}")
-
-def run_check_now():
-    """Run all checks immediately."""
+def run_check_now(dry_run: bool = False):
+    """Run all checks immediately as a single lifecycle sweep."""
     logger.info("Running immediate VM check processes")
-    try:
-        # First update schedules
-        update_all_vm_schedules()
-        # Then check VM starts
-        check_vm_start_status()
-        # Finally check for deletions
-        check_scheduled_deletions()
-        logger.info("Completed immediate VM check processes")
-    except Exception as e:
-        logger.error(f"Error during immediate checks: {e}")
+    return run_lifecycle_sweep(dry_run)
 
-def start_background_check():
-    logger.info("Starting background check scheduler")
-    background_check_thread = threading.Thread(target=schedule_daily_check)
-    background_check_thread.daemon = True
-    background_check_thread.start()
-    logger.info("Background VM check scheduler started")
+# Per-node, per-day committed memory forecast built from start-/end- tags
+forecast_horizon_days = int(os.getenv('PVE_FORECAST_HORIZON_DAYS', 120))
+forecast_ttl = int(os.getenv('PVE_FORECAST_TTL', 300))  # Seconds before the forecast is rebuilt
+memory_forecast = None  # Format: {'start_date': date, 'nodes': [str], 'total_memory': ndarray, 'committed': ndarray (nodes x days, bytes), 'built_at': float}
+forecast_lock = threading.Lock()
 
-def evaluate_nodes():
-    best_node = None
-    max_memory = 0
-    max_disk = 0
+def parse_lifecycle_tags(tags):
+    """
+    Parse the start and end dates from a VM's tag string.
+    
+    Args:
+        tags: Semicolon separated tag string as reported by Proxmox
+        
+    Returns:
+        tuple: (start_date, end_date), either of which may be None
+    """
+    start_date = None
+    end_date = None
+    for tag in tags.split(';') if tags else []:
+        tag = tag.strip()
+        try:
+            if tag.startswith('start-') and start_date is None:
+                start_date = datetime.strptime(tag[6:], '%d-%m-%Y').date()
+            elif tag.startswith('end-') and end_date is None:
+                end_date = datetime.strptime(tag[4:], '%d-%m-%Y').date()
+        except ValueError:
+            logger.warning(f"Invalid date format in tag: {tag}")
+    return start_date, end_date
+
+def _vm_memory_bytes(vm, vm_config):
+    if vm_config and 'memory' in vm_config:
+        return int(vm_config['memory']) * 1024 * 1024  # Config memory is in MB
+    return int(vm.get('maxmem', 0))
+
+def _forecast_day_range(forecast_start, days, start_date, end_date):
+    """Map a VM's lifetime onto [first, last) column indexes of the forecast matrix."""
+    first = (start_date - forecast_start).days
+    # Memory stays committed until the VM is deleted after its end date
+    last = days if end_date is None else (end_date - forecast_start).days + DELETION_GRACE_DAYS + 1
+    return min(max(first, 0), days), min(max(last, 0), days)
+
+def _forecast_interval(vm, tags):
+    """Start and end date of a VM's memory commitment, see build_memory_forecast."""
+    start_date, end_date = parse_lifecycle_tags(tags)
+    if start_date is None and SPARE_TAG in (tags or '').split(';') and vm.get('status') == 'running':
+        return date.today(), None
+    return start_date, end_date
+
+def build_memory_forecast(horizon_days=None):
+    """
+    Build the committed memory matrix for all configured nodes.
+    
+    Every VM with a start tag commits its configured memory from its start date
+    until its deletion date (end date plus grace period), or until the end of the
+    horizon if it has no end tag. Booted spares commit theirs until they are claimed.
+    
+    Args:
+        horizon_days: Number of days to forecast, starting today
+        
+    Returns:
+        dict: The forecast, see memory_forecast
+    """
+    global memory_forecast
+    
+    days = horizon_days or forecast_horizon_days
+    forecast_start = date.today()
+    
+    nodes = []
+    total_memory = []
+    for node in proxmox_nodes:
+        try:
+            total_memory.append(proxmox.nodes(node).status.get()['memory']['total'])
+            nodes.append(node)
+        except Exception as e:
+            logger.error(f"Error getting status for node {node}, excluding it from the forecast: {str(e)}")
+    node_index = {node: i for i, node in enumerate(nodes)}
+    
+    # Parse the tags once into interval arrays
+    intervals = []
+    for vm in get_vm_inventory().values():
+        if vm['node'] not in node_index or not vm['tags']:
+            continue
+        start_date, end_date = _forecast_interval(vm, vm['tags'])
+        if start_date is not None:
+            intervals.append((vm, start_date, end_date))
+    
+    vm_configs = get_vm_configs([vm for vm, _, _ in intervals])
+    node_idx = np.empty(len(intervals), dtype=np.int64)
+    memory = np.empty(len(intervals), dtype=np.float64)
+    first_day = np.empty(len(intervals), dtype=np.int64)
+    last_day = np.empty(len(intervals), dtype=np.int64)
+    for i, (vm, start_date, end_date) in enumerate(intervals):
+        node_idx[i] = node_index[vm['node']]
+        memory[i] = _vm_memory_bytes(vm, vm_configs.get(vm['vmid']))
+        first_day[i], last_day[i] = _forecast_day_range(forecast_start, days, start_date, end_date)
+    
+    # Difference array: add memory on the first day, remove it after the last day
+    active = last_day > first_day
+    diff = np.zeros((len(nodes), days + 1), dtype=np.float64)
+    np.add.at(diff, (node_idx[active], first_day[active]), memory[active])
+    np.add.at(diff, (node_idx[active], last_day[active]), -memory[active])
+    committed = np.cumsum(diff, axis=1)[:, :days]
+    
+    forecast = {
+        'start_date': forecast_start,
+        'nodes': nodes,
+        'total_memory': np.array(total_memory, dtype=np.float64),
+        'committed': committed,
+        'built_at': time.time()
+    }
+    with forecast_lock:
+        memory_forecast = forecast
+    logger.info(f"Memory forecast built: {len(nodes)} nodes, {days} days, {int(active.sum())} VM reservations")
+    return forecast
 
+def get_memory_forecast(until=None):
+    """
+    Return the cached memory forecast, rebuilding it when it is stale,
+    was built on an earlier day, or does not reach the given date.
+    """
+    with forecast_lock:
+        forecast = memory_forecast
+    
+    days = forecast_horizon_days
+    if until is not None:
+        days = max(days, (until - date.today()).days + 1)
+    
+    if (forecast is None
+            or forecast['start_date'] != date.today()
+            or forecast['committed'].shape[1] < days
+            or time.time() - forecast['built_at'] > forecast_ttl):
+        forecast = build_memory_forecast(days)
+    return forecast
+
+def invalidate_memory_forecast():
+    """Drop the cached forecast so the next query rebuilds it."""
+    global memory_forecast
+    with forecast_lock:
+        memory_forecast = None
+
+def _forecast_apply(vm, tags, sign):
+    """
+    Add (sign=1) or remove (sign=-1) a VM's reservation in the cached forecast
+    without rebuilding it.
+    """
+    start_date, end_date = _forecast_interval(vm, tags)
+    if start_date is None:
+        return
+    with config_cache_lock:
+        cached = vm_config_cache.get(vm['vmid'])
+    memory = _vm_memory_bytes(vm, cached['config'] if cached else None)
+    with forecast_lock:
+        forecast = memory_forecast
+        if forecast is None or vm['node'] not in forecast['nodes']:
+            return
+        days = forecast['committed'].shape[1]
+        first, last = _forecast_day_range(forecast['start_date'], days, start_date, end_date)
+        if last > first:
+            row = forecast['nodes'].index(vm['node'])
+            forecast['committed'][row, first:last] += sign * memory
+
+def _forecast_day(forecast, target_date):
+    return min(max((target_date - forecast['start_date']).days, 0), forecast['committed'].shape[1] - 1)
+
+def node_load_for_date(target_date):
+    """
+    Return the expected memory load ratio of every node on the given date.
+    
+    Returns:
+        dict: {node: load_ratio}
+    """
+    forecast = get_memory_forecast(until=target_date)
+    committed = _committed_with_reservations(forecast)
+    ratios = committed[:, _forecast_day(forecast, target_date)] / forecast['total_memory']
+    return dict(zip(forecast['nodes'], ratios.tolist()))
+
+def peak_load(start_date, end_date):
+    """
+    Return the peak committed memory of every node across [start_date, end_date].
+    
+    Returns:
+        dict: {node: {'peak_memory': bytes, 'total_memory': bytes, 'peak_load_ratio': float}}
+    """
+    forecast = get_memory_forecast(until=end_date)
+    first = _forecast_day(forecast, start_date)
+    last = _forecast_day(forecast, end_date)
+    peaks = _committed_with_reservations(forecast)[:, first:last + 1].max(axis=1)
+    ratios = peaks / forecast['total_memory']
+    return {
+        node: {
+            'peak_memory': int(peaks[i]),
+            'total_memory': int(forecast['total_memory'][i]),
+            'peak_load_ratio': float(ratios[i])
+        }
+        for i, node in enumerate(forecast['nodes'])
+    }
+
+def get_memory_forecast_matrix(days=None):
+    """Return the whole forecast matrix in a JSON friendly format for capacity planning."""
+    forecast = get_memory_forecast()
+    days = min(days or forecast['committed'].shape[1], forecast['committed'].shape[1])
+    committed = forecast['committed'][:, :days]
+    ratios = committed / forecast['total_memory'][:, np.newaxis]
+    return {
+        "start_date": forecast['start_date'].strftime('%d-%m-%Y'),
+        "dates": [(forecast['start_date'] + timedelta(days=d)).strftime('%d-%m-%Y') for d in range(days)],
+        "nodes": {
+            node: {
+                "total_memory": int(forecast['total_memory'][i]),
+                "committed_memory": committed[i].astype(np.int64).tolist(),
+                "load_ratio": np.round(ratios[i], 4).tolist()
+            }
+            for i, node in enumerate(forecast['nodes'])
+        }
+    }
+
+# Ledger of memory claimed by placements that are planned but not yet cloned and tagged, read and written
+# through the state database on every call so all workers see the same claims
+reservation_ttl = int(os.getenv('PVE_RESERVATION_TTL', 7200))  # Seconds before an unconfirmed claim expires
+
+def _init_placement_reservations():
+    with state_db() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS placement_reservations (
+                vm_name TEXT PRIMARY KEY,
+                node TEXT NOT NULL,
+                memory INTEGER NOT NULL,
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("DELETE FROM placement_reservations WHERE expires_at <= ?", (time.time(),))
+
+def _reservation_from_row(row):
+    return {
+        'vm_name': row['vm_name'],
+        'node': row['node'],
+        'memory': row['memory'],
+        'start_date': date.fromisoformat(row['start_date']),
+        'end_date': date.fromisoformat(row['end_date']),
+        'created_at': row['created_at'],
+        'expires_at': row['expires_at']
+    }
+
+def reserve_placement(vm_name, node, memory, start_date, end_date):
+    """Record the memory claimed on a node by a seat that is about to be cloned."""
+    now = time.time()
+    reservation = {
+        'vm_name': vm_name,
+        'node': node,
+        'memory': int(memory),
+        'start_date': start_date,
+        'end_date': end_date,
+        'created_at': now,
+        'expires_at': now + reservation_ttl
+    }
+    with state_db() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO placement_reservations VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (vm_name, node, int(memory), start_date.isoformat(), end_date.isoformat(), now, now + reservation_ttl)
+        )
+    logger.info(f"Reserved {memory / (1024*1024*1024):.2f} GB on node {node} for {vm_name}")
+    return reservation
+
+def release_placement_reservation(vm_name, reason="released"):
+    """Drop a claim, either because the seat now counts in the forecast or because it is no longer needed."""
+    with state_db() as conn:
+        released = conn.execute("DELETE FROM placement_reservations WHERE vm_name = ?", (vm_name,)).rowcount > 0
+    if released:
+        logger.info(f"Placement reservation for {vm_name} {reason}")
+    return released
+
+def move_placement_reservation(vm_name, node):
+    """Move a claim to the node the seat actually ended up on, e.g. when it got a spare from another node."""
+    with state_db() as conn:
+        moved = conn.execute("UPDATE placement_reservations SET node = ? WHERE vm_name = ? AND node != ?",
+                             (node, vm_name, node)).rowcount > 0
+    if moved:
+        logger.info(f"Placement reservation for {vm_name} moved to node {node}")
+    return moved
+
+def get_placement_reservations():
+    """
+    Return the active claims after dropping expired ones and confirming claims
+    whose VM already shows up in the inventory with a start tag.
+    
+    Returns:
+        dict: {vm_name: reservation}
+    """
+    with state_db() as conn:
+        conn.execute("DELETE FROM placement_reservations WHERE expires_at <= ?", (time.time(),))
+        reservations = {row['vm_name']: _reservation_from_row(row)
+                        for row in conn.execute("SELECT * FROM placement_reservations")}
+    if not reservations:
+        return {}
+    
+    get_vm_inventory()
+    for vm_name in list(reservations):
+        vm = vm_inventory_by_name.get(vm_name)
+        if vm and parse_lifecycle_tags(vm['tags'])[0] is not None:
+            release_placement_reservation(vm_name, "confirmed by inventory")
+            del reservations[vm_name]
+    return reservations
+
+def _committed_with_reservations(forecast, exclude=()):
+    """Return a copy of the forecast matrix with the memory of active claims added."""
+    committed = forecast['committed'].copy()
+    days = committed.shape[1]
+    for reservation in get_placement_reservations().values():
+        if reservation['vm_name'] in exclude or reservation['node'] not in forecast['nodes']:
+            continue
+        first, last = _forecast_day_range(forecast['start_date'], days,
+                                          reservation['start_date'], reservation['end_date'])
+        if last > first:
+            committed[forecast['nodes'].index(reservation['node']), first:last] += reservation['memory']
+    return committed
+
+def list_placement_reservations():
+    """Return the active claims in a JSON friendly format."""
+    return [
+        {
+            'vm_name': r['vm_name'],
+            'node': r['node'],
+            'memory': r['memory'],
+            'start_date': r['start_date'].strftime('%d-%m-%Y'),
+            'end_date': r['end_date'].strftime('%d-%m-%Y'),
+            'expires_at': datetime.fromtimestamp(r['expires_at']).isoformat()
+        }
+        for r in get_placement_reservations().values()
+    ]
+
+# Storage capacity model for the storages that hold VM disks (LVM-thin, ZFS, Ceph, ...)
+storage_usage_limit = float(os.getenv('PVE_STORAGE_MAX_USAGE', 0.9))  # Refuse nodes whose storage would pass this
+thin_metadata_limit = float(os.getenv('PVE_THIN_METADATA_MAX_USAGE', 0.8))  # Same for thin pool metadata
+default_clone_initial_growth = float(os.getenv('PVE_CLONE_INITIAL_GROWTH_GB', 2)) * 1024**3
+default_clone_daily_growth = float(os.getenv('PVE_CLONE_DAILY_GROWTH_GB', 1)) * 1024**3
+storage_sample_interval = int(os.getenv('PVE_STORAGE_SAMPLE_INTERVAL', 900))  # Seconds between usage samples
+storage_history_days = 14  # Samples older than this are ignored for growth estimates
+storage_model_ttl = 60
+storage_model = {}  # Format: {node: {storage: {'type': str, 'shared': bool, 'total': int, 'used': int, 'usage_ratio': float, 'metadata_ratio': float, 'clones': int, 'initial_growth': float, 'daily_growth': float}}}
+storage_model_refreshed_at = 0.0
+storage_model_lock = threading.Lock()
+storage_configs = {}  # Format: {storage_id: storage config}, storage definitions rarely change
+last_storage_sample = {}  # Format: {(node, storage): timestamp}
+
+def _init_storage_history():
+    with state_db() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS storage_samples (
+                node TEXT NOT NULL,
+                storage TEXT NOT NULL,
+                sampled_at REAL NOT NULL,
+                used INTEGER NOT NULL,
+                total INTEGER NOT NULL,
+                clones INTEGER NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_storage_samples ON storage_samples (node, storage, sampled_at)")
+        conn.execute("DELETE FROM storage_samples WHERE sampled_at < ?", (time.time() - storage_history_days * 86400,))
+        for row in conn.execute("SELECT node, storage, MAX(sampled_at) AS sampled_at FROM storage_samples GROUP BY node, storage"):
+            last_storage_sample[(row['node'], row['storage'])] = row['sampled_at']
+
+def _record_storage_sample(node, storage, used, total, clones):
+    now = time.time()
+    if now - last_storage_sample.get((node, storage), 0) < storage_sample_interval:
+        return
+    with state_db() as conn:
+        conn.execute("INSERT INTO storage_samples VALUES (?, ?, ?, ?, ?, ?)", (node, storage, now, used, total, clones))
+    last_storage_sample[(node, storage)] = now
+
+def _estimate_clone_growth(node, storage):
+    """
+    Estimate how much a clone adds to a storage, from the history of usage samples.
+    
+    Returns:
+        tuple: (bytes added when a clone is created, bytes added per clone and day)
+    """
+    with state_db() as conn:
+        rows = conn.execute(
+            "SELECT sampled_at, used, clones FROM storage_samples "
+            "WHERE node = ? AND storage = ? AND sampled_at >= ? ORDER BY sampled_at",
+            (node, storage, time.time() - storage_history_days * 86400)
+        ).fetchall()
+    
+    initial = []
+    daily = []
+    for prev, cur in zip(rows, rows[1:]):
+        elapsed_days = (cur['sampled_at'] - prev['sampled_at']) / 86400
+        new_clones = cur['clones'] - prev['clones']
+        growth = max(cur['used'] - prev['used'], 0)
+        if new_clones > 0:
+            initial.append(growth / new_clones)
+        elif new_clones == 0 and cur['clones'] > 0 and elapsed_days > 0:
+            daily.append(growth / elapsed_days / cur['clones'])
+    
+    return (float(np.median(initial)) if initial else default_clone_initial_growth,
+            float(np.median(daily)) if daily else default_clone_daily_growth)
+
+def _thin_pool_usage(node, storage_id):
+    """Return (data ratio, metadata ratio) of the LVM thin pool behind a storage, or None."""
+    config = storage_configs.get(storage_id)
+    if config is None:
+        config = proxmox.storage(storage_id).get()
+        storage_configs[storage_id] = config
+    for pool in proxmox.nodes(node).disks.lvmthin.get():
+        if pool.get('lv') == config.get('thinpool') and pool.get('vg') == config.get('vgname'):
+            data_ratio = pool['used'] / pool['lv_size'] if pool.get('lv_size') else None
+            metadata_ratio = pool['metadata_used'] / pool['metadata_size'] if pool.get('metadata_size') else None
+            return data_ratio, metadata_ratio
+    return None
+
+def _storage_clone_counts(node):
+    """Count the VMs on a node that have disks on each storage."""
+    vms = [vm for vm in get_vm_inventory().values() if vm['node'] == node and not vm.get('template')]
+    counts = {}
+    for vm_config in get_vm_configs(vms).values():
+        for storage in vm_disk_storages(vm_config):
+            counts[storage] = counts.get(storage, 0) + 1
+    return counts
+
+def _build_node_storage_model(node):
+    clone_counts = _storage_clone_counts(node)
+    model = {}
+    for status in proxmox.nodes(node).storage.get(content='images'):
+        if not status.get('active') or not status.get('total'):
+            continue
+        storage = status['storage']
+        entry = {
+            'type': status.get('type'),
+            'shared': bool(status.get('shared')),
+            'total': status['total'],
+            'used': status['used'],
+            'usage_ratio': status['used'] / status['total'],
+            'metadata_ratio': None,
+            'clones': clone_counts.get(storage, 0)
+        }
+        if entry['type'] == 'lvmthin':
+            try:
+                pool_usage = _thin_pool_usage(node, storage)
+                if pool_usage:
+                    entry['usage_ratio'] = pool_usage[0] if pool_usage[0] is not None else entry['usage_ratio']
+                    entry['metadata_ratio'] = pool_usage[1]
+            except Exception as e:
+                logger.warning(f"Could not read thin pool usage for storage {storage} on node {node}: {str(e)}")
+        
+        _record_storage_sample(node, storage, entry['used'], entry['total'], entry['clones'])
+        entry['initial_growth'], entry['daily_growth'] = _estimate_clone_growth(node, storage)
+        model[storage] = entry
+    return model
+
+def get_storage_model(force_refresh=False):
+    """
+    Return the storage capacity model of all configured nodes.
+    
+    Returns:
+        dict: {node: {storage: capacity entry}}
+    """
+    global storage_model, storage_model_refreshed_at
+    with storage_model_lock:
+        if force_refresh or time.time() - storage_model_refreshed_at > storage_model_ttl:
+            model = {}
+            for node in proxmox_nodes:
+                try:
+                    model[node] = _build_node_storage_model(node)
+                except Exception as e:
+                    logger.error(f"Error getting storage status for node {node}: {str(e)}")
+            storage_model = model
+            storage_model_refreshed_at = time.time()
+        return storage_model
+
+def project_storage_usage(entry, new_clones, days):
+    """
+    Project the usage of a storage after adding clones that live for the given number of days.
+    Existing clones keep growing over the same period.
+    
+    Returns:
+        tuple: (projected data ratio, projected metadata ratio or None)
+    """
+    growth = (entry['clones'] * entry['daily_growth'] * days
+              + new_clones * (entry['initial_growth'] + entry['daily_growth'] * days))
+    data_ratio = entry['usage_ratio'] + growth / entry['total']
+    metadata_ratio = None
+    if entry['metadata_ratio'] is not None and entry['usage_ratio'] > 0:
+        # Thin pool metadata grows roughly with the amount of allocated data
+        metadata_ratio = entry['metadata_ratio'] * data_ratio / entry['usage_ratio']
+    return data_ratio, metadata_ratio
+
+def storage_fits(node, storages, new_clones, days, model=None):
+    """
+    Check whether clones on a node would leave the given storages below their limits.
+    
+    Returns:
+        tuple: (fits, worst projected data ratio, reason or None)
+    """
+    model = model if model is not None else get_storage_model()
+    worst = 0.0
+    for storage in storages:
+        entry = model.get(node, {}).get(storage)
+        if entry is None:
+            continue
+        data_ratio, metadata_ratio = project_storage_usage(entry, new_clones, days)
+        worst = max(worst, data_ratio)
+        if data_ratio > storage_usage_limit:
+            return False, worst, f"storage {storage} would reach {data_ratio:.0%}"
+        if metadata_ratio is not None and metadata_ratio > thin_metadata_limit:
+            return False, worst, f"thin pool metadata of {storage} would reach {metadata_ratio:.0%}"
+    return True, worst, None
+
+# Weighted multi-criteria node scoring used by evaluate_nodes and evaluate_nodes_for_date.
+# Weights can be overridden per template with a "placement_weights" object in training_templates.json.
+DEFAULT_PLACEMENT_WEIGHTS = {
+    'memory': 0.5,       # Free memory now, or uncommitted memory on the target date
+    'storage': 0.2,      # Projected free space on the storages that hold the VM disks
+    'cpu': 0.15,         # Average CPU usage over the last hour
+    'running_vms': 0.1,  # Number of running VMs compared to the busiest node
+    'template': 0.05     # Whether the training template is available on the node
+}
+node_score_criteria = {}  # Format: {name: function(node, metrics) -> (raw value, score between 0 and 1)}
+default_seat_days = int(os.getenv('PVE_DEFAULT_SEAT_DAYS', 5))  # Assumed seat lifetime when only a start date is known
+DISK_KEY_PATTERN = re.compile(r'^(scsi|virtio|sata|ide|efidisk|tpmstate)\d+$')
+
+def register_node_criterion(name, func, default_weight=0.0):
+    """
+    Register a scoring criterion.
+    
+    Args:
+        name: Criterion name as used in placement_weights
+        func: Called as func(node, metrics) and returns (raw value, score between 0 and 1)
+        default_weight: Weight used when a template does not configure one
+    """
+    node_score_criteria[name] = func
+    DEFAULT_PLACEMENT_WEIGHTS.setdefault(name, default_weight)
+
+def vm_disk_storages(vm_config):
+    """Return the storage IDs that hold the disks of a VM config."""
+    storages = set()
+    for key, value in vm_config.items():
+        if DISK_KEY_PATTERN.match(key) and isinstance(value, str) and 'media=cdrom' not in value:
+            volume = value.split(',')[0]
+            if ':' in volume:
+                storages.add(volume.split(':')[0])
+    return storages
+
+def find_template_for_training(training):
+    """Return the training_templates.json entry that lists the given training name, or None."""
+    templates = get_training_templates() or []
+    return next((t for t in templates if training in t['name']), None)
+
+def _average_cpu(node):
+    try:
+        samples = proxmox.nodes(node).rrddata.get(timeframe='hour', cf='AVERAGE')
+    except Exception as e:
+        logger.warning(f"Could not read RRD data for node {node}: {str(e)}")
+        return None
+    values = [sample['cpu'] for sample in samples if sample.get('cpu') is not None]
+    return sum(values) / len(values) if values else None
+
+def _collect_node_metrics(target_date=None, template=None):
+    """Collect everything the criteria need in one round of requests per node."""
+    template_ids = {node: int(vmid) for node, vmid in (template or {}).get('template_ids', {}).items()}
+    inventory = get_vm_inventory()
+    templates = {
+        node: inventory[vmid]
+        for node, vmid in template_ids.items()
+        if vmid in inventory and inventory[vmid]['node'] == node
+    }
+    template_configs = get_vm_configs(list(templates.values()))
+    load_ratios = node_load_for_date(target_date) if target_date else {}
+    model = get_storage_model()
+    # A new seat lives at least until its start date plus a short class
+    seat_days = (max((target_date - date.today()).days, 0) if target_date else 0) + default_seat_days
+    
+    metrics = {}
     for node in proxmox_nodes:
-        status = proxmox.nodes(node).status().get()
-        free_memory = status['memory']['free']
-        free_disk = status['rootfs']['free']
+        try:
+            status = proxmox.nodes(node).status.get()
+        except Exception as e:
+            logger.error(f"Error getting status for node {node}, excluding it: {str(e)}")
+            continue
+        
+        template = templates.get(node)
+        template_storages = vm_disk_storages(template_configs.get(template['vmid'], {})) if template else set()
+        storages = template_storages or set(model.get(node, {}))
+        fits, projected_ratio, reason = storage_fits(node, storages, 1, seat_days, model)
+        metrics[node] = {
+            'status': status,
+            'storages': model.get(node, {}),
+            'template_storages': storages,
+            'storage_projected_ratio': projected_ratio,
+            'storage_fits': fits,
+            'storage_reason': reason,
+            'load_ratio': load_ratios.get(node),
+            'cpu': _average_cpu(node),
+            'running_vms': sum(1 for vm in inventory.values() if vm['node'] == node and vm['status'] == 'running'),
+            'template_required': bool(template_ids),
+            'template_available': node in templates
+        }
+    
+    max_running = max((m['running_vms'] for m in metrics.values()), default=0)
+    for m in metrics.values():
+        m['max_running_vms'] = max_running
+    return metrics
+
+def _score_memory(node, metrics):
+    if metrics['load_ratio'] is not None:
+        ratio = metrics['load_ratio']
+    else:
+        memory = metrics['status']['memory']
+        ratio = 1 - memory['free'] / memory['total']
+    return ratio, min(max(1 - ratio, 0.0), 1.0)
+
+def _score_storage(node, metrics):
+    if not any(storage in metrics['storages'] for storage in metrics['template_storages']):
+        rootfs = metrics['status']['rootfs']
+        free_ratio = rootfs['free'] / rootfs['total']
+        return 1 - free_ratio, min(max(free_ratio, 0.0), 1.0)
+    # The fullest storage after adding a seat decides, a clone needs room on all of them
+    ratio = metrics['storage_projected_ratio']
+    return ratio, min(max(1 - ratio, 0.0), 1.0)
+
+def _score_cpu(node, metrics):
+    cpu = metrics['cpu']
+    if cpu is None:
+        cpu = metrics['status'].get('cpu', 0)
+    return cpu, min(max(1 - cpu, 0.0), 1.0)
+
+def _score_running_vms(node, metrics):
+    running = metrics['running_vms']
+    if not metrics['max_running_vms']:
+        return running, 1.0
+    return running, 1 - running / metrics['max_running_vms']
+
+def _score_template(node, metrics):
+    if not metrics['template_required']:
+        return None, 1.0
+    return metrics['template_available'], 1.0 if metrics['template_available'] else 0.0
+
+register_node_criterion('memory', _score_memory)
+register_node_criterion('storage', _score_storage)
+register_node_criterion('cpu', _score_cpu)
+register_node_criterion('running_vms', _score_running_vms)
+register_node_criterion('template', _score_template)
+
+def score_nodes(target_date=None, template=None):
+    """
+    Score all configured nodes with the weighted criteria.
+    
+    Args:
+        target_date: Score memory by the forecast for this date instead of current usage
+        template: Training template entry, supplies template_ids and optional placement_weights
+        
+    Returns:
+        list: One entry per node with the total score, eligibility and a per-criterion
+              breakdown, best node first
+    """
+    weights = dict(DEFAULT_PLACEMENT_WEIGHTS)
+    for name, weight in (template or {}).get('placement_weights', {}).items():
+        if name in node_score_criteria:
+            weights[name] = float(weight)
+        else:
+            logger.warning(f"Unknown placement criterion '{name}' in template, ignoring it")
+    total_weight = sum(weights.values()) or 1.0
+    
+    results = []
+    for node, metrics in _collect_node_metrics(target_date, template).items():
+        breakdown = {}
+        score = 0.0
+        for name, func in node_score_criteria.items():
+            try:
+                value, criterion_score = func(node, metrics)
+            except Exception as e:
+                logger.warning(f"Criterion '{name}' failed for node {node}: {str(e)}")
+                value, criterion_score = None, 0.0
+            breakdown[name] = {
+                'value': value,
+                'score': round(criterion_score, 4),
+                'weight': weights[name]
+            }
+            score += weights[name] * criterion_score
+        
+        eligible = (metrics['template_available'] or not metrics['template_required']) and metrics['storage_fits']
+        if not metrics['storage_fits']:
+            logger.warning(f"Node {node} is not eligible: {metrics['storage_reason']}")
+        results.append({
+            'node': node,
+            'score': round(score / total_weight, 4),
+            'eligible': eligible,
+            'storage_warning': metrics['storage_reason'],
+            'criteria': breakdown
+        })
+        logger.info(f"Node {node}: score {score / total_weight:.3f}" +
+                    ("" if eligible else " (not eligible)") + ", " +
+                    ", ".join(f"{name} {b['score']:.2f}" for name, b in breakdown.items()))
+    
+    results.sort(key=lambda r: (r['eligible'], r['score']), reverse=True)
+    return results
 
-        if free_memory > max_memory and free_disk > max_disk:
-            max_memory = free_memory
-            max_disk = free_disk
-            best_node = node
+def best_scored_node(scores):
+    best = next((r for r in scores if r['eligible']), None)
+    return best['node'] if best else None
 
+def evaluate_nodes(template=None):
+    best_node = best_scored_node(score_nodes(template=template))
+    if best_node:
+        logger.info(f"Selected best node: {best_node}")
+    else:
+        logger.warning("No suitable node found")
     return best_node
 
-def evaluate_nodes_for_date(target_date):
+def evaluate_nodes_for_date(target_date, template=None):
     target_date = datetime.strptime(target_date, "%d-%m-%Y").date()
-    best_node = None
-    min_expected_load_ratio = float('inf')
+    best_node = best_scored_node(score_nodes(target_date, template))
+    if best_node:
+        logger.info(f"Selected best node for {target_date}: {best_node}")
+    else:
+        logger.warning(f"No suitable node found for date {target_date}")
+    return best_node
 
-    for node in proxmox_nodes:
-        node_status = proxmox.nodes(node).status.get()
-        total_memory = node_status['memory']['total']
+def place_seats(vm_names, template_ids, start_date, end_date):
+    """
+    Assign a batch of seats to nodes across the whole training window.
+    
+    Uses a least-loaded bin-packing heuristic on the memory forecast: every seat goes
+    to the node whose peak load across the window stays lowest after adding the
+    template's memory, and seats already placed in the batch count against their node.
+    All data is collected once for the batch.
+    
+    Args:
+        vm_names: Names of the seats to place
+        template_ids: {node: template_id} of the training template
+        start_date: First day of the training
+        end_date: Last day of the training
+        
+    Returns:
+        dict: Assignments per seat and the projected peak load per node
+    """
+    forecast = get_memory_forecast(until=end_date + timedelta(days=DELETION_GRACE_DAYS))
+    days = forecast['committed'].shape[1]
+    first, last = _forecast_day_range(forecast['start_date'], days, start_date, end_date)
+    if last <= first:
+        first, last = min(first, days - 1), min(first, days - 1) + 1
+    
+    # Only nodes that hold a copy of the template can take a seat
+    inventory = get_vm_inventory()
+    templates = {}
+    for node, template_id in template_ids.items():
+        template = inventory.get(int(template_id))
+        if node in forecast['nodes'] and template and template['node'] == node:
+            templates[forecast['nodes'].index(node)] = template
+        else:
+            logger.warning(f"Template {template_id} not available on node {node}, skipping node")
+    if not templates:
+        return {"error": "No node holds the requested template"}
+    
+    template_configs = get_vm_configs(list(templates.values()))
+    seat_memory = {
+        row: _vm_memory_bytes(template, template_configs.get(template['vmid']))
+        for row, template in templates.items()
+    }
+    seat_storages = {
+        row: vm_disk_storages(template_configs.get(template['vmid'], {}))
+        for row, template in templates.items()
+    }
+    # Clones live until they are deleted after the end date
+    seat_days = (end_date - date.today()).days + DELETION_GRACE_DAYS + 1
+    
+    # Deciding on a placement and recording its claims must not interleave with another worker's placement
+    with cluster_slot('placement'):
+        return _place_seats_locked(vm_names, forecast, templates, seat_memory, seat_storages, seat_days,
+                                   first, last, start_date, end_date)
+
+def _place_seats_locked(vm_names, forecast, templates, seat_memory, seat_storages, seat_days,
+                        first, last, start_date, end_date):
+    total_memory = forecast['total_memory']
+    # Claims of other in-flight deployments count, earlier claims for these seats are replaced
+    window = _committed_with_reservations(forecast, exclude=set(vm_names))[:, first:last]
+    peak_before = window.max(axis=1) / total_memory
+    model = get_storage_model()
+    # Shared storages (e.g. Ceph) fill up from every node, local ones only from their own
+    storage_key = lambda node, storage: storage if model.get(node, {}).get(storage, {}).get('shared') else (node, storage)
+    placed_on_storage = {}
+    
+    assignments = []
+    unplaced = []
+    for vm_name in vm_names:
+        projected = {}
+        for row in templates:
+            node = forecast['nodes'][row]
+            keys = [storage_key(node, storage) for storage in seat_storages[row]]
+            new_clones = max((placed_on_storage.get(key, 0) for key in keys), default=0) + 1
+            fits, _, reason = storage_fits(node, seat_storages[row], new_clones, seat_days, model)
+            if fits:
+                projected[row] = (window[row].max() + seat_memory[row]) / total_memory[row]
+            else:
+                logger.warning(f"Node {node} refused for seat {vm_name}: {reason}")
+        if not projected:
+            unplaced.append(vm_name)
+            continue
+        # Prefer nodes that stay within capacity, then the lowest projected peak
+        row = min(projected, key=lambda r: (projected[r] > 1, projected[r]))
+        window[row] += seat_memory[row]
+        node = forecast['nodes'][row]
+        for storage in seat_storages[row]:
+            key = storage_key(node, storage)
+            placed_on_storage[key] = placed_on_storage.get(key, 0) + 1
+        if projected[row] > 1:
+            logger.warning(f"Seat {vm_name} overcommits node {node} (peak load ratio {projected[row]:.2f})")
+        reserve_placement(vm_name, node, seat_memory[row], start_date, end_date)
+        assignments.append({
+            "vm_name": vm_name,
+            "node": node,
+            "template_id": templates[row]['vmid'],
+            "memory": int(seat_memory[row]),
+            "peak_load_ratio": round(float(projected[row]), 4)
+        })
+    
+    peak_after = window.max(axis=1) / total_memory
+    logger.info(f"Placed {len(assignments)} seats for {start_date.strftime('%d-%m-%Y')} - "
+                f"{end_date.strftime('%d-%m-%Y')}: " +
+                ", ".join(f"{node}: {sum(1 for a in assignments if a['node'] == node)}"
+                          for node in forecast['nodes']))
+    
+    if unplaced:
+        logger.error(f"No node with enough storage for seats: {', '.join(unplaced)}")
+    
+    return {
+        "assignments": assignments,
+        "unplaced": unplaced,
+        "nodes": {
+            node: {
+                "peak_load_ratio_before": round(float(peak_before[i]), 4),
+                "peak_load_ratio_after": round(float(peak_after[i]), 4)
+            }
+            for i, node in enumerate(forecast['nodes'])
+        }
+    }
+
+# VMID blocks reserved per deployment, so parallel clones never race on cluster/nextid
+vmid_range_start = int(os.getenv('PVE_VMID_RANGE_START', 1000))
+vmid_range_end = int(os.getenv('PVE_VMID_RANGE_END', 999999))
+vmid_block_ttl = int(os.getenv('PVE_VMID_BLOCK_TTL', 86400))  # Seconds before a forgotten block is released
+pending_vmid_ttl = 600  # Seconds a single ID handed out stays reserved while it is not yet visible in the inventory
+
+def _init_vmid_blocks():
+    with state_db() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS vmid_blocks (
+                owner TEXT PRIMARY KEY,
+                start INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                used TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS pending_vmids (
+                vmid INTEGER PRIMARY KEY,
+                allocated_at REAL NOT NULL
+            )
+        """)
+        # Clones that timed out, kept here so a retry on any worker finds the task that may still run
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS timed_out_clones (
+                name TEXT PRIMARY KEY,
+                upid TEXT NOT NULL,
+                vmid INTEGER NOT NULL,
+                owner TEXT,
+                node TEXT NOT NULL,
+                started_at REAL,
+                timed_out_at REAL NOT NULL
+            )
+        """)
+        conn.execute("DELETE FROM vmid_blocks WHERE created_at <= ?", (time.time() - vmid_block_ttl,))
+        conn.execute("DELETE FROM timed_out_clones WHERE timed_out_at <= ?", (time.time() - vmid_block_ttl,))
+
+def _block_from_row(row):
+    return {
+        'owner': row['owner'],
+        'start': row['start'],
+        'count': row['count'],
+        'used': set(json.loads(row['used'])),
+        'created_at': row['created_at']
+    }
+
+def _get_vmid_block(conn, owner):
+    row = conn.execute("SELECT * FROM vmid_blocks WHERE owner = ? AND created_at > ?",
+                       (owner, time.time() - vmid_block_ttl)).fetchone()
+    return _block_from_row(row) if row else None
+
+def _save_vmid_block(conn, block):
+    conn.execute(
+        "INSERT OR REPLACE INTO vmid_blocks VALUES (?, ?, ?, ?, ?)",
+        (block['owner'], block['start'], block['count'], json.dumps(sorted(block['used'])), block['created_at'])
+    )
+
+def _reserved_vmids(conn):
+    conn.execute("DELETE FROM vmid_blocks WHERE created_at <= ?", (time.time() - vmid_block_ttl,))
+    reserved = {row['vmid'] for row in conn.execute("SELECT vmid FROM pending_vmids")}
+    for row in conn.execute("SELECT start, count FROM vmid_blocks"):
+        reserved.update(range(row['start'], row['start'] + row['count']))
+    return reserved
+
+def _block_info(block):
+    ids = range(block['start'], block['start'] + block['count'])
+    return {
+        'owner': block['owner'],
+        'start': block['start'],
+        'end': block['start'] + block['count'] - 1,
+        'count': block['count'],
+        'used': sorted(block['used']),
+        'free': [vmid for vmid in ids if vmid not in block['used']]
+    }
+
+def allocate_vmid_block(owner: str, count: int):
+    """
+    Reserve a contiguous range of VMIDs for a deployment, e.g. one range per ticket.
+    An owner that already holds a block gets it back unchanged.
+    
+    Returns:
+        dict: The block, or an error if no free range is left
+    """
+    taken = set(get_vm_inventory(force_refresh=True)) | cluster_vmids
+    with state_db() as conn:
+        # Every block operation runs in an immediate transaction, so workers never hand out the same range or ID
+        conn.execute("BEGIN IMMEDIATE")
+        block = _get_vmid_block(conn, owner)
+        if block:
+            return _block_info(block)
+        
+        taken |= _reserved_vmids(conn)
+        start = vmid_range_start
+        for vmid in sorted(v for v in taken if v >= vmid_range_start):
+            if vmid - start >= count:
+                break
+            start = max(start, vmid + 1)
+        if start + count - 1 > vmid_range_end:
+            logger.error(f"No free range of {count} VMIDs left for {owner}")
+            return {"error": f"No free range of {count} VMIDs available"}
+        
+        block = {'owner': owner, 'start': start, 'count': count, 'used': set(), 'created_at': time.time()}
+        _save_vmid_block(conn, block)
+    logger.info(f"Reserved VMIDs {start}-{start + count - 1} for {owner}")
+    return _block_info(block)
+
+def _take_block_vmid(block, in_use):
+    """Mark and return the first ID of a block that is neither used by the block nor in use in the cluster."""
+    for vmid in range(block['start'], block['start'] + block['count']):
+        if vmid not in block['used'] and vmid not in in_use:
+            block['used'].add(vmid)
+            return vmid
+    return None
+
+def take_vmid(owner: str):
+    """Hand out the next unused VMID of an owner's block, skipping IDs that exist in the cluster."""
+    get_vm_inventory()
+    with state_db() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        block = _get_vmid_block(conn, owner)
+        if block is None:
+            return None
+        vmid = _take_block_vmid(block, cluster_vmids)
+        if vmid is not None:
+            _save_vmid_block(conn, block)
+            return vmid
+    logger.warning(f"VMID block of {owner} is exhausted")
+    return None
+
+def return_vmid(owner, vmid):
+    """Give a VMID back after a failed clone so it can be used again."""
+    with state_db() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        block = _get_vmid_block(conn, owner) if owner else None
+        if block and vmid in block['used']:
+            block['used'].discard(vmid)
+            _save_vmid_block(conn, block)
+        conn.execute("DELETE FROM pending_vmids WHERE vmid = ?", (vmid,))
+
+def release_vmid_block(owner: str):
+    """Release an owner's block. IDs that were used stay with their VMs, unused ones become free."""
+    with state_db() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        block = _get_vmid_block(conn, owner)
+        if block is None:
+            return None
+        conn.execute("DELETE FROM vmid_blocks WHERE owner = ?", (owner,))
+    info = _block_info(block)
+    logger.info(f"Released VMID block of {owner}: {len(info['used'])} used, {len(info['free'])} returned")
+    return info
+
+def list_vmid_blocks():
+    with state_db() as conn:
+        rows = conn.execute("SELECT * FROM vmid_blocks WHERE created_at > ?", (time.time() - vmid_block_ttl,)).fetchall()
+    return [_block_info(_block_from_row(row)) for row in rows]
+
+def allocate_vmid():
+    """
+    Pick a single free VMID for callers without a block. IDs handed out here and IDs
+    inside reserved blocks are skipped, so concurrent callers never get the same one.
+    """
+    get_vm_inventory()
+    vmid = int(proxmox.cluster.nextid.get())
+    with state_db() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        now = time.time()
+        stale = [(row['vmid'],) for row in conn.execute("SELECT * FROM pending_vmids")
+                 if row['vmid'] in cluster_vmids or now - row['allocated_at'] > pending_vmid_ttl]
+        conn.executemany("DELETE FROM pending_vmids WHERE vmid = ?", stale)
+        reserved = _reserved_vmids(conn)
+        while vmid in reserved or vmid in cluster_vmids:
+            vmid += 1
+        conn.execute("INSERT INTO pending_vmids VALUES (?, ?)", (vmid, now))
+    return vmid
+
+# Task tracker: one poller thread per node watches every awaited UPID on that node
+task_poll_min_interval = float(os.getenv('PVE_TASK_POLL_MIN_INTERVAL', 0.5))
+task_poll_max_interval = float(os.getenv('PVE_TASK_POLL_MAX_INTERVAL', 5))
+task_result_ttl = 3600  # Seconds finished tasks stay queryable
+tracked_tasks = {}  # Format: {upid: {'upid': str, 'node': str, 'type': str, 'id': str, 'status': str, 'exitstatus': str, 'done': Event, ...}}
+task_pollers = {}  # Format: {node: Event}, set to wake the node's poller early
+task_lock = threading.Lock()
+
+def _parse_upid(upid):
+    """Split a UPID (UPID:node:pid:pstart:starttime:type:id:user:) into its node, type and id."""
+    parts = upid.split(':')
+    if len(parts) < 8 or parts[0] != 'UPID':
+        raise ValueError(f"Invalid UPID: {upid}")
+    return parts[1], parts[5], parts[6]
+
+def track_task(upid):
+    """
+    Start watching a Proxmox task. Tracking the same UPID twice is a no-op.
+    
+    Returns:
+        dict: The tracked task entry
+    """
+    node, task_type, task_id = _parse_upid(upid)
+    with task_lock:
+        # Forget tasks that finished long ago
+        for old in [u for u, t in tracked_tasks.items() if t['finished_at'] and time.time() - t['finished_at'] > task_result_ttl]:
+            del tracked_tasks[old]
+        
+        task = tracked_tasks.get(upid)
+        if task is None:
+            task = tracked_tasks[upid] = {
+                'upid': upid,
+                'node': node,
+                'type': task_type,
+                'id': task_id,
+                'status': 'running',
+                'exitstatus': None,
+                'done': threading.Event(),
+                'tracked_at': time.time(),
+                'finished_at': None
+            }
+        if node in task_pollers:
+            task_pollers[node].set()
+        else:
+            task_pollers[node] = threading.Event()
+            threading.Thread(target=_poll_node_tasks, args=(node,), name=f"tasks-{node}", daemon=True).start()
+    return task
+
+def _finish_task(task, exitstatus):
+    task.update(status='stopped', exitstatus=exitstatus, finished_at=time.time())
+    task['done'].set()
+    logger.debug(f"Task {task['type']} {task['id']} on node {task['node']} finished: {exitstatus}")
+
+def _poll_node_tasks(node):
+    """Poll one node for all of its pending tasks, backing off while nothing finishes."""
+    interval = task_poll_min_interval
+    while True:
+        with task_lock:
+            pending = [t for t in tracked_tasks.values() if t['node'] == node and t['status'] != 'stopped']
+            if not pending:
+                del task_pollers[node]
+                return
+            wake = task_pollers[node]
+            wake.clear()
+        
+        finished = 0
+        try:
+            # One list call covers every running task; only tasks that left it need a status call
+            active = {t['upid'] for t in proxmox.nodes(node).tasks.get(source='active')}
+            for task in pending:
+                if task['upid'] in active:
+                    continue
+                status = proxmox.nodes(node).tasks(task['upid']).status.get()
+                if status.get('status') == 'stopped':
+                    _finish_task(task, status.get('exitstatus'))
+                    finished += 1
+        except Exception as e:
+            logger.warning(f"Error polling tasks on node {node}: {str(e)}")
+        
+        interval = task_poll_min_interval if finished else min(interval * 1.5, task_poll_max_interval)
+        wake.wait(interval)
+        if wake.is_set():
+            interval = task_poll_min_interval
+
+def _task_info(task):
+    return {key: value for key, value in task.items() if key != 'done'}
+
+def await_task(upid, timeout=None):
+    """
+    Wait until a Proxmox task has finished or the timeout expires.
+    
+    Args:
+        upid: The task's UPID
+        timeout: Seconds to wait, None waits indefinitely
+        
+    Returns:
+        dict: The task, with status 'stopped' and its exitstatus once finished, otherwise status 'running'
+    """
+    task = track_task(upid)
+    task['done'].wait(timeout)
+    return _task_info(task)
+
+def get_task(upid):
+    with task_lock:
+        task = tracked_tasks.get(upid)
+        return _task_info(task) if task else None
+
+def _task_succeeded(task):
+    return task['status'] == 'stopped' and task['exitstatus'] == 'OK'
+
+# Clone scheduler: bounded clone concurrency per node and per storage, retrying on storage lock timeouts
+clone_concurrency_per_node = int(os.getenv('PVE_CLONE_CONCURRENCY_PER_NODE', 2))
+clone_concurrency_per_storage = int(os.getenv('PVE_CLONE_CONCURRENCY_PER_STORAGE', 1))
+clone_max_attempts = int(os.getenv('PVE_CLONE_MAX_ATTEMPTS', 5))
+clone_retry_backoff = float(os.getenv('PVE_CLONE_RETRY_BACKOFF', 2))  # Seconds, doubled on every retry
+clone_task_timeout = int(os.getenv('PVE_CLONE_TASK_TIMEOUT', 900))
+clone_slot_max_backoff = 5  # Seconds between attempts at most while a clone waits for its slots
+clone_executor = ThreadPoolExecutor(max_workers=int(os.getenv('PVE_CLONE_WORKERS', 16)), thread_name_prefix='clone')
+clone_jobs = {}  # Format: {job_id: {'job_id': str, 'name': str, 'node': str, 'status': str, 'vmid': int, 'upid': str, ...}}
+clone_completions = deque(maxlen=1000)  # Finish timestamps of successful clones, for throughput
+clone_counters = {'failed': 0, 'retries': 0}
+clone_lock = threading.Lock()
+
+def _clone_slot_keys(node, template_id):
+    """Slots a clone has to hold: its node and every storage its template disks live on."""
+    template = get_vm_inventory().get(int(template_id))
+    storages = vm_disk_storages(get_vm_config(template) or {}) if template else set()
+    node_model = storage_model.get(node, {})
+    keys = [('node', node)]
+    for storage in sorted(storages):
+        # Shared storages lock cluster-wide, local ones per node
+        keys.append(('storage', storage if node_model.get(storage, {}).get('shared') else f"{node}/{storage}"))
+    return keys
+
+def _acquire_clone_slots(slots):
+    """
+    Take the leases of all slots or of none, so a clone never holds its node slot while it waits
+    for a busy storage. Backs off while any of them is taken.
+    
+    Returns:
+        list: Lease IDs in the order of the slots
+    """
+    delay = slot_poll_interval
+    while True:
+        leases = []
+        for slot, limit in slots:
+            lease_id = acquire_slot(slot, limit, wait=False)
+            if lease_id is None:
+                break
+            leases.append(lease_id)
+        else:
+            return leases
+        for lease_id in reversed(leases):
+            release_slot(lease_id)
+        time.sleep(delay)
+        delay = min(delay * 2, clone_slot_max_backoff)
+
+def _is_lock_error(error):
+    return "can't lock file" in error or 'got timeout' in error
+
+def _timed_out_clone(name):
+    with state_db() as conn:
+        return conn.execute("SELECT * FROM timed_out_clones WHERE name = ? AND timed_out_at > ?",
+                            (name, time.time() - vmid_block_ttl)).fetchone()
+
+def _settle_timed_out_clone(previous, status, error=None):
+    """Drop the record of a timed-out clone. Returns False if another worker settled it first."""
+    with state_db() as conn:
+        if not conn.execute("DELETE FROM timed_out_clones WHERE name = ? AND upid = ?",
+                            (previous['name'], previous['upid'])).rowcount:
+            return False
+    with clone_lock:
+        for old in clone_jobs.values():
+            if old['upid'] == previous['upid'] and old['status'] == 'timeout':
+                old.update(status=status, error=error)
+    return True
+
+def _recheck_timed_out_clone(job):
+    """
+    Look again at the task of an earlier clone of the same seat that timed out, on this or another worker.
+    Its VMID stayed reserved, since the clone may still have been running.
+    
+    Returns:
+        str: 'done' if the earlier clone has finished fine, 'running' if it still runs, None if it failed
+    """
+    previous = _timed_out_clone(job['name'])
+    if previous is None:
+        return None
+    try:
+        # Tasks started by another worker are not tracked here, so ask the node directly
+        task = get_task(previous['upid']) or proxmox.nodes(previous['node']).tasks(previous['upid']).status.get()
+    except Exception as e:
+        logger.warning(f"Could not check the earlier clone of {job['name']} (ID: {previous['vmid']}): {str(e)}")
+        return 'running'
+    if task.get('status') != 'stopped':
+        return 'running'
+    if task.get('exitstatus') == 'OK':
+        if not _settle_timed_out_clone(previous, 'done'):
+            return 'running'
+        job.update(vmid=previous['vmid'], upid=previous['upid'], started_at=previous['started_at'])
+        logger.info(f"Earlier clone of {job['name']} (ID: {previous['vmid']}) finished after its timeout, using it")
+        return 'done'
+    if not _settle_timed_out_clone(previous, 'failed', task.get('exitstatus')):
+        return 'running'
+    return_vmid(previous['owner'], previous['vmid'])
+    logger.warning(f"Earlier clone of {job['name']} (ID: {previous['vmid']}) failed after its timeout: {task.get('exitstatus')}")
+    return None
+
+def _finish_clone(job):
+    invalidate_vm_inventory()
+    record_vm_origin(job['vmid'], job['template_id'])
+    if job['mac'] or job['ip_address']:
+        try:
+            _apply_seat_network(job)
+        except Exception as e:
+            # The clone itself is fine; callers fall back to the MAC Proxmox generated and DHCP
+            logger.error(f"Could not set the network of {job['name']} (ID: {job['vmid']}): {str(e)}")
+            job.update(mac=None, ip_address=None, network_error=str(e))
+            with state_db() as conn:
+                conn.execute("DELETE FROM seat_addresses WHERE vm_name = ?", (job['name'],))
+    job.update(status='done', finished_at=time.time())
+    with clone_lock:
+        clone_completions.append(job['finished_at'])
+    logger.info(f"Cloned {job['name']} (ID: {job['vmid']}) on node {job['node']} "
+                f"in {job['finished_at'] - job['started_at']:.1f}s")
+    return job
+
+def _run_clone_job(job, owner):
+    previous = _recheck_timed_out_clone(job)
+    if previous == 'done':
+        return _finish_clone(job)
+    if previous == 'running':
+        job.update(status='failed', error="an earlier clone of this seat is still running", finished_at=time.time())
+        logger.error(f"Clone of {job['name']} not started: an earlier clone is still running")
+        return job
+    
+    keys = _clone_slot_keys(job['node'], job['template_id'])
+    # Slots are cluster-wide leases, so the limits hold across all workers
+    slots = [(f"clone:{kind}:{key}", clone_concurrency_per_node if kind == 'node' else clone_concurrency_per_storage)
+             for kind, key in keys]
+    
+    for attempt in range(1, clone_max_attempts + 1):
+        job['attempts'] = attempt
+        leases = []
+        try:
+            leases = _acquire_clone_slots(slots)
+            job['status'] = 'running'
+            job['started_at'] = job['started_at'] or time.time()
+            vmid = take_vmid(owner) if owner else None
+            if vmid is None:
+                if owner:
+                    logger.warning(f"No VMID left in the block of {owner}, falling back to a single allocation")
+                vmid = allocate_vmid()
+            timed_out = False
+            try:
+                upid = proxmox.nodes(job['node']).qemu(job['template_id']).post(
+                    'clone', vmid=job['template_id'], newid=vmid, name=job['name'], full=job['full'])
+                job['vmid'], job['upid'] = vmid, upid
+                task = await_task(upid, clone_task_timeout)
+                timed_out = task['status'] != 'stopped'
+                error = None if _task_succeeded(task) else task['exitstatus'] or f"still running after {clone_task_timeout}s"
+            except Exception as e:
+                error = str(e)
+            # A clone that timed out may still be running on its VMID, so the ID stays reserved until it is checked again
+            if error and not timed_out:
+                return_vmid(owner, vmid)
+        finally:
+            for lease_id in reversed(leases):
+                release_slot(lease_id)
         
-        expected_memory_usage = 0
-        vms = proxmox.nodes(node).qemu.get()
+        if error is None:
+            return _finish_clone(job)
+        
+        if timed_out:
+            job.update(status='timeout', error=error, finished_at=time.time())
+            with state_db() as conn:
+                conn.execute("""
+                    INSERT OR REPLACE INTO timed_out_clones (name, upid, vmid, owner, node, started_at, timed_out_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (job['name'], job['upid'], vmid, owner, job['node'], job['started_at'], job['finished_at']))
+            with clone_lock:
+                clone_counters['failed'] += 1
+            logger.error(f"Clone of {job['name']} (ID: {vmid}) on node {job['node']} {error}, keeping its VMID reserved")
+            return job
+        
+        if _is_lock_error(error) and attempt < clone_max_attempts:
+            delay = clone_retry_backoff * 2 ** (attempt - 1)
+            logger.warning(f"Clone of {job['name']} hit a lock on node {job['node']} "
+                           f"(attempt {attempt}/{clone_max_attempts}), retrying in {delay:.0f}s: {error}")
+            job['status'] = 'retrying'
+            with clone_lock:
+                clone_counters['retries'] += 1
+            time.sleep(delay)
+            continue
+        break
+    
+    job.update(status='failed', error=error, finished_at=time.time())
+    with clone_lock:
+        clone_counters['failed'] += 1
+    logger.error(f"Clone of {job['name']} on node {job['node']} failed: {error}")
+    return job
+
+def submit_clone(name: str, template_id: int, node: str, full: int = 0, owner: str = None, mac: str = None,
+                 ip_address: str = None, dhcp_server_id: int = None):
+    """
+    Queue a clone. It runs as soon as its node and storages have a free slot.
+    If a MAC is given, net0 of the clone is set to it before the job counts as done.
+    If an IP address is given, it is written as the cloud-init ipconfig0 using the network of dhcp_server_id.
+    
+    Returns:
+        tuple: (job dict, future resolving to the finished job)
+    """
+    job = {
+        'job_id': uuid.uuid4().hex,
+        'name': name,
+        'node': node,
+        'template_id': template_id,
+        'full': full,
+        'mac': mac,
+        'ip_address': ip_address,
+        'dhcp_server_id': dhcp_server_id,
+        'network_error': None,
+        'owner': owner,
+        'status': 'queued',
+        'vmid': None,
+        'upid': None,
+        'attempts': 0,
+        'error': None,
+        'submitted_at': time.time(),
+        'started_at': None,
+        'finished_at': None
+    }
+    with clone_lock:
+        # Forget jobs that finished more than an hour ago
+        for job_id in [j for j, old in clone_jobs.items() if old['finished_at'] and time.time() - old['finished_at'] > 3600]:
+            del clone_jobs[job_id]
+        clone_jobs[job['job_id']] = job
+    return job, clone_executor.submit(_run_clone_job, job, owner)
+
+def clone_batch(clones, owner=None):
+    """
+    Clone many VMs in parallel under the scheduler's limits and wait for all of them.
+    
+    Args:
+        clones: List of dicts with name, template_id, node and optionally full, owner, mac, ip_address and dhcp_server_id
+        owner: VMID block owner for all clones
         
-        for vm in vms:
-            vm_config = proxmox.nodes(node).qemu(vm['vmid']).config.get()
-            memory_mb = int(vm_config.get('memory', 0))  # Maximum memory in MB
-            
-            if 'tags' in vm and vm['tags']:
-                tags = vm['tags'].split(';')
-                for tag in tags:
-                    if tag.startswith('start-'):
-                        try:
-                            start_date = datetime.strptime(tag[6:], "%d-%m-%Y").date()
-                            if start_date <= target_date:
-                                expected_memory_usage += memory_mb
-                                break
-                        except ValueError:
-                            logger.warning(f"Invalid date format in tag for VM {vm['name']}: {tag}")
-        
-        # Convert MB to bytes for ratio calculation (total_memory is in bytes)
-        expected_memory_bytes = expected_memory_usage * 1024 * 1024
-        expected_load_ratio = expected_memory_bytes / total_memory
-        
-        logger.info(f"Node {node}: Expected memory usage: {expected_memory_usage / 1024:.2f} GB, "
-                    f"Total memory: {total_memory / (1024*1024*1024):.2f} GB, "
-                    f"Expected load ratio: {expected_load_ratio:.2f}")
-        
-        if expected_load_ratio < min_expected_load_ratio:
-            min_expected_load_ratio = expected_load_ratio
-            best_node = node
-
-    if best_node:
-        logger.info(f"Selected best node for {target_date}: {best_node} "
-                    f"with expected load ratio: {min_expected_load_ratio:.2f}")
-    else:
-        logger.warning(f"No suitable node found for date {target_date}")
+    Returns:
+        list: The finished jobs in the order of the input
+    """
+    futures = [submit_clone(c['name'], c['template_id'], c['node'], c.get('full', 0), c.get('owner') or owner,
+                            c.get('mac'), c.get('ip_address'), c.get('dhcp_server_id'))[1]
+               for c in clones]
+    return [future.result() for future in futures]
+
+def get_clone_job(job_id):
+    with clone_lock:
+        job = clone_jobs.get(job_id)
+        return dict(job) if job else None
+
+def get_clone_scheduler_stats():
+    """Return queue depth, running clones per node and recent throughput."""
+    now = time.time()
+    with clone_lock:
+        jobs = list(clone_jobs.values())
+        recent = [t for t in clone_completions if now - t <= 600]
+        counters = dict(clone_counters)
+    running_per_node = {}
+    for job in jobs:
+        if job['status'] == 'running':
+            running_per_node[job['node']] = running_per_node.get(job['node'], 0) + 1
+    return {
+        'queue_depth': sum(1 for job in jobs if job['status'] in ('queued', 'retrying')),
+        'running': sum(running_per_node.values()),
+        'running_per_node': running_per_node,
+        'completed_last_10_min': len(recent),
+        'throughput_per_minute': round(len(recent) / 10, 2),
+        'failed_total': counters['failed'],
+        'lock_retries_total': counters['retries'],
+        'concurrency_per_node': clone_concurrency_per_node,
+        'concurrency_per_storage': clone_concurrency_per_storage
+    }
 
-    return best_node
+def _clone_result(job):
+    if job['status'] != 'done':
+        return {"error": f"Clone of {job['name']} failed: {job['error']}"}
+    return job['upid']
 
 def create_training_seat(name: str, template_id: int):
     best_node = evaluate_nodes()
     if not best_node:
         return {"error": "No suitable node found"}
 
-    vmid = proxmox.cluster.nextid.get()
-    return proxmox.nodes(best_node).qemu(template_id).post('clone', vmid=template_id, newid=vmid, name=name, full=1)
+    job, future = submit_clone(name, template_id, best_node, full=1)
+    return _clone_result(future.result())
 
 def remove_training_seat(seat: TrainingSeat):
-    for node in proxmox_nodes:
-        vms = proxmox.nodes(node).qemu().get()
-        for vm in vms:
-            if vm['name'] == seat.name:
-                vmid = vm['vmid']
-                return proxmox.nodes(node).qemu(vmid).delete()
+    vm = lookup_vm(seat.name)
+    if vm and vm['node'] in proxmox_nodes:
+        result = proxmox.nodes(vm['node']).qemu(vm['vmid']).delete()
+        _forecast_apply(vm, vm['tags'], -1)
+        invalidate_vm_inventory()
+        return result
     return {"error": "VM not found"}
 
-def create_linked_clone(name: str, template_id: int, node: str):
+def create_linked_clone(name: str, template_id: int, node: str, owner: str = None, mac: str = None,
+                        ip_address: str = None, dhcp_server_id: int = None):
     if not node:
         return {"error": "No node specified"}
+    if ip_address and not dhcp_server_id:
+        return {"error": "An IP address needs the DHCP server it was reserved on"}
     
-    vmid = proxmox.cluster.nextid.get()
-    return proxmox.nodes(node).qemu(template_id).post('clone', vmid=template_id, newid=vmid, name=name, full=0)
-
-def remove_all_scheduled_vms():
-    """Immediately remove all VMs that are scheduled for deletion."""
-    logger.info("Starting immediate removal of all VMs scheduled for deletion")
-    removed_vms = []
-    failed_removals = []
+    job, future = submit_clone(name, template_id, node, full=0, owner=owner, mac=mac,
+                               ip_address=ip_address, dhcp_server_id=dhcp_server_id)
+    return _clone_result(future.result())
+
+# Spare pool: pre-cloned, optionally pre-booted seats per template and node, claimed by renaming and retagging
+SPARE_TAG = 'spare'
+spare_refill_cron = os.getenv('PVE_SPARE_REFILL_CRON', '* * * * *')
+
+def _init_spare_seats():
+    with state_db() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS spare_seats (
+                name TEXT PRIMARY KEY,
+                template_id INTEGER NOT NULL,
+                node TEXT NOT NULL,
+                vmid INTEGER,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_spare_seats_pool ON spare_seats (template_id, node, status)")
+
+def get_spare_pool_targets():
+    """
+    Spare pools configured in training_templates.json with a "spare_pool" object, e.g. {"size": 2, "boot": true}.
+    Trainings sharing a template share its pool, which gets the largest size any of them asks for.
+    
+    Returns:
+        dict: {(template_id, node): {'size': int, 'boot': bool}}
+    """
+    targets = {}
+    for template in get_training_templates() or []:
+        pool = template.get('spare_pool')
+        if not pool:
+            continue
+        for node, template_id in template.get('template_ids', {}).items():
+            target = targets.setdefault((int(template_id), node), {'size': 0, 'boot': False})
+            target['size'] = max(target['size'], int(pool.get('size', 0)))
+            target['boot'] = target['boot'] or bool(pool.get('boot', False))
+    return targets
 
-    with deletion_lock:
-        scheduled_vms = list(vms_scheduled_for_deletion.items())
+def _spare_cloned(job, boot):
+    try:
+        if job['status'] != 'done':
+            with state_db() as conn:
+                conn.execute("DELETE FROM spare_seats WHERE name = ?", (job['name'],))
+            return
+        with state_db() as conn:
+            conn.execute("UPDATE spare_seats SET vmid = ? WHERE name = ?", (job['vmid'], job['name']))
+        # Replaces the tags copied from the template, so the spare is never picked up by the lifecycle jobs
+        proxmox.nodes(job['node']).qemu(job['vmid']).config.put(tags=SPARE_TAG)
+        invalidate_vm_config(job['vmid'])
+        if boot:
+            # Through the boot controller, so refills do not pile boots onto a node that is starting seats
+            results = start_vms_staggered([{'vm_name': job['name'], 'vm_id': job['vmid'], 'node': job['node'],
+                                            'start_date': date.today()}])
+            if results['failed']:
+                logger.warning(f"Spare seat {job['name']} could not be booted: {results['failed'][0]['error']}")
+            else:
+                _forecast_apply({'vmid': job['vmid'], 'node': job['node'], 'status': 'running'}, SPARE_TAG, 1)
+        with state_db() as conn:
+            conn.execute("UPDATE spare_seats SET status = 'ready' WHERE name = ? AND status = 'cloning'", (job['name'],))
+        logger.info(f"Spare seat {job['name']} (ID: {job['vmid']}) ready on node {job['node']}")
+    except Exception as e:
+        logger.error(f"Error preparing spare seat {job['name']}: {str(e)}")
+
+def _reconcile_spares():
+    """Drop spares whose VM is gone and settle clones whose worker went away."""
+    inventory = get_vm_inventory(force_refresh=True)
+    names = {vm['name']: vm for vm in inventory.values()}
+    with clone_lock:
+        active = {job['name'] for job in clone_jobs.values() if job['status'] in ('queued', 'running', 'retrying', 'timeout')}
+    with state_db() as conn:
+        for row in conn.execute("SELECT * FROM spare_seats").fetchall():
+            vm = names.get(row['name'])
+            if row['status'] == 'cloning':
+                if row['name'] in active or time.time() - row['created_at'] < clone_task_timeout:
+                    continue
+                if vm:
+                    conn.execute("UPDATE spare_seats SET vmid = ?, status = 'ready' WHERE name = ?", (vm['vmid'], row['name']))
+                    continue
+            elif vm and vm['vmid'] == row['vmid']:
+                continue
+            logger.warning(f"Spare seat {row['name']} no longer exists, removing it from the pool")
+            conn.execute("DELETE FROM spare_seats WHERE name = ?", (row['name'],))
 
-    for vm_name, info in scheduled_vms:
-        logger.info(f"Attempting to remove VM {vm_name} (ID: {info['id']}) immediately")
-        vmid, node = get_vm_id_and_node(vm_name)
-        
-        if vmid is None or node is None:
-            logger.warning(f"VM '{vm_name}' not found. It may have been already removed.")
-            removed_vms.append(vm_name)
-            with deletion_lock:
-                if vm_name in vms_scheduled_for_deletion:
-                    del vms_scheduled_for_deletion[vm_name]
+def refill_spare_pools():
+    """
+    Bring every spare pool to its configured size: clone missing spares in the background
+    and remove ready spares beyond the size, e.g. after a pool was made smaller, and spares
+    that could not be claimed.
+    
+    Returns:
+        dict: Numbers of spares submitted for cloning and removed
+    """
+    targets = get_spare_pool_targets()
+    _reconcile_spares()
+    with state_db() as conn:
+        rows = conn.execute("SELECT * FROM spare_seats WHERE status IN ('cloning', 'ready') ORDER BY created_at").fetchall()
+        excess = conn.execute("SELECT * FROM spare_seats WHERE status = 'failed'").fetchall()
+    pools = {}
+    for row in rows:
+        pools.setdefault((row['template_id'], row['node']), []).append(row)
+    
+    submitted = 0
+    for (template_id, node), target in targets.items():
+        if node not in proxmox_nodes:
             continue
+        for _ in range(target['size'] - len(pools.get((template_id, node), []))):
+            name = f"spare-{template_id}-{uuid.uuid4().hex[:8]}"
+            with state_db() as conn:
+                conn.execute("INSERT INTO spare_seats (name, template_id, node, status, created_at) VALUES (?, ?, ?, 'cloning', ?)",
+                             (name, template_id, node, time.time()))
+            job, future = submit_clone(name, template_id, node, full=0)
+            future.add_done_callback(lambda f, boot=target['boot']: _spare_cloned(f.result(), boot))
+            submitted += 1
+    
+    for key, spares in pools.items():
+        ready = [row for row in spares if row['status'] == 'ready']
+        surplus = len(spares) - targets.get(key, {}).get('size', 0)
+        excess.extend(ready[:max(0, surplus)])
+    removed = 0
+    for row in excess:
+        with state_db() as conn:
+            # Take the spare out of the pool first so it cannot be claimed while it is removed
+            taken = conn.execute("DELETE FROM spare_seats WHERE name = ? AND status = ?", (row['name'], row['status'])).rowcount
+        if taken and "has been stopped and removed" in remove_vm(VM(name=row['name'], template_id=None)):
+            removed += 1
+    
+    if submitted or removed:
+        logger.info(f"Spare pools refilled: {submitted} clones submitted, {removed} surplus spares removed")
+    return {"submitted": submitted, "removed": removed}
 
-        result = remove_vm(VM(name=vm_name, template_id=None))
+def claim_spare_seat(vm_name, template_ids, node=None):
+    """
+    Turn a ready spare into a seat by renaming it and clearing its spare tag.
+    The preferred node is tried first, then the other nodes of the training.
+    
+    Args:
+        vm_name: Name the seat should get
+        template_ids: {node: template_id} of the training template
+        node: Preferred node, usually the planned placement
         
-        if "has been stopped and removed" in result:
-            logger.info(f"Successfully removed VM {vm_name} (ID: {info['id']})")
-            removed_vms.append(vm_name)
-            with deletion_lock:
-                if vm_name in vms_scheduled_for_deletion:
-                    del vms_scheduled_for_deletion[vm_name]
-        else:
-            logger.error(f"Failed to remove VM {vm_name} (ID: {info['id']}). Result: {result}")
-            failed_removals.append(vm_name)
-
-    total_scheduled = len(scheduled_vms)
-    total_removed = len(removed_vms)
-    total_failed = len(failed_removals)
-
-    logger.info(f"Removal process completed. "
-                f"Total scheduled: {total_scheduled}, "
-                f"Successfully removed: {total_removed}, "
-                f"Failed removals: {total_failed}")
+    Returns:
+        dict: name, vmid, node, template_id, mac and running, or None if no spare was available
+    """
+    nodes = ([node] if node in template_ids else []) + [n for n in template_ids if n != node]
+    for candidate in nodes:
+        template_id = int(template_ids[candidate])
+        while True:
+            with state_db() as conn:
+                row = conn.execute("""
+                    SELECT * FROM spare_seats WHERE template_id = ? AND node = ? AND status = 'ready'
+                    ORDER BY created_at LIMIT 1
+                """, (template_id, candidate)).fetchone()
+                if row is None:
+                    break
+                # Conditional update, so two workers can never claim the same spare
+                if not conn.execute("UPDATE spare_seats SET status = 'claimed' WHERE name = ? AND status = 'ready'",
+                                    (row['name'],)).rowcount:
+                    continue
+            
+            spare = lookup_vm(row['name'])
+            try:
+                if spare is None or spare['vmid'] != row['vmid']:
+                    raise ValueError("VM no longer exists")
+                proxmox.nodes(candidate).qemu(spare['vmid']).config.put(name=vm_name, delete='tags')
+            except Exception as e:
+                logger.error(f"Could not claim spare seat {row['name']} for {vm_name}: {str(e)}")
+                # The VM may still be there with its spare tag, so the next refill removes it
+                with state_db() as conn:
+                    conn.execute("UPDATE spare_seats SET status = 'failed' WHERE name = ?", (row['name'],))
+                continue
+            
+            # The spare's memory is now the seat's, counted by its placement reservation and later its tags
+            _forecast_apply(spare, SPARE_TAG, -1)
+            invalidate_vm_config(spare['vmid'])
+            invalidate_vm_inventory()
+            mac = _config_mac(get_vm_config(spare))
+            with state_db() as conn:
+                conn.execute("DELETE FROM spare_seats WHERE name = ?", (row['name'],))
+                if mac:
+                    conn.execute("INSERT OR REPLACE INTO seat_macs (vm_name, mac, vmid, assigned_at) VALUES (?, ?, ?, ?)",
+                                 (vm_name, mac, spare['vmid'], time.time()))
+            logger.info(f"Claimed spare seat {row['name']} (ID: {spare['vmid']}) on node {candidate} as {vm_name}")
+            # The seat's memory now lands on the spare's node, not on the planned one
+            move_placement_reservation(vm_name, candidate)
+            return {
+                'name': vm_name,
+                'vmid': spare['vmid'],
+                'node': candidate,
+                'template_id': template_id,
+                'mac': mac,
+                'running': spare['status'] == 'running'
+            }
+    return None
 
-    return {
-        "message": f"Removal process completed. {total_removed} VMs removed, {total_failed} failed.",
-        "removed_vms": removed_vms,
-        "failed_removals": failed_removals
-    }
+def get_spare_pools():
+    """Return target size and ready and cloning spares of every pool, including pools no longer configured."""
+    targets = get_spare_pool_targets()
+    with state_db() as conn:
+        rows = conn.execute("SELECT * FROM spare_seats ORDER BY created_at").fetchall()
+    pools = {key: {'template_id': key[0], 'node': key[1], 'size': target['size'], 'boot': target['boot'],
+                   'ready': [], 'cloning': []}
+             for key, target in targets.items()}
+    for row in rows:
+        pool = pools.setdefault((row['template_id'], row['node']), {
+            'template_id': row['template_id'], 'node': row['node'], 'size': 0, 'boot': False, 'ready': [], 'cloning': []})
+        if row['status'] in ('ready', 'cloning'):
+            pool[row['status']].append(row['name'])
+    return list(pools.values())
 
-def clear_scheduled_deletions():
-    """Clear all scheduled deletions without removing VMs."""
-    logger.info("Clearing all scheduled deletions")
-    
-    with deletion_lock:
-        cleared_entries = {
-            vm_name: {
-                'id': info['id'],
-                'end_date': info['end_date'].strftime('%d-%m-%Y'),
-                'deletion_date': info['deletion_date'].strftime('%d-%m-%Y')
-            }
-            for vm_name, info in vms_scheduled_for_deletion.items()
-        }
-        count = len(vms_scheduled_for_deletion)
-        vms_scheduled_for_deletion.clear()
-        
-        logger.info(f"Cleared {count} entries from scheduled deletions")
-        
-    return {
-        "message": f"Successfully cleared {count} scheduled deletions",
-        "cleared_count": count,
-        "cleared_entries": cleared_entries
-    }
+def remove_all_scheduled_vms():
+    """Immediately remove all VMs that are scheduled for deletion."""
+    logger.info("Starting immediate removal of all VMs scheduled for deletion")
+    return remove_vms_pipeline(list(get_deletion_schedule()))
 
 def remove_vm(vm: VM):
     logger.info(f"Attempting to remove VM '{vm.name}'")
+    release_placement_reservation(vm.name)
     
     vmid, node = get_vm_id_and_node(vm.name)
     if vmid is None or node is None:
@@ -620,97 +2886,227 @@ def remove_vm(vm: VM):
     logger.info(f"Found VM '{vm.name}' (ID: {vmid}) on node {node}")
     
     try:
-        if stop_vm(vm.name):
-            timeout = 60
-            start_time = time.time()
-            while time.time() - start_time < timeout:
-                status = proxmox.nodes(node).qemu(vmid).status.current.get()['status']
-                if status == 'stopped':
-                    proxmox.nodes(node).qemu(vmid).delete()
-                    logger.info(f"VM '{vm.name}' (ID: {vmid}) has been stopped and removed from node {node}.")
-                    return f"VM '{vm.name}' with ID {vmid} has been stopped and removed from node {node}."
-                time.sleep(1)
-            
-            logger.error(f"Timeout waiting for VM '{vm.name}' (ID: {vmid}) to stop on node {node}")
-            return f"Timeout waiting for VM '{vm.name}' to stop on node {node}. Please check its status manually."
-        else:
+        stop_upid = stop_vm(vm.name)
+        if not stop_upid:
             logger.error(f"Failed to stop VM '{vm.name}' (ID: {vmid}) on node {node}")
             return f"Failed to stop VM '{vm.name}' on node {node}. Cannot proceed with removal."
+        
+        if not _task_succeeded(await_task(stop_upid, 60)):
+            logger.error(f"Timeout waiting for VM '{vm.name}' (ID: {vmid}) to stop on node {node}")
+            return f"Timeout waiting for VM '{vm.name}' to stop on node {node}. Please check its status manually."
+        
+        vm_entry = lookup_vm(vm.name)
+        task = await_task(proxmox.nodes(node).qemu(vmid).delete(), 120)
+        if not _task_succeeded(task):
+            logger.error(f"Deleting VM '{vm.name}' (ID: {vmid}) on node {node} did not complete: {task['exitstatus'] or 'timeout'}")
+            return f"Deleting VM '{vm.name}' on node {node} did not complete: {task['exitstatus'] or 'timeout'}"
+        if vm_entry:
+            _forecast_apply(vm_entry, vm_entry['tags'], -1)
+        invalidate_vm_inventory()
+        unschedule_vm_deletion(vm.name)
+        with state_db() as conn:
+            conn.execute("DELETE FROM vm_origins WHERE vmid = ?", (vmid,))
+            conn.execute("DELETE FROM seat_snapshots WHERE vm_name = ?", (vm.name,))
+        release_seat_mac(vm.name)
+        logger.info(f"VM '{vm.name}' (ID: {vmid}) has been stopped and removed from node {node}.")
+        return f"VM '{vm.name}' with ID {vmid} has been stopped and removed from node {node}."
     except Exception as e:
         logger.error(f"Error processing VM '{vm.name}' on node {node}: {str(e)}")
         return f"Error removing VM '{vm.name}' on node {node}: {str(e)}"
 
 def list_vms():
-    vms_list = []
-    for node in proxmox_nodes:
-        vms = proxmox.nodes(node).qemu().get()
-        vms_list.extend(vms)
+    vms_list = [vm for vm in get_vm_inventory().values() if vm['node'] in proxmox_nodes]
     return sorted(vms_list, key=lambda x: x.get('name', ''))
 
 def get_vm_id(vm_name):
     logger.debug(f"Searching for VM with name: {vm_name}")
-    for node in proxmox.nodes.get():
-        logger.debug(f"Checking node: {node['node']}")
-        for vm in proxmox.nodes(node['node']).qemu.get():
-            logger.debug(f"Found VM: {vm['name']} (ID: {vm['vmid']})")
-            if vm['name'] == vm_name:
-                logger.info(f"VM found: {vm_name} (ID: {vm['vmid']})")
-                return vm['vmid']
+    vm = lookup_vm(vm_name)
+    if vm:
+        logger.info(f"VM found: {vm_name} (ID: {vm['vmid']})")
+        return vm['vmid']
     logger.warning(f"VM not found: {vm_name}")
     return None
 
 def get_vm_id_and_node(vm_name):
     logger.debug(f"Searching for VM with name: {vm_name}")
-    for node in proxmox.nodes.get():
-        logger.debug(f"Checking node: {node['node']}")
-        for vm in proxmox.nodes(node['node']).qemu.get():
-            logger.debug(f"Found VM: {vm['name']} (ID: {vm['vmid']})")
-            if vm['name'] == vm_name:
-                logger.info(f"VM found: {vm_name} (ID: {vm['vmid']}) on node {node['node']}")
-                return vm['vmid'], node['node']
+    vm = lookup_vm(vm_name)
+    if vm:
+        logger.info(f"VM found: {vm_name} (ID: {vm['vmid']}) on node {vm['node']}")
+        return vm['vmid'], vm['node']
     logger.warning(f"VM not found: {vm_name}")
     return None, None
 
 def find_seat_ip(vm_name: str) -> str:
-    for node in proxmox.nodes.get():
-        for vm in proxmox.nodes(node['node']).qemu.get():
-            if vm['name'] == vm_name:
-                try:
-                    command = "pct exec 200 -- bash -c \"ip -4 addr show eth0 | grep -oP '(?<=inet\\s)\\d+(\\.\\d+){3}'\""
-                    result = proxmox.nodes(node['node']).qemu(vm['vmid']).agent.exec.post(command=command)
-                    
-                    pid = result['pid']
-                    
-                    for _ in range(30):  # Try for 30 seconds
-                        time.sleep(1)
-                        status = proxmox.nodes(node['node']).qemu(vm['vmid']).agent('exec-status').get(pid=pid)
-                        if status['exited']:
-                            if 'out-data' in status:
-                                return status['out-data'].strip()
-                            break
-                except Exception as e:
-                    print(f"Error processing VM {vm_name}: {str(e)}")
+    seat = wait_for_seat_ip(vm_name, timeout=30)
+    return seat['ip_address'] if seat else None
+
+def _agent_seat_ip(node, vmid):
+    """Return the seat network IPv4 address reported by the guest agent, or None."""
+    interfaces_data = proxmox.nodes(node).qemu(vmid).agent.get('network-get-interfaces')
+    for interface in interfaces_data.get('result', []):
+        if 'ip-addresses' in interface:
+            for ip_addr in interface['ip-addresses']:
+                if ip_addr['ip-address-type'] == 'ipv4' and ip_addr['ip-address'].startswith('100.64.'):
+                    return ip_addr['ip-address']
     return None
 
+# Seat IP discovery: guest agents are polled concurrently with backoff and results cached per vmid until the VM reboots
+ip_discovery_timeout = int(os.getenv('PVE_IP_DISCOVERY_TIMEOUT', 300))  # Seconds a discovery keeps polling the agent
+ip_discovery_max_delay = 15
+ip_discovery_executor = ThreadPoolExecutor(max_workers=int(os.getenv('PVE_IP_DISCOVERY_WORKERS', 32)), thread_name_prefix='seat-ip')
+seat_ip_cache = {}  # Format: {vmid: {'ip_address': str, 'node': str, 'vmid': int, 'booted_at': float}}
+ip_discoveries = {}  # Format: {vmid: Future}, discoveries in progress
+seat_ip_lock = threading.Lock()
+
+def _booted_at(vm):
+    """Approximate boot time of a running VM from its uptime, None if it is not running."""
+    if vm.get('status') != 'running':
+        return None
+    return time.time() - vm.get('uptime', 0)
+
+def invalidate_seat_ip(vmid):
+    """Forget the cached IP of a VM, e.g. after it was started or stopped."""
+    with seat_ip_lock:
+        seat_ip_cache.pop(vmid, None)
+
+def _cached_seat_ip(vm):
+    booted_at = _booted_at(vm)
+    # Checked and updated under the lock, since discoveries replace entries concurrently
+    with seat_ip_lock:
+        cached = seat_ip_cache.get(vm['vmid'])
+        if cached is None:
+            return None
+        if cached['booted_at'] is None and booted_at is not None:
+            cached['booted_at'] = booted_at  # Inventory was stale when the IP was found
+        # A different boot time means the VM was rebooted and may have a new address
+        elif booted_at is None or abs(booted_at - cached['booted_at']) > 60 or cached['node'] != vm['node']:
+            seat_ip_cache.pop(vm['vmid'], None)
+            return None
+        return {key: cached[key] for key in ('ip_address', 'node', 'vmid', 'source')}
+
+def _fortigate_seat_ip(mac):
+    """Look up the seat's MAC in the FortiGate DHCP lease and ARP tables, which work without a guest agent."""
+    if mac is None:
+        return None, None
+    entry = fortigate.lookup_ip_by_mac(mac)
+    return (entry['ip'], entry['source']) if entry else (None, None)
+
+def _discover_seat_ip(vm):
+    deadline = time.time() + ip_discovery_timeout
+    delay = 1
+    mac = None
+    try:
+        while True:
+            try:
+                # Read once per discovery, fresh, so a changed NIC never matches another seat's lease
+                mac = mac or _config_mac(get_vm_config(vm, fresh=True))
+                ip_address, source = _fortigate_seat_ip(mac)
+            except Exception as e:
+                logger.debug(f"FortiGate lookup for VM {vm['name']} failed: {str(e)}")
+                ip_address = None
+            try:
+                if ip_address is None:
+                    ip_address, source = _agent_seat_ip(vm['node'], vm['vmid']), 'agent'
+                if ip_address:
+                    seat = {'ip_address': ip_address, 'node': vm['node'], 'vmid': vm['vmid'], 'source': source}
+                    # The inventory entry the discovery started from may predate the boot
+                    current = get_vm_inventory().get(vm['vmid'], vm)
+                    with seat_ip_lock:
+                        seat_ip_cache[vm['vmid']] = dict(seat, booted_at=_booted_at(current))
+                    logger.info(f"Discovered IP {ip_address} for VM {vm['name']} (ID: {vm['vmid']}) from {source}")
+                    return seat
+            except Exception as e:
+                logger.debug(f"No IP for VM {vm['name']} yet: {str(e)}")
+            if time.time() + delay > deadline:
+                logger.warning(f"No IP for VM {vm['name']} (ID: {vm['vmid']}) after {ip_discovery_timeout}s")
+                return None
+            time.sleep(delay)
+            delay = min(delay * 2, ip_discovery_max_delay)
+    finally:
+        with seat_ip_lock:
+            ip_discoveries.pop(vm['vmid'], None)
+
+def _seat_ip_future(vm):
+    """Return a future resolving to the seat IP, shared by everyone asking for the same VM."""
+    with seat_ip_lock:
+        future = ip_discoveries.get(vm['vmid'])
+        if future is None:
+            future = ip_discoveries[vm['vmid']] = ip_discovery_executor.submit(_discover_seat_ip, vm)
+        return future
+
+def discover_seat_ips(vm_names, wait: float = 0):
+    """
+    Discover the IPs of many seats at once. Discoveries keep running in the background after returning.
+    
+    Args:
+        vm_names: Names of the VMs
+        wait: Seconds to wait for IPs that are not known yet
+        
+    Returns:
+        dict: {vm_name: {'ip_address', 'node', 'vmid'} or None while unknown}
+    """
+    results = {}
+    futures = {}
+    for vm_name in vm_names:
+        vm = lookup_vm(vm_name)
+        if vm is None:
+            results[vm_name] = None
+            continue
+        address = get_seat_address(vm_name)
+        if address:
+            # Cloud-init seats have their IP from the start, no need to wait for the guest
+            results[vm_name] = {'ip_address': address['ip_address'], 'node': vm['node'], 'vmid': vm['vmid'], 'source': 'cloud-init'}
+            continue
+        results[vm_name] = _cached_seat_ip(vm)
+        if results[vm_name] is None:
+            futures[vm_name] = _seat_ip_future(vm)
+    
+    if futures and wait > 0:
+        concurrent.futures.wait(futures.values(), timeout=wait)
+    for vm_name, future in futures.items():
+        results[vm_name] = future.result() if future.done() else None
+    return results
+
+def wait_for_seat_ip(vm_name: str, timeout: float = ip_discovery_timeout):
+    """Wait until a seat has an IP. Returns {'ip_address', 'node', 'vmid'} or None."""
+    return discover_seat_ips([vm_name], wait=timeout)[vm_name]
+
+def wait_for_guest_ready(vm_name: str, timeout: float = ip_discovery_timeout):
+    """
+    Wait until a seat's guest is up: its guest agent reports the seat IP, or, for VMs without an agent,
+    it shows up on the seat network. Cloud-init seats know their IP before they boot, so this is what
+    tells that their first boot, and with it cloud-init, has got that far.
+    
+    Returns:
+        dict: {'ip_address', 'node', 'vmid', 'source'} once the guest is up, or None
+    """
+    vm = lookup_vm(vm_name)
+    if vm is None:
+        return None
+    if not _agent_enabled(get_vm_config(vm)):
+        # The static address says nothing about the guest, so look for the seat on the network
+        future = _seat_ip_future(vm)
+        concurrent.futures.wait([future], timeout=timeout)
+        return future.result() if future.done() else None
+    
+    deadline = time.time() + timeout
+    delay = 1
+    while True:
+        try:
+            ip_address = _agent_seat_ip(vm['node'], vm['vmid'])
+            if ip_address:
+                return {'ip_address': ip_address, 'node': vm['node'], 'vmid': vm['vmid'], 'source': 'agent'}
+        except Exception as e:
+            logger.debug(f"Guest of VM {vm_name} not ready yet: {str(e)}")
+        if time.time() + delay > deadline:
+            logger.warning(f"Guest of VM {vm_name} (ID: {vm['vmid']}) not ready after {timeout:.0f}s")
+            return None
+        time.sleep(delay)
+        delay = min(delay * 2, ip_discovery_max_delay)
+
 def find_seat_ip_pve(vm_name: str) -> dict:
-    for node in proxmox.nodes.get():
-        node_name = node['node']
-        for vm in proxmox.nodes(node_name).qemu.get():
-            if vm['name'] == vm_name:
-                try:
-                    interfaces_data = proxmox.nodes(node_name).qemu(vm['vmid']).agent.get('network-get-interfaces')
-                    for interface in interfaces_data.get('result', []):
-                        if 'ip-addresses' in interface:
-                            for ip_addr in interface['ip-addresses']:
-                                if ip_addr['ip-address-type'] == 'ipv4' and ip_addr['ip-address'].startswith('100.64.'):
-                                    return {
-                                        "ip_address": ip_addr['ip-address'],
-                                        "node": node_name,
-                                        "vmid": vm['vmid']
-                                    }
-                except Exception as e:
-                    print(f"Error processing VM {vm_name} on node {node_name}: {str(e)}")
-    return None
+    """Return the seat IP if it is known, otherwise None while it is discovered in the background."""
+    return discover_seat_ips([vm_name])[vm_name]
 
 def add_tags_to_vm(request: AddTagsRequest):
     logger.info(f"Attempting to add tags to VM: {request.vm_name}")
@@ -719,15 +3115,28 @@ def add_tags_to_vm(request: AddTagsRequest):
     tags_string = ','.join(request.tags)
     logger.debug(f"Tags string: {tags_string}")
     
-    vmid, node = get_vm_id_and_node(request.vm_name)
-    if vmid is None or node is None:
+    vm = lookup_vm(request.vm_name)
+    if vm is None:
         logger.warning(f"VM with name {request.vm_name} not found")
         return False
+    vmid, node = vm['vmid'], vm['node']
     
     try:
         logger.debug(f"Updating tags for VM {request.vm_name} (ID: {vmid}) on node {node}")
         logger.debug(f"Proxmox API call: proxmox.nodes('{node}').qemu({vmid}).config.put(tags='{tags_string}')")
         proxmox.nodes(node).qemu(vmid).config.put(tags=tags_string)
+        invalidate_vm_config(vmid)
+        invalidate_vm_inventory()
+        # Move the VM's reservation in the forecast instead of rebuilding it
+        _forecast_apply(vm, vm['tags'], -1)
+        _forecast_apply(vm, ';'.join(request.tags), 1)
+        if parse_lifecycle_tags(';'.join(request.tags))[0] is not None:
+            release_placement_reservation(request.vm_name, "confirmed by start tag")
+        end_date = parse_lifecycle_tags(';'.join(request.tags))[1]
+        if end_date:
+            update_vm_schedule(request.vm_name, vmid, end_date, node)
+        else:
+            unschedule_vm_deletion(request.vm_name)
         logger.info(f"Tags updated successfully for VM {request.vm_name}")
         return True
     except Exception as e:
@@ -740,29 +3149,45 @@ def start_vm(vm_name: str):
     if vmid is None or node is None:
         logger.error(f"VM '{vm_name}' not found")
         return {"error": f"VM '{vm_name}' not found"}
-    
+    return _start_vm_on_node(vm_name, vmid, node)
+
+def _start_vm_on_node(vm_name, vmid, node):
+    """Send the start command for a VM whose ID and node are already known. Hibernated VMs resume."""
     try:
-        logger.info(f"Attempting to start VM '{vm_name}' (ID: {vmid}) on node {node}")
+        vm = get_vm_inventory().get(vmid)
+        resumed = vm is not None and _hibernated(vm)
+        logger.info(f"Attempting to {'resume' if resumed else 'start'} VM '{vm_name}' (ID: {vmid}) on node {node}")
         result = proxmox.nodes(node).qemu(vmid).status.start.post()
+        invalidate_vm_inventory()
+        track_task(result)
+        invalidate_seat_ip(vmid)
+        if not resumed:
+            # A resume says nothing about the template's boot time
+            measure_boot(vm_name, vmid, node)
         logger.info(f"Start command sent for VM '{vm_name}'. Result: {result}")
-        return {"message": f"VM '{vm_name}' start command sent successfully"}
+        return {"message": f"VM '{vm_name}' {'resume' if resumed else 'start'} command sent successfully",
+                "upid": result, "resumed": resumed}
     except Exception as e:
         logger.error(f"Error starting VM '{vm_name}' on node {node}: {str(e)}")
         return {"error": f"VM '{vm_name}' could not be started. Error: {str(e)}"}
 
-def stop_vm(vm_name: str) -> bool:
+def stop_vm(vm_name: str):
+    """Send a stop command. Returns the UPID of the stop task, or None if it could not be sent."""
     vmid, node = get_vm_id_and_node(vm_name)
     if vmid is None or node is None:
         logger.warning(f"Cannot stop VM '{vm_name}': VM not found")
-        return False
+        return None
     
     try:
-        proxmox.nodes(node).qemu(vmid).status.stop.post()
+        upid = proxmox.nodes(node).qemu(vmid).status.stop.post()
+        invalidate_vm_inventory()
+        invalidate_seat_ip(vmid)
+        track_task(upid)
         logger.info(f"VM '{vm_name}' (ID: {vmid}) stop command sent on node {node}")
-        return True
+        return upid
     except Exception as e:
         logger.error(f"Failed to stop VM '{vm_name}' (ID: {vmid}) on node {node}: {str(e)}")
-        return False
+        return None
 
 def shutdown_vm(vm_name: str):
     vmid, node = get_vm_id_and_node(vm_name)
@@ -773,26 +3198,366 @@ def shutdown_vm(vm_name: str):
     logger.info(f"Attempting to shut down VM '{vm_name}' (ID: {vmid}) on node {node}")
     
     try:
-        proxmox.nodes(node).qemu(vmid).status.shutdown.post()
+        upid = proxmox.nodes(node).qemu(vmid).status.shutdown.post()
+        invalidate_vm_inventory()
+        invalidate_seat_ip(vmid)
+        track_task(upid)
         logger.info(f"Shutdown command sent for VM '{vm_name}' (ID: {vmid}) on node {node}")
-        return {"message": f"Shutdown command sent for VM '{vm_name}' with ID {vmid} on node {node}."}
+        return {"message": f"Shutdown command sent for VM '{vm_name}' with ID {vmid} on node {node}.", "upid": upid}
     except Exception as e:
         logger.error(f"Error shutting down VM '{vm_name}' (ID: {vmid}) on node {node}: {str(e)}")
         return {"error": f"Failed to shut down VM '{vm_name}'. Error: {str(e)}"}
 
-def get_vm_mac_address(vm_name):
+hibernate_state_storage = os.getenv('PVE_HIBERNATE_STATE_STORAGE')  # Storage for the RAM of hibernated seats, Proxmox picks one if unset
+
+def hibernate_vm(vm_name: str):
+    """Suspend a VM to disk: its RAM is saved to a state volume and freed, and the next start resumes it."""
     vmid, node = get_vm_id_and_node(vm_name)
     if vmid is None or node is None:
-        logger.warning(f"Cannot get MAC address: VM '{vm_name}' not found")
-        return None
+        logger.warning(f"VM '{vm_name}' not found for hibernation.")
+        return {"error": f"VM '{vm_name}' not found."}
+    
+    params = {'todisk': 1}
+    if hibernate_state_storage:
+        params['statestorage'] = hibernate_state_storage
+    try:
+        upid = proxmox.nodes(node).qemu(vmid).status.suspend.post(**params)
+        invalidate_vm_inventory()
+        invalidate_seat_ip(vmid)
+        track_task(upid)
+        logger.info(f"Hibernate command sent for VM '{vm_name}' (ID: {vmid}) on node {node}")
+        return {"message": f"Hibernate command sent for VM '{vm_name}' with ID {vmid} on node {node}.", "upid": upid}
+    except Exception as e:
+        logger.error(f"Error hibernating VM '{vm_name}' (ID: {vmid}) on node {node}: {str(e)}")
+        return {"error": f"Failed to hibernate VM '{vm_name}'. Error: {str(e)}"}
+
+# Seat resets: a "clean" snapshot taken after deployment is rolled back instead of deleting and recloning the seat
+CLEAN_SNAPSHOT = 'clean'
+snapshot_task_timeout = int(os.getenv('PVE_SNAPSHOT_TASK_TIMEOUT', 600))
+reset_concurrency_per_node = int(os.getenv('PVE_RESET_CONCURRENCY_PER_NODE', 2))
+
+def _init_seat_snapshots():
+    with state_db() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS seat_snapshots (
+                vm_name TEXT PRIMARY KEY,
+                vmid INTEGER NOT NULL,
+                cohort TEXT,
+                taken_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_seat_snapshots_cohort ON seat_snapshots (cohort)")
+
+def take_clean_snapshot(vm_name, cohort=None):
+    """
+    Snapshot a freshly deployed seat so it can be reset later. Its MAC, static IP and tags are part of
+    the snapshot, so the seat's DHCP reservation, Guacamole connections and proxy host stay valid.
+    
+    Args:
+        vm_name: Name of the seat VM
+        cohort: Group the seat is reset with, e.g. the deployment's ticket number
+        
+    Returns:
+        dict: message, or error
+    """
+    vm = lookup_vm(vm_name)
+    if vm is None:
+        return {"error": f"VM '{vm_name}' not found"}
+    vmid, node = vm['vmid'], vm['node']
+    
+    try:
+        upid = proxmox.nodes(node).qemu(vmid).snapshot.post(
+            snapname=CLEAN_SNAPSHOT, description=f"Clean state after deployment{f' ({cohort})' if cohort else ''}")
+        task = await_task(upid, snapshot_task_timeout)
+    except Exception as e:
+        logger.error(f"Error taking clean snapshot of VM '{vm_name}' (ID: {vmid}) on node {node}: {str(e)}")
+        return {"error": f"Could not snapshot VM '{vm_name}'. Error: {str(e)}"}
+    if not _task_succeeded(task):
+        logger.error(f"Clean snapshot of VM '{vm_name}' (ID: {vmid}) did not complete: {task['exitstatus'] or 'timeout'}")
+        return {"error": f"Snapshot of VM '{vm_name}' did not complete: {task['exitstatus'] or 'timeout'}"}
+    
+    with state_db() as conn:
+        conn.execute("INSERT OR REPLACE INTO seat_snapshots (vm_name, vmid, cohort, taken_at) VALUES (?, ?, ?, ?)",
+                     (vm_name, vmid, cohort, time.time()))
+    logger.info(f"Took clean snapshot of VM '{vm_name}' (ID: {vmid}) on node {node}")
+    return {"message": f"Clean snapshot of VM '{vm_name}' taken", "upid": upid}
 
+def reset_seat(vm_name):
+    """
+    Roll a seat back to its clean snapshot. The current tags are kept, since training dates may have
+    changed since the snapshot, and a seat that was running is started again.
+    
+    Returns:
+        dict: vm_name, vmid, node, restarted and duration, or error
+    """
+    started_at = time.time()
+    invalidate_vm_inventory()
+    vm = lookup_vm(vm_name)
+    if vm is None:
+        return {"error": f"VM '{vm_name}' not found"}
+    vmid, node = vm['vmid'], vm['node']
+    running = vm['status'] == 'running'
+    
     try:
+        invalidate_vm_config(vmid)
+        tags = (get_vm_config(vm) or {}).get('tags', '')
+        if _hibernated(vm):
+            # A hibernated seat stays locked until resumed, and its saved RAM would not match the rolled back disks
+            result = _start_vm_on_node(vm_name, vmid, node)
+            if "error" in result or not _task_succeeded(await_task(result['upid'], snapshot_task_timeout)):
+                return {"error": f"Could not resume hibernated VM '{vm_name}' for the reset"}
+        if running or _hibernated(vm):
+            stop_upid = stop_vm(vm_name)
+            if not stop_upid or not _task_succeeded(await_task(stop_upid, 60)):
+                return {"error": f"Could not stop VM '{vm_name}' for the reset"}
+        
+        task = await_task(proxmox.nodes(node).qemu(vmid).snapshot(CLEAN_SNAPSHOT).rollback.post(), snapshot_task_timeout)
+        if not _task_succeeded(task):
+            return {"error": f"Rollback of VM '{vm_name}' did not complete: {task['exitstatus'] or 'timeout'}"}
+        
+        # The snapshot brings back the tags of deployment day
+        if proxmox.nodes(node).qemu(vmid).config.get().get('tags', '') != tags:
+            if tags:
+                proxmox.nodes(node).qemu(vmid).config.put(tags=tags)
+            else:
+                proxmox.nodes(node).qemu(vmid).config.put(delete='tags')
+        invalidate_vm_config(vmid)
+        invalidate_vm_inventory()
+        invalidate_seat_ip(vmid)
+        
+        if running:
+            result = _start_vm_on_node(vm_name, vmid, node)
+            if "error" in result:
+                return result
+    except Exception as e:
+        logger.error(f"Error resetting VM '{vm_name}' (ID: {vmid}) on node {node}: {str(e)}")
+        return {"error": f"Could not reset VM '{vm_name}'. Error: {str(e)}"}
+    
+    duration = round(time.time() - started_at, 1)
+    logger.info(f"Reset VM '{vm_name}' (ID: {vmid}) on node {node} to its clean snapshot in {duration}s")
+    return {"vm_name": vm_name, "vmid": vmid, "node": node, "restarted": running, "duration": duration}
+
+def reset_seats(vm_names):
+    """
+    Reset many seats in parallel across nodes, a few at a time per node.
+    
+    Returns:
+        dict: message, reset seats and failed seats with their errors
+    """
+    by_node = {}
+    failed = []
+    for vm_name in vm_names:
+        vm = lookup_vm(vm_name)
+        if vm is None:
+            failed.append({"name": vm_name, "error": f"VM '{vm_name}' not found"})
+        else:
+            by_node.setdefault(vm['node'], []).append(vm_name)
+    
+    node_slots = {node: threading.Semaphore(reset_concurrency_per_node) for node in by_node}
+    def reset_one(item):
+        vm_name, node = item
+        with node_slots[node]:
+            return vm_name, reset_seat(vm_name)
+    
+    reset = []
+    items = [(vm_name, node) for node, names in by_node.items() for vm_name in names]
+    if items:
+        logger.info(f"Resetting {len(items)} seats across {len(by_node)} nodes, up to {reset_concurrency_per_node} at a time per node")
+        with ThreadPoolExecutor(max_workers=len(by_node) * reset_concurrency_per_node) as executor:
+            for vm_name, result in executor.map(reset_one, items):
+                if "error" in result:
+                    failed.append({"name": vm_name, "error": result["error"]})
+                else:
+                    reset.append(result)
+    return {
+        "message": f"{len(reset)} seats reset, {len(failed)} failed",
+        "reset": reset,
+        "failed": failed
+    }
+
+def get_cohort_seats(cohort):
+    with state_db() as conn:
+        rows = conn.execute("SELECT vm_name FROM seat_snapshots WHERE cohort = ? ORDER BY vm_name", (cohort,)).fetchall()
+    return [row['vm_name'] for row in rows]
+
+# Seat MACs: stable locally-administered addresses derived from the seat name, so DHCP can be reserved before boot
+SEAT_MAC_ATTEMPTS = 16  # Derivations tried per seat before giving up on hash collisions
+seat_mac_lock = threading.Lock()
+
+def _init_seat_macs():
+    with state_db() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS seat_macs (
+                vm_name TEXT PRIMARY KEY,
+                mac TEXT NOT NULL UNIQUE,
+                vmid INTEGER,
+                assigned_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS seat_addresses (
+                vm_name TEXT PRIMARY KEY,
+                ip_address TEXT NOT NULL,
+                dhcp_server_id INTEGER NOT NULL,
+                assigned_at REAL NOT NULL
+            )
+        """)
+
+def _derive_seat_mac(vm_name, attempt):
+    seed = vm_name if attempt == 0 else f"{vm_name}#{attempt}"
+    digest = hashlib.sha256(seed.encode()).digest()
+    # 0x02: locally administered and unicast, so it can never clash with a vendor or Proxmox generated MAC
+    return ':'.join(f"{octet:02X}" for octet in (0x02, *digest[:5]))
+
+def assign_seat_mac(vm_name):
+    """
+    Return the MAC address of a seat, assigning one on first use.
+    The same seat name always gets the same MAC unless it collides with another seat.
+    
+    Args:
+        vm_name: Name of the seat VM
+        
+    Returns:
+        str: MAC address, or None if no free address could be derived
+    """
+    with seat_mac_lock, state_db() as conn:
+        for attempt in range(SEAT_MAC_ATTEMPTS):
+            # Ignored when the seat already has a MAC or the derived one belongs to another seat
+            conn.execute("INSERT OR IGNORE INTO seat_macs (vm_name, mac, assigned_at) VALUES (?, ?, ?)",
+                         (vm_name, _derive_seat_mac(vm_name, attempt), time.time()))
+            row = conn.execute("SELECT mac FROM seat_macs WHERE vm_name = ?", (vm_name,)).fetchone()
+            if row:
+                return row['mac']
+    logger.error(f"Could not derive a free MAC address for seat '{vm_name}'")
+    return None
+
+def get_seat_mac(vm_name):
+    with state_db() as conn:
+        row = conn.execute("SELECT * FROM seat_macs WHERE vm_name = ?", (vm_name,)).fetchone()
+    return dict(row) if row else None
+
+def release_seat_mac(vm_name):
+    with state_db() as conn:
+        conn.execute("DELETE FROM seat_macs WHERE vm_name = ?", (vm_name,))
+        conn.execute("DELETE FROM seat_addresses WHERE vm_name = ?", (vm_name,))
+
+def allocate_seat_address(vm_name, seat, dhcp_server_id):
+    """
+    Allocate a seat's IP up front for cloud-init templates: the seat's MAC gets a DHCP reservation
+    in the FortiGate range, and the reserved IP is later written to the clone as a static ipconfig0.
+    Allocating again for the same seat returns the existing address.
+    
+    Args:
+        vm_name: Name of the seat VM
+        seat: Description of the DHCP reservation
+        dhcp_server_id: FortiGate DHCP server to allocate from
+        
+    Returns:
+        dict: mac and ip_address, or error
+    """
+    with state_db() as conn:
+        row = conn.execute("SELECT * FROM seat_addresses WHERE vm_name = ?", (vm_name,)).fetchone()
+    mac = assign_seat_mac(vm_name)
+    if mac is None:
+        return {"error": f"No free MAC address for seat '{vm_name}'"}
+    if row and row['dhcp_server_id'] == dhcp_server_id:
+        return {"mac": mac, "ip_address": row['ip_address']}
+    
+    ip_address = fortigate.add_dhcp_reservation(mac, seat, dhcp_server_id)
+    if not ip_address:
+        return {"error": f"Could not reserve an IP for seat '{vm_name}' on DHCP server {dhcp_server_id}"}
+    with state_db() as conn:
+        conn.execute("INSERT OR REPLACE INTO seat_addresses (vm_name, ip_address, dhcp_server_id, assigned_at) VALUES (?, ?, ?, ?)",
+                     (vm_name, ip_address, dhcp_server_id, time.time()))
+    logger.info(f"Allocated IP {ip_address} for seat '{vm_name}' (MAC {mac}) on DHCP server {dhcp_server_id}")
+    return {"mac": mac, "ip_address": ip_address}
+
+def release_seat_address(vm_name):
+    """
+    Give back what a seat got before it was cloned, for seats that ended up without a VM:
+    the DHCP reservation of an up-front IP, the IP and the seat's MAC.
+    Seats whose VM exists keep them, they are released when the VM is removed.
+    
+    Returns:
+        dict: mac and dhcp_reservations_removed, or error
+    """
+    if lookup_vm(vm_name):
+        return {"error": f"VM '{vm_name}' exists, its address is released when it is removed"}
+    seat_mac = get_seat_mac(vm_name)
+    address = get_seat_address(vm_name)
+    removed = 0
+    if seat_mac and address:
+        removed = fortigate.remove_dhcp_reservations([seat_mac['mac']], address['dhcp_server_id'])
+    release_seat_mac(vm_name)
+    logger.info(f"Released the address of seat '{vm_name}' (MAC {seat_mac['mac'] if seat_mac else None}, "
+                f"{removed} DHCP reservations removed)")
+    return {"mac": seat_mac['mac'] if seat_mac else None, "dhcp_reservations_removed": removed}
+
+def get_seat_address(vm_name):
+    with state_db() as conn:
+        row = conn.execute("SELECT * FROM seat_addresses WHERE vm_name = ?", (vm_name,)).fetchone()
+    return dict(row) if row else None
+
+def _seat_ipconfig(ip_address, dhcp_server_id):
+    """Static cloud-init settings for a seat IP, using the network of the DHCP server it was reserved on."""
+    network = fortigate.get_dhcp_network(dhcp_server_id)
+    if not network:
+        raise ValueError(f"Could not read the network of DHCP server {dhcp_server_id}")
+    settings = {'ipconfig0': f"ip={ip_address}/{network['prefix_length']}"}
+    if network['gateway']:
+        settings['ipconfig0'] += f",gw={network['gateway']}"
+    if network['dns_servers']:
+        settings['nameserver'] = ' '.join(network['dns_servers'])
+    return settings
+
+def _apply_seat_network(job):
+    """
+    Write a cloned seat's network config in one call: its MAC on net0, keeping the template's
+    NIC model, bridge and options, and for cloud-init seats the pre-allocated IP as ipconfig0.
+    """
+    node, vmid, vm_name = job['node'], job['vmid'], job['name']
+    settings = {}
+    if job['mac']:
         vm_config = proxmox.nodes(node).qemu(vmid).config.get()
-        # Assuming the first network interface is the one we want
         net0 = vm_config.get('net0')
-        if net0:
-            # Extract MAC address from the net0 string
-            mac = net0.split(',')[0].split('=')[1]
+        if not net0:
+            raise ValueError(f"VM '{vm_name}' (ID: {vmid}) has no net0 interface")
+        model_mac, _, options = net0.partition(',')
+        model = model_mac.split('=')[0]
+        settings['net0'] = f"{model}={job['mac']}" + (f",{options}" if options else '')
+    if job['ip_address']:
+        settings.update(_seat_ipconfig(job['ip_address'], job['dhcp_server_id']))
+    
+    proxmox.nodes(node).qemu(vmid).config.put(**settings)
+    invalidate_vm_config(vmid)
+    with state_db() as conn:
+        conn.execute("UPDATE seat_macs SET vmid = ? WHERE vm_name = ?", (vmid, vm_name))
+    logger.info(f"Set network of VM '{vm_name}' (ID: {vmid}) on node {node}: "
+                f"{', '.join(f'{key}={value}' for key, value in settings.items())}")
+
+def _config_mac(vm_config):
+    """MAC address of the first network interface in a VM config, or None."""
+    # Assuming the first network interface is the one we want
+    net0 = (vm_config or {}).get('net0')
+    if not net0:
+        return None
+    # Extract MAC address from the net0 string
+    return net0.split(',')[0].split('=')[1]
+
+def get_vm_mac_address(vm_name):
+    vm = lookup_vm(vm_name)
+    if vm is None:
+        logger.warning(f"Cannot get MAC address: VM '{vm_name}' not found")
+        return None
+    vmid, node = vm['vmid'], vm['node']
+
+    try:
+        # Fresh, since the DHCP cleanup must not release the lease of a MAC the VM no longer has
+        vm_config = get_vm_config(vm, fresh=True)
+        if vm_config is None:
+            return None
+        mac = _config_mac(vm_config)
+        if mac:
             logger.info(f"MAC address for VM '{vm_name}' (ID: {vmid}) on node {node}: {mac}")
             return mac
         else:
@@ -808,39 +3573,41 @@ def get_all_vm_mac_addresses():
     mac_addresses = {}
     
     try:
-        for node in proxmox.nodes.get():
-            node_name = node['node']
-            logger.debug(f"Checking node: {node_name}")
+        vms = list(get_vm_inventory().values())
+        vm_configs = get_vm_configs(vms)
+        
+        for vm in vms:
+            vm_name = vm['name']
+            vm_id = vm['vmid']
+            logger.debug(f"Processing VM: {vm_name} (ID: {vm_id})")
             
-            for vm in proxmox.nodes(node_name).qemu.get():
-                vm_name = vm['name']
-                vm_id = vm['vmid']
-                logger.debug(f"Processing VM: {vm_name} (ID: {vm_id})")
+            vm_config = vm_configs.get(vm_id)
+            if vm_config is None:
+                continue
+            
+            try:
+                vm_macs = {}
                 
-                try:
-                    vm_config = proxmox.nodes(node_name).qemu(vm_id).config.get()
-                    vm_macs = {}
-                    
-                    # Check all possible network interfaces (net0 through net7)
-                    for i in range(8):
-                        net_key = f'net{i}'
-                        if net_key in vm_config:
-                            # Extract MAC address from the config string
-                            net_config = vm_config[net_key]
-                            mac = net_config.split(',')[0].split('=')[1]
-                            vm_macs[net_key] = mac
-                    
-                    if vm_macs:
-                        mac_addresses[vm_name] = {
-                            'vm_id': vm_id,
-                            'node': node_name,
-                            'interfaces': vm_macs
-                        }
-                        
-                except Exception as e:
-                    logger.error(f"Error getting MAC addresses for VM {vm_name}: {str(e)}")
-                    continue
+                # Check all possible network interfaces (net0 through net7)
+                for i in range(8):
+                    net_key = f'net{i}'
+                    if net_key in vm_config:
+                        # Extract MAC address from the config string
+                        net_config = vm_config[net_key]
+                        mac = net_config.split(',')[0].split('=')[1]
+                        vm_macs[net_key] = mac
+                
+                if vm_macs:
+                    mac_addresses[vm_name] = {
+                        'vm_id': vm_id,
+                        'node': vm['node'],
+                        'interfaces': vm_macs
+                    }
                     
+            except Exception as e:
+                logger.error(f"Error getting MAC addresses for VM {vm_name}: {str(e)}")
+                continue
+                
         logger.info(f"Successfully collected MAC addresses for {len(mac_addresses)} VMs")
         return mac_addresses
     
@@ -897,11 +3664,173 @@ def find_matching_template(vm_name, templates):
     logger.warning(f"No matching template found for VM '{vm_name}'")
     return None
 
+# Removal pipeline: VMs are removed in parallel per node, throttled by the node's actual load
+removal_concurrency_per_node = int(os.getenv('PVE_REMOVAL_CONCURRENCY_PER_NODE', 4))
+removal_max_node_cpu = float(os.getenv('PVE_REMOVAL_MAX_NODE_CPU', 0.85))
+removal_max_node_iowait = float(os.getenv('PVE_REMOVAL_MAX_NODE_IOWAIT', 0.2))
+removal_max_throttle = int(os.getenv('PVE_REMOVAL_MAX_THROTTLE', 300))  # Seconds a busy node may hold back a removal
+removal_progress = {}  # Format: {'status': str, 'total': int, 'removed': [...], 'failed': [...], 'in_progress': {node: [vm_name]}, ...}
+removal_progress_lock = threading.Lock()
+node_load_cache = {}  # Format: {node: (fetched_at, cpu, iowait)}
+
+def _node_load(node):
+    """Return (cpu, iowait) of a node as fractions, cached for a few seconds across removal workers."""
+    with removal_progress_lock:
+        cached = node_load_cache.get(node)
+    if cached and time.time() - cached[0] < 5:
+        return cached[1], cached[2]
+    status = proxmox.nodes(node).status.get()
+    load = (float(status.get('cpu', 0)), float(status.get('wait', 0)))
+    with removal_progress_lock:
+        node_load_cache[node] = (time.time(),) + load
+    return load
+
+def _wait_for_node_capacity(node):
+    """Hold back while the node is busier than the removal limits, up to removal_max_throttle seconds."""
+    deadline = time.time() + removal_max_throttle
+    delay = 2
+    while time.time() < deadline:
+        try:
+            cpu, iowait = _node_load(node)
+        except Exception as e:
+            logger.warning(f"Could not read load of node {node}, not throttling: {str(e)}")
+            return
+        if cpu < removal_max_node_cpu and iowait < removal_max_node_iowait:
+            return
+        logger.info(f"Node {node} busy (CPU {cpu:.0%}, IO wait {iowait:.0%}), delaying removal for {delay}s")
+        time.sleep(delay)
+        delay = min(delay * 2, 30)
+    logger.warning(f"Node {node} still busy after {removal_max_throttle}s, continuing removal")
+
+def _remove_one(vm_name, node, node_slots):
+    with node_slots[node]:
+        _wait_for_node_capacity(node)
+        with removal_progress_lock:
+            removal_progress['in_progress'].setdefault(node, []).append(vm_name)
+        try:
+            result = remove_vm(VM(name=vm_name, template_id=None))
+        except Exception as e:
+            result = str(e)
+        finally:
+            with removal_progress_lock:
+                removal_progress['in_progress'][node].remove(vm_name)
+    
+    removed = "has been stopped and removed" in result
+    with removal_progress_lock:
+        if removed:
+            removal_progress['removed'].append(vm_name)
+        else:
+            removal_progress['failed'].append({'name': vm_name, 'error': result})
+    if removed:
+        logger.info(f"Successfully removed VM {vm_name} from node {node}")
+        unschedule_vm_deletion(vm_name)
+    else:
+        logger.error(f"Failed to remove VM {vm_name}. Result: {result}")
+    return removed
+
+def remove_vms_pipeline(vm_names):
+    """
+    Remove VMs in parallel with per-node limits, then drop their DHCP reservations with one
+    FortiGate update per DHCP server.
+    
+    Args:
+        vm_names: Names of the VMs to remove
+        
+    Returns:
+        dict: message, removed_vms, failed_removals and dhcp_reservations_removed
+    """
+    run_lease = acquire_slot('removal-run', wait=False)
+    if run_lease is None:
+        logger.warning("A removal run is already in progress")
+        return {"error": "A removal run is already in progress"}
+    try:
+        with removal_progress_lock:
+            removal_progress.clear()
+            removal_progress.update({
+                'status': 'running',
+                'total': len(vm_names),
+                'removed': [],
+                'failed': [],
+                'in_progress': {},
+                'started_at': datetime.now().isoformat(),
+                'finished_at': None
+            })
+        
+        # Resolve all VMs and their MAC addresses up front, configs are fetched in parallel
+        vms = {vm_name: lookup_vm(vm_name) for vm_name in vm_names}
+        missing = [vm_name for vm_name, vm in vms.items() if vm is None]
+        for vm_name in missing:
+            logger.warning(f"VM '{vm_name}' not found. It may have been already removed.")
+            unschedule_vm_deletion(vm_name)
+        vms = {vm_name: vm for vm_name, vm in vms.items() if vm is not None}
+        get_vm_configs(list(vms.values()))
+        
+        templates = get_training_templates()
+        if not templates:
+            logger.warning("Could not load training templates, DHCP reservations will not be removed")
+        dhcp_targets = {}  # Format: {vm_name: (mac, dhcp_server_id)}
+        for vm_name in vms:
+            matching_template = find_matching_template(vm_name, templates) if templates else None
+            dhcp_server_id = matching_template.get('dhcp_server_id') if matching_template else None
+            vm_mac = get_vm_mac_address(vm_name) if dhcp_server_id else None
+            if vm_mac:
+                dhcp_targets[vm_name] = (vm_mac, dhcp_server_id)
+        
+        nodes = {vm['node'] for vm in vms.values()}
+        node_slots = {node: threading.Semaphore(removal_concurrency_per_node) for node in nodes}
+        logger.info(f"Removing {len(vms)} VMs across {len(nodes)} nodes, "
+                    f"up to {removal_concurrency_per_node} at a time per node")
+        if vms:
+            with ThreadPoolExecutor(max_workers=len(nodes) * removal_concurrency_per_node) as executor:
+                list(executor.map(lambda item: _remove_one(item[0], item[1]['node'], node_slots), vms.items()))
+        
+        # One FortiGate update per DHCP server instead of one per VM
+        with removal_progress_lock:
+            removed_vms = missing + list(removal_progress['removed'])
+            failed_removals = [entry['name'] for entry in removal_progress['failed']]
+        macs_by_server = {}
+        for vm_name in removed_vms:
+            if vm_name in dhcp_targets:
+                vm_mac, dhcp_server_id = dhcp_targets[vm_name]
+                macs_by_server.setdefault(dhcp_server_id, []).append(vm_mac)
+        dhcp_removed = 0
+        for dhcp_server_id, macs in macs_by_server.items():
+            try:
+                dhcp_removed += fortigate.remove_dhcp_reservations(macs, dhcp_server_id)
+            except Exception as e:
+                logger.error(f"Failed to remove DHCP reservations on server {dhcp_server_id}: {str(e)}")
+        
+        with removal_progress_lock:
+            removal_progress.update(status='completed', finished_at=datetime.now().isoformat())
+        logger.info(f"Removal process completed. "
+                    f"Total: {len(vm_names)}, "
+                    f"Successfully removed: {len(removed_vms)}, "
+                    f"Failed removals: {len(failed_removals)}, "
+                    f"DHCP reservations removed: {dhcp_removed}")
+        return {
+            "message": f"Removal process completed. {len(removed_vms)} VMs removed, {len(failed_removals)} failed.",
+            "removed_vms": removed_vms,
+            "failed_removals": failed_removals,
+            "dhcp_reservations_removed": dhcp_removed
+        }
+    finally:
+        release_slot(run_lease)
+
+def get_removal_progress():
+    """Return the progress of the current or last removal run."""
+    with removal_progress_lock:
+        if not removal_progress:
+            return {'status': 'idle'}
+        progress = dict(removal_progress)
+        progress['in_progress'] = {node: list(names) for node, names in removal_progress['in_progress'].items() if names}
+        progress['removed'] = list(removal_progress['removed'])
+        progress['failed'] = list(removal_progress['failed'])
+    progress['done'] = len(progress['removed']) + len(progress['failed'])
+    return progress
+
 def remove_due_vms():
     """Immediately remove all VMs that are past their deletion date."""
     logger.info("Starting immediate removal of VMs past their deletion date")
-    removed_vms = []
-    failed_removals = []
 
     # Get list of due VMs
     scheduled = get_scheduled_deletions()
@@ -915,68 +3844,16 @@ def remove_due_vms():
             "failed_removals": []
         }
 
-    for vm in due_vms:
-        time.sleep(60)
-        vm_name = vm['name']
-        info = vm['info']
-        logger.info(f"Attempting to remove due VM {vm_name} (ID: {info['id']})")
-        
-        vmid, node = get_vm_id_and_node(vm_name)
-        if vmid is None or node is None:
-            logger.warning(f"VM '{vm_name}' not found. It may have been already removed.")
-            removed_vms.append(vm_name)
-            with deletion_lock:
-                if vm_name in vms_scheduled_for_deletion:
-                    del vms_scheduled_for_deletion[vm_name]
-            continue
-
-        # Get MAC address before removing the VM
-        vm_mac = None
-        dhcp_server_id = None
-        
-        templates = get_training_templates()
-        if templates:
-            vm_mac = get_vm_mac_address(vm_name)
-            if vm_mac:
-                matching_template = find_matching_template(vm_name, templates)
-                if matching_template:
-                    dhcp_server_id = matching_template.get('dhcp_server_id')
-
-        result = remove_vm(VM(name=vm_name, template_id=None))
-        
-        if "has been stopped and removed" in result:
-            logger.info(f"Successfully removed VM {vm_name} (ID: {info['id']})")
-            
-            # Remove DHCP reserveration at FortiGate
-            if vm_mac and dhcp_server_id:
-                try:
-                    fortigate.remove_dhcp_reservations(vm_mac, dhcp_server_id)
-                    logger.info(f"Successfully removed DHCP reservation for {vm_name}")
-                except Exception as e:
-                    logger.error(f"Failed to remove DHCP reservation for {vm_name}: {str(e)}")
-            
-            removed_vms.append(vm_name)
-            with deletion_lock:
-                if vm_name in vms_scheduled_for_deletion:
-                    del vms_scheduled_for_deletion[vm_name]
-        else:
-            logger.error(f"Failed to remove VM {vm_name} (ID: {info['id']}). Result: {result}")
-            failed_removals.append(vm_name)
-
-    total_due = len(due_vms)
-    total_removed = len(removed_vms)
-    total_failed = len(failed_removals)
-
-    logger.info(f"Due VMs removal process completed. "
-                f"Total due: {total_due}, "
-                f"Successfully removed: {total_removed}, "
-                f"Failed removals: {total_failed}")
-
-    return {
-        "message": f"Removal process completed. {total_removed} VMs removed, {total_failed} failed.",
-        "removed_vms": removed_vms,
-        "failed_removals": failed_removals
-    }
-
-# Start the background check thread
-start_background_check()
\ No newline at end of file
+    return remove_vms_pipeline([vm['name'] for vm in due_vms])
+
+_init_state_db()
+_init_slot_leases()
+_init_deletion_schedule()
+_init_vm_tag_state()
+_init_boot_model()
+_init_placement_reservations()
+_init_storage_history()
+_init_vmid_blocks()
+_init_seat_macs()
+_init_spare_seats()
+_init_seat_snapshots()
@@ -102,6 +102,18 @@ def sanitize_training_name(name):
     sanitized = sanitized[:63]
     return sanitized
 
+def build_vm_name(seat, sanitized_training_name):
+    vm_name = f"{seat['first_name']}-{seat['last_name']}-{sanitized_training_name}"
+
+    # Ensure the entire vm_name is not longer than 63 characters
+    if len(vm_name) > 63:
+        # If it's too long, truncate the sanitized_training_name part
+        max_training_name_length = 63 - len(f"{seat['first_name']}-{seat['last_name']}-") - 1  # -1 for extra hyphen
+        vm_name = f"{seat['first_name']}-{seat['last_name']}-{sanitized_training_name[:max_training_name_length]}"
+
+    # Ensure the vm_name doesn't end with a hyphen
+    return vm_name.rstrip('-')
+
 def sanitize_name(name):
     # Remove leading/trailing whitespace
     name = name.strip()
@@ -281,6 +293,14 @@ def create_training_seats():
         training_dates['start_date'] = formatted_start_date
         training_dates['end_date'] = formatted_end_date
         break
+
+    # Seats of a future training are parked until their start date
+    park_mode = "shutdown"
+    if start_date.date() > datetime.now().date():
+        park_mode = select("Until the training starts, seats should be", options=[
+            ("Shut down", "shutdown"),
+            ("Hibernated to disk (resume instead of a cold boot on day one)", "hibernate")
+        ], required=True)
     
     # Get student names
     students_input = textarea("Enter student names (one per line):", rows=10)
@@ -320,7 +340,7 @@ def create_training_seats():
     num_seats = len(seats)
     put_info(f"Number of valid seats to create: {num_seats}")
 
-    total_steps = len(seats) * 12  # Adjust the number of steps if needed
+    total_steps = len(seats) * 13  # Adjust the number of steps if needed
     
     current_step = 0
     deployed_users = []
@@ -328,487 +348,652 @@ def create_training_seats():
     user_passwords = {}
     vm_details = {}
 
-    for idx, seat in enumerate(seats):
-        # Step 1: Find best node for selected date
-        current_step += 1
-        put_info(f"Finding the best available node for {seat['first_name']} {seat['last_name']} on {training_dates['start_date']}... ({current_step}/{total_steps})")
-        with put_loading():
-            response = requests.get(f"{API_BASE_URL}/v1/pve/evaluate-nodes-for-date/{training_dates['start_date']}")
-        if response.status_code != 200:
-            put_error(f"Failed to get the best available node. Error: {response.text}")
-            continue
-
-        best_node = response.json().get('best_node')
-        if not best_node:
-            put_error("No suitable node found for the given date.")
-            continue
-
-        put_success(f"Best node selected for {training_dates['start_date']}: {best_node}")
-
-        # Get the template ID for the best node
-        template_id = selected_template["template_ids"].get(best_node)
-        if not template_id:
-            put_error(f"No template ID found for node {best_node}")
-            continue
-
-        # Create VM name using the sanitized training name
-        vm_name = f"{seat['first_name']}-{seat['last_name']}-{sanitized_training_name}"
-
-        # Ensure the entire vm_name is not longer than 63 characters
-        if len(vm_name) > 63:
-            # If it's too long, truncate the sanitized_training_name part
-            max_training_name_length = 63 - len(f"{seat['first_name']}-{seat['last_name']}-") - 1  # -1 for extra hyphen
-            vm_name = f"{seat['first_name']}-{seat['last_name']}-{sanitized_training_name[:max_training_name_length]}"
-
-        # Ensure the vm_name doesn't end with a hyphen
-        vm_name = vm_name.rstrip('-')
+    # Create VM names using the sanitized training name
+    for seat in seats:
+        seat['vm_name'] = build_vm_name(seat, sanitized_training_name)
+
+    # Place all seats at once so the whole training window and the rest of the batch are considered
+    put_info(f"Planning node placement for {num_seats} seats from {training_dates['start_date']} to {training_dates['end_date']}...")
+    with put_loading():
+        response = requests.post(f"{API_BASE_URL}/v1/pve/place-seats", json={
+            "vm_names": [seat['vm_name'] for seat in seats],
+            "template_ids": selected_template["template_ids"],
+            "start_date": training_dates['start_date'],
+            "end_date": training_dates['end_date']
+        })
+    if response.status_code != 200:
+        put_error(f"Failed to plan node placement. Error: {response.text}")
+        return
+    placements = {a['vm_name']: a for a in response.json().get('assignments', [])}
 
-        # Step 2: Create VM
-        current_step += 1
-        put_info(f"Creating VM for {vm_name} on node {best_node}... ({current_step}/{total_steps})")
+    # Take ready seats from the training's spare pool first, only the rest is cloned
+    spares = {}
+    if selected_template.get("spare_pool"):
         with put_loading():
-            response = requests.post(f"{API_BASE_URL}/v1/pve/create-linked-clone", json={
-                "name": vm_name,
-                "template_id": template_id,
-                "node": best_node
+            response = requests.post(f"{API_BASE_URL}/v1/pve/spare-seats/claim", json={
+                "seats": {vm_name: placement['node'] for vm_name, placement in placements.items()},
+                "template_ids": selected_template["template_ids"]
             })
-        if response.status_code != 200:
-            put_error(f"Failed to create VM for {vm_name}.")
-            continue
+        if response.status_code == 200:
+            spares = response.json()['claimed']
+            put_info(f"Claimed {len(spares)} spare seats, {len(placements) - len(spares)} seats need to be cloned")
+        else:
+            put_warning(f"Could not claim spare seats, cloning all seats instead. Error: {response.text}")
+    to_clone = {vm_name: placement for vm_name, placement in placements.items() if vm_name not in spares}
 
-        time.sleep(5)
+    seat_macs = {}
+    seat_addresses = {}
+    # Whatever happens during the deployment, the VM IDs, MACs and IPs that were not used go back to the pool
+    try:
+        # Reserve a block of VM IDs for this ticket so parallel clones never collide
+        if to_clone:
+            with put_loading():
+                response = requests.post(f"{API_BASE_URL}/v1/pve/vmid-blocks", json={
+                    "owner": ticket_number,
+                    "count": len(to_clone)
+                })
+            if response.status_code == 200:
+                vmid_block = response.json()
+                put_info(f"Reserved VM IDs {vmid_block['start']}-{vmid_block['end']} for ticket {ticket_number}")
+            else:
+                put_warning(f"Could not reserve a VM ID block, falling back to single allocations. Error: {response.text}")
 
-        # Step 3: Adding tags to VM
-        current_step += 1
-        put_info(f"Adding tags to VM {vm_name}... ({current_step}/{total_steps})")
-        tags = [
-            f"start-{training_dates['start_date']}",
-            f"end-{training_dates['end_date']}"
-        ]
+        # Give every seat its stable MAC up front so its DHCP reservation can be made before the first boot
         with put_loading():
-            response = requests.post(f"{API_BASE_URL}/v1/pve/add-tags-to-vm", json={
-                "vm_name": vm_name,
-                "tags": tags
-            })
-        if response.status_code != 200:
-            put_error(f"Failed to add tags to VM {vm_name}. Error: {response.text}")
+            response = requests.post(f"{API_BASE_URL}/v1/pve/seat-macs", json={"vm_names": list(to_clone)})
+        if response.status_code == 200:
+            seat_macs = response.json()['macs']
+        else:
+            put_warning(f"Could not assign seat MACs, reading them from the VMs after boot instead. Error: {response.text}")
 
-        time.sleep(5)
+        # Cloud-init templates get their IP reserved now and written into the clone, so nothing waits for the guest to boot
+        if selected_template.get("cloud_init") and seat_macs:
+            with put_loading():
+                response = requests.post(f"{API_BASE_URL}/v1/pve/seat-addresses", json={
+                    "seats": {seat['vm_name']: f"{seat['first_name'].lower()}.{seat['last_name'].lower()}"
+                              for seat in seats if seat['vm_name'] in to_clone},
+                    "dhcp_server_id": dhcp_server_id
+                })
+            if response.status_code == 200:
+                seat_addresses = response.json()['addresses']
+                for vm_name, error in response.json()['errors'].items():
+                    put_warning(f"No IP allocated up front for {vm_name}, it will use DHCP. Error: {error}")
+            else:
+                put_warning(f"Could not allocate seat IPs up front, seats will use DHCP. Error: {response.text}")
 
-        # Step 4: Starting VM
-        current_step += 1
-        put_info(f"Starting VM {vm_name}... ({current_step}/{total_steps})")
+        # Clone all planned seats in one batch; the API runs them in parallel within per-node and per-storage limits
+        put_info(f"Creating {len(to_clone)} VMs in parallel...")
         with put_loading():
-            response = requests.post(f"{API_BASE_URL}/v1/pve/start-vm/{vm_name}")
+            response = requests.post(f"{API_BASE_URL}/v1/pve/clone-batch", json={
+                "clones": [
+                    {
+                        "name": vm_name,
+                        "template_id": placement['template_id'],
+                        "node": placement['node'],
+                        "owner": ticket_number,
+                        "mac": seat_macs.get(vm_name),
+                        "ip_address": seat_addresses.get(vm_name, {}).get('ip_address'),
+                        "dhcp_server_id": dhcp_server_id if vm_name in seat_addresses else None
+                    }
+                    for vm_name, placement in to_clone.items()
+                ]
+            })
         if response.status_code != 200:
-            put_error(f"Failed to start VM {vm_name}. Error: {response.text}")
-
-        time.sleep(30)
+            put_error(f"Failed to create VMs. Error: {response.text}")
+            return
+        clone_jobs = {job['name']: job for job in response.json().get('clones', [])}
+        for vm_name, spare in spares.items():
+            # A running spare already has a DHCP lease, so it is reserved after boot like a VM without a known MAC
+            clone_jobs[vm_name] = dict(spare, status='done', mac=None if spare['running'] else spare['mac'])
+
+        for idx, seat in enumerate(seats):
+            vm_name = seat['vm_name']
+
+            # Step 1: Look up the planned node for this seat
+            current_step += 1
+            put_info(f"Looking up the planned node for {seat['first_name']} {seat['last_name']}... ({current_step}/{total_steps})")
+            placement = placements.get(vm_name)
+            if not placement:
+                put_error(f"No node planned for {vm_name}.")
+                continue
+
+            best_node = spares[vm_name]['node'] if vm_name in spares else placement['node']
+            put_success(f"Node selected for {training_dates['start_date']} - {training_dates['end_date']}: {best_node} "
+                        f"(projected peak load {placement['peak_load_ratio']:.0%})")
+
+            # Step 2: Check the VM created by the clone batch
+            current_step += 1
+            put_info(f"Checking VM for {vm_name} on node {best_node}... ({current_step}/{total_steps})")
+            clone_job = clone_jobs.get(vm_name)
+            if not clone_job or clone_job['status'] != 'done':
+                put_error(f"Failed to create VM for {vm_name}. Error: {clone_job['error'] if clone_job else 'not cloned'}")
+                continue
+            if vm_name in spares:
+                put_success(f"VM {vm_name} taken from the spare pool with ID {clone_job['vmid']} on node {best_node}")
+            else:
+                put_success(f"VM {vm_name} created with ID {clone_job['vmid']} on node {best_node}")
+            vm_details[vm_name] = {"node": best_node, "vmid": clone_job['vmid']}
+            seat_name = f"{seat['first_name'].lower()}.{seat['last_name'].lower()}"
+            assigned_ip = clone_job.get('ip_address')
+            if assigned_ip:
+                vm_details[vm_name].update(mac_address=clone_job['mac'], dhcp_ip=assigned_ip)
+                put_success(f"VM {vm_name} configured with static IP {assigned_ip} via cloud-init")
+            elif vm_name in seat_addresses:
+                # The IP could not be written to the clone, give its reservation back and fall back to DHCP
+                put_warning(f"Could not configure static IP for {vm_name}, falling back to DHCP. Error: {clone_job.get('network_error')}")
+                requests.post(f"{API_BASE_URL}/v1/fortigate/remove-dhcp-reservations", json={
+                    "seat_macs": [seat_addresses[vm_name]['mac']],
+                    "dhcp_server_id": dhcp_server_id
+                })
+
+            # Step 3: Adding tags to VM
+            current_step += 1
+            put_info(f"Adding tags to VM {vm_name}... ({current_step}/{total_steps})")
+            tags = [
+                f"start-{training_dates['start_date']}",
+                f"end-{training_dates['end_date']}"
+            ]
+            with put_loading():
+                response = requests.post(f"{API_BASE_URL}/v1/pve/add-tags-to-vm", json={
+                    "vm_name": vm_name,
+                    "tags": tags
+                })
+            if response.status_code != 200:
+                put_error(f"Failed to add tags to VM {vm_name}. Error: {response.text}")
+
+            # Reserve the seat's IP for its known MAC before the first boot, so the guest gets it on its first DHCP request
+            if clone_job.get('mac') and not assigned_ip:
+                vm_details[vm_name]['mac_address'] = clone_job['mac']
+                try:
+                    with put_loading():
+                        response = requests.post(f"{API_BASE_URL}/v1/fortigate/add-dhcp-reservation", json={
+                            "mac": clone_job['mac'],
+                            "seat": seat_name,
+                            "dhcp_server_id": dhcp_server_id
+                        })
+                    if response.status_code == 200:
+                        assigned_ip = response.json()["assigned_ip"]
+                        vm_details[vm_name]['dhcp_ip'] = assigned_ip
+                        put_success(f"DHCP reservation created for VM {vm_name} before boot: {clone_job['mac']} -> {assigned_ip}")
+                    else:
+                        put_warning(f"Could not reserve DHCP before boot for VM {vm_name}, retrying after boot. Error: {response.text}")
+                except Exception as e:
+                    put_warning(f"Could not reserve DHCP before boot for VM {vm_name}, retrying after boot. Error: {str(e)}")
+
+            # Step 4: Starting VM
+            current_step += 1
+            put_info(f"Starting VM {vm_name}... ({current_step}/{total_steps})")
+            if clone_job.get('running'):
+                put_success(f"VM {vm_name} is a pre-booted spare and already running")
+                requests.post(f"{API_BASE_URL}/v1/pve/seat-ips", json={"vm_names": [vm_name]})
+            else:
+                with put_loading():
+                    response = requests.post(f"{API_BASE_URL}/v1/pve/start-vm/{vm_name}")
+                    if response.status_code == 200:
+                        # Continue as soon as the start task has finished
+                        task = requests.get(f"{API_BASE_URL}/v1/pve/tasks/{response.json()['upid']}", params={"timeout": 60}).json()
+                        if task.get('exitstatus') not in (None, 'OK'):
+                            put_warning(f"Start task for {vm_name} finished with: {task['exitstatus']}")
+                if response.status_code != 200:
+                    put_error(f"Failed to start VM {vm_name}. Error: {response.text}")
+                else:
+                    # Start IP discovery now so it overlaps with the user setup below
+                    requests.post(f"{API_BASE_URL}/v1/pve/seat-ips", json={"vm_names": [vm_name]})
 
-        # Step 5: Check if user exists in Authentik, create if not, and add to "Trainingsteilnehmer" group
-        current_step += 1
-        put_info(f"Checking/Creating Authentik user for {seat['first_name']} {seat['last_name']} and adding to group... ({current_step}/{total_steps})")
+            # Step 5: Check if user exists in Authentik, create if not, and add to "Trainingsteilnehmer" group
+            current_step += 1
+            put_info(f"Checking/Creating Authentik user for {seat['first_name']} {seat['last_name']} and adding to group... ({current_step}/{total_steps})")
 
-        username = f"{seat['first_name'].lower()}.{seat['last_name'].lower()}"
-        email = f"{username}@infinigate-labs.com"
+            username = f"{seat['first_name'].lower()}.{seat['last_name'].lower()}"
+            email = f"{username}@infinigate-labs.com"
 
-        authentik_user_data = {
-            "username": username,
-            "email": email,
-            "name": f"{seat['first_name']} {seat['last_name']}",
-            "password": generate_password()
-        }
+            authentik_user_data = {
+                "username": username,
+                "email": email,
+                "name": f"{seat['first_name']} {seat['last_name']}",
+                "password": generate_password()
+            }
 
-        # Create or check user
-        put_text("Creating/Checking Authentik user...")
-        with put_loading():
-            create_response = requests.post(f"{API_BASE_URL}/v1/authentik/users", json=authentik_user_data)
-            response_json = create_response.json()
-
-        if "message" in response_json and "already exists" in response_json["message"]:
-            put_warning(f"User {username} already exists in Authentik. Skipping creation.")
-            user_passwords[username] = "user has already been created at an earlier date"
-        elif create_response.status_code == 200:
-            put_success(f"Authentik user {username} created successfully.")
-            user_passwords[username] = authentik_user_data["password"]
-        else:
-            error_message = response_json.get("message", create_response.text)
-            put_error(f"Failed to create Authentik user for {username}. Error: {error_message}")
-            user_passwords[username] = "Failed to create user"
-            put_info("Skipping to next user...")
-            continue  # Skip to next iteration if user creation failed
-
-        # Get user ID
-        put_text("Getting user ID...")
-        with put_loading():
-            user_id_response = requests.get(f"{API_BASE_URL}/v1/authentik/users/{username}")
-        if user_id_response.status_code == 200:
-            user_id = user_id_response.json()["user_id"]
-            put_info(f"User ID retrieved for {username}")
-        else:
-            put_error(f"Failed to get user ID for {username}. Error: {user_id_response.text}")
-            put_info("Skipping to next user...")
-            continue  # Skip to next iteration if we couldn't get the user ID
+            # Create or check user
+            put_text("Creating/Checking Authentik user...")
+            with put_loading():
+                create_response = requests.post(f"{API_BASE_URL}/v1/authentik/users", json=authentik_user_data)
+                response_json = create_response.json()
+
+            if "message" in response_json and "already exists" in response_json["message"]:
+                put_warning(f"User {username} already exists in Authentik. Skipping creation.")
+                user_passwords[username] = "user has already been created at an earlier date"
+            elif create_response.status_code == 200:
+                put_success(f"Authentik user {username} created successfully.")
+                user_passwords[username] = authentik_user_data["password"]
+            else:
+                error_message = response_json.get("message", create_response.text)
+                put_error(f"Failed to create Authentik user for {username}. Error: {error_message}")
+                user_passwords[username] = "Failed to create user"
+                put_info("Skipping to next user...")
+                continue  # Skip to next iteration if user creation failed
+
+            # Get user ID
+            put_text("Getting user ID...")
+            with put_loading():
+                user_id_response = requests.get(f"{API_BASE_URL}/v1/authentik/users/{username}")
+            if user_id_response.status_code == 200:
+                user_id = user_id_response.json()["user_id"]
+                put_info(f"User ID retrieved for {username}")
+            else:
+                put_error(f"Failed to get user ID for {username}. Error: {user_id_response.text}")
+                put_info("Skipping to next user...")
+                continue  # Skip to next iteration if we couldn't get the user ID
 
-        # Get group ID for "Trainingsteilnehmer"
-        put_text("Getting group ID...")
-        with put_loading():
-            group_id_response = requests.get(f"{API_BASE_URL}/v1/authentik/groups/Trainingsteilnehmer")
-        if group_id_response.status_code == 200:
-            group_id = group_id_response.json()["group_id"]
-            put_info("Group ID retrieved for Trainingsteilnehmer")
-        else:
-            put_error(f"Failed to get group ID for Trainingsteilnehmer. Error: {group_id_response.text}")
-            put_info("Skipping to next user...")
-            continue  # Skip to next iteration if we couldn't get the group ID
+            # Get group ID for "Trainingsteilnehmer"
+            put_text("Getting group ID...")
+            with put_loading():
+                group_id_response = requests.get(f"{API_BASE_URL}/v1/authentik/groups/Trainingsteilnehmer")
+            if group_id_response.status_code == 200:
+                group_id = group_id_response.json()["group_id"]
+                put_info("Group ID retrieved for Trainingsteilnehmer")
+            else:
+                put_error(f"Failed to get group ID for Trainingsteilnehmer. Error: {group_id_response.text}")
+                put_info("Skipping to next user...")
+                continue  # Skip to next iteration if we couldn't get the group ID
 
-        # Add user to group
-        put_text("Adding user to group...")
-        with put_loading():
-            add_to_group_response = requests.post(f"{API_BASE_URL}/v1/authentik/add-user-to-group", json={
-                "user_id": user_id,
-                "group_id": group_id
-            })
-        if add_to_group_response.status_code == 200:
-            put_success(f"User {username} added to Trainingsteilnehmer group successfully.")
-        else:
-            put_error(f"Failed to add user {username} to Trainingsteilnehmer group. Error: {add_to_group_response.text}")
+            # Add user to group
+            put_text("Adding user to group...")
+            with put_loading():
+                add_to_group_response = requests.post(f"{API_BASE_URL}/v1/authentik/add-user-to-group", json={
+                    "user_id": user_id,
+                    "group_id": group_id
+                })
+            if add_to_group_response.status_code == 200:
+                put_success(f"User {username} added to Trainingsteilnehmer group successfully.")
+            else:
+                put_error(f"Failed to add user {username} to Trainingsteilnehmer group. Error: {add_to_group_response.text}")
 
-        put_info("Waiting 5 seconds before proceeding...")
-        time.sleep(5)
+            put_info("Waiting 5 seconds before proceeding...")
+            time.sleep(5)
 
-        # Step 6: Check if user exists in Guacamole, create if not
-        current_step += 1
-        put_info(f"Checking if Guacamole user exists for {seat['first_name']} {seat['last_name']}... ({current_step}/{total_steps})")
-        guacamole_username = f"{seat['first_name'].lower()}.{seat['last_name'].lower()}@infinigate-labs.com"
+            # Step 6: Check if user exists in Guacamole, create if not
+            current_step += 1
+            put_info(f"Checking if Guacamole user exists for {seat['first_name']} {seat['last_name']}... ({current_step}/{total_steps})")
+            guacamole_username = f"{seat['first_name'].lower()}.{seat['last_name'].lower()}@infinigate-labs.com"
 
-        try:
-            with put_loading():
-                logging.debug(f"Attempting to fetch users from: {API_BASE_URL}/v1/guacamole/list-users")
-                response = requests.get(f"{API_BASE_URL}/v1/guacamole/list-users")
-                logging.debug(f"Response status code: {response.status_code}")
-                logging.debug(f"Response content: {response.text[:1000]}...")  # Log first 1000 characters
+            try:
+                with put_loading():
+                    logging.debug(f"Attempting to fetch users from: {API_BASE_URL}/v1/guacamole/list-users")
+                    response = requests.get(f"{API_BASE_URL}/v1/guacamole/list-users")
+                    logging.debug(f"Response status code: {response.status_code}")
+                    logging.debug(f"Response content: {response.text[:1000]}...")  # Log first 1000 characters
 
-            if response.status_code == 200:
-                try:
-                    response_data = response.json()
-                    users = response_data.get('users', {})
+                if response.status_code == 200:
+                    try:
+                        response_data = response.json()
+                        users = response_data.get('users', {})
                     
-                    user_exists = guacamole_username in users
+                        user_exists = guacamole_username in users
                     
-                    if user_exists:
-                        put_warning(f"Guacamole user {guacamole_username} already exists. Skipping creation.")
-                    else:
-                        put_info(f"Creating Guacamole user for {guacamole_username}...")
-                        create_response = requests.post(f"{API_BASE_URL}/v1/guacamole/users/{guacamole_username}")
-                        if create_response.status_code == 200:
-                            put_success(f"Guacamole user created for {guacamole_username}")
+                        if user_exists:
+                            put_warning(f"Guacamole user {guacamole_username} already exists. Skipping creation.")
                         else:
-                            put_error(f"Failed to create Guacamole user for {guacamole_username}. Error: {create_response.text}")
-                except json.JSONDecodeError:
-                    logging.error("Failed to parse JSON response")
-                    put_error("Failed to parse response from Guacamole API")
-            else:
-                put_error(f"Failed to retrieve Guacamole users. Status code: {response.status_code}, Error: {response.text}")
-        except Exception as e:
-            logging.exception("An error occurred during Guacamole user check/creation")
-            put_error(f"An error occurred during Guacamole user check/creation: {str(e)}")
+                            put_info(f"Creating Guacamole user for {guacamole_username}...")
+                            create_response = requests.post(f"{API_BASE_URL}/v1/guacamole/users/{guacamole_username}")
+                            if create_response.status_code == 200:
+                                put_success(f"Guacamole user created for {guacamole_username}")
+                            else:
+                                put_error(f"Failed to create Guacamole user for {guacamole_username}. Error: {create_response.text}")
+                    except json.JSONDecodeError:
+                        logging.error("Failed to parse JSON response")
+                        put_error("Failed to parse response from Guacamole API")
+                else:
+                    put_error(f"Failed to retrieve Guacamole users. Status code: {response.status_code}, Error: {response.text}")
+            except Exception as e:
+                logging.exception("An error occurred during Guacamole user check/creation")
+                put_error(f"An error occurred during Guacamole user check/creation: {str(e)}")
 
-        time.sleep(2)
+            time.sleep(2)
 
-        # Step 7: Find Proxmox Seat IP
-        current_step += 1
-        put_info(f"Finding Proxmox IP for seat {vm_name}, but let's wait a bit.... ({current_step}/{total_steps})")
-        try:
-            with put_loading():
-                time.sleep(30)
-                response = requests.get(f"{API_BASE_URL}/v1/pve/find-seat-ip-pve/{vm_name}")
-            if response.status_code == 200:
-                seat_info = response.json()
-                if 'ip_address' in seat_info and isinstance(seat_info['ip_address'], dict):
-                    ip_info = seat_info['ip_address']
-                    seat_ip_proxmox = ip_info.get('ip_address')
-                    node = ip_info.get('node')
-                    vmid = ip_info.get('vmid')
+            # Step 7: Find Proxmox Seat IP
+            current_step += 1
+            put_info(f"Finding Proxmox IP for seat {vm_name}... ({current_step}/{total_steps})")
+            try:
+                with put_loading():
+                    response = requests.get(f"{API_BASE_URL}/v1/pve/seat-ip/{vm_name}/wait", params={"timeout": 240})
+                if response.status_code == 200:
+                    seat_info = response.json()
+                    if 'ip_address' in seat_info and isinstance(seat_info['ip_address'], dict):
+                        ip_info = seat_info['ip_address']
+                        seat_ip_proxmox = ip_info.get('ip_address')
+                        node = ip_info.get('node')
+                        vmid = ip_info.get('vmid')
                     
-                    # Store VM details using the correct, sanitized vm_name
-                    vm_details[vm_name] = {
-                        "ip": seat_ip_proxmox,
-                        "node": node,
-                        "vmid": vmid,
-                    }
-
-                    success_message = f"IP address for seat {vm_name}: {seat_ip_proxmox}"
-                    if node and vmid:
-                        success_message += f" (Node: {node}, VMID: {vmid})"
-                    put_success(success_message)
+                        # Store VM details using the correct, sanitized vm_name
+                        vm_details[vm_name].update({
+                            "ip": seat_ip_proxmox,
+                            "node": node,
+                            "vmid": vmid,
+                        })
+
+                        success_message = f"IP address for seat {vm_name}: {seat_ip_proxmox}"
+                        if node and vmid:
+                            success_message += f" (Node: {node}, VMID: {vmid})"
+                        put_success(success_message)
+                    else:
+                        put_error(f"Failed to find IP for seat {vm_name}.")
                 else:
-                    put_error(f"Failed to find IP for seat {vm_name}.")
-            else:
-                put_error(f"Failed to find IP for seat {vm_name}. Error: {response.text}")
-        except Exception as e:
-            put_error(f"An error occurred while finding Proxmox IP: {str(e)}")
+                    put_error(f"Failed to find IP for seat {vm_name}. Error: {response.text}")
+            except Exception as e:
+                put_error(f"An error occurred while finding Proxmox IP: {str(e)}")
 
-        # Step 8: Create connection group, create connections, and add them to Guacamole User
-        current_step += 1
-        put_info(f"Creating connections in Guacamole and adding them to {seat['first_name']} {seat['last_name']}... ({current_step}/{total_steps})")
+            # Step 8: Create connection group, create connections, and add them to Guacamole User
+            current_step += 1
+            put_info(f"Creating connections in Guacamole and adding them to {seat['first_name']} {seat['last_name']}... ({current_step}/{total_steps})")
 
-        if selected_template:
-            # Create connection group name using sanitized training name and start date
-            connection_group_name = f"{sanitized_training_name}-{training_dates['start_date']}"
+            if selected_template:
+                # Create connection group name using sanitized training name and start date
+                connection_group_name = f"{sanitized_training_name}-{training_dates['start_date']}"
             
-            try:
-                # First check if connection group exists
-                response = requests.get(f"{API_BASE_URL}/v1/guacamole/connection-groups")
-                response.raise_for_status()
-                groups = response.json().get("connection_groups", {})
-                
-                connection_group_id = None
-                for group_id, group in groups.items():
-                    if group.get("name") == connection_group_name and group.get("parentIdentifier") == "ROOT":
-                        connection_group_id = group.get("identifier")
-                        put_info(f"Found existing connection group: {connection_group_name} (ID: {connection_group_id})")
-                        break
-                
-                # Create group only if it doesn't exist
-                if not connection_group_id:
-                    connection_group_data = {
-                        "name": connection_group_name,
-                        "parent_identifier": "ROOT",
-                        "type": "ORGANIZATIONAL"
-                    }
-                    response = requests.post(f"{API_BASE_URL}/v1/guacamole/connection-groups", json=connection_group_data)
-                    response.raise_for_status()
-                    
-                    # Get the new group's identifier
-                    time.sleep(2)
+                try:
+                    # First check if connection group exists
                     response = requests.get(f"{API_BASE_URL}/v1/guacamole/connection-groups")
                     response.raise_for_status()
                     groups = response.json().get("connection_groups", {})
-                    
+                
+                    connection_group_id = None
                     for group_id, group in groups.items():
                         if group.get("name") == connection_group_name and group.get("parentIdentifier") == "ROOT":
                             connection_group_id = group.get("identifier")
-                            put_success(f"Created new connection group: {connection_group_name} (ID: {connection_group_id})")
+                            put_info(f"Found existing connection group: {connection_group_name} (ID: {connection_group_id})")
                             break
                 
-                if not connection_group_id:
-                    raise Exception(f"Could not find or create connection group: {connection_group_name}")
+                    # Create group only if it doesn't exist
+                    if not connection_group_id:
+                        connection_group_data = {
+                            "name": connection_group_name,
+                            "parent_identifier": "ROOT",
+                            "type": "ORGANIZATIONAL"
+                        }
+                        response = requests.post(f"{API_BASE_URL}/v1/guacamole/connection-groups", json=connection_group_data)
+                        response.raise_for_status()
+                    
+                        # Get the new group's identifier
+                        time.sleep(2)
+                        response = requests.get(f"{API_BASE_URL}/v1/guacamole/connection-groups")
+                        response.raise_for_status()
+                        groups = response.json().get("connection_groups", {})
+                    
+                        for group_id, group in groups.items():
+                            if group.get("name") == connection_group_name and group.get("parentIdentifier") == "ROOT":
+                                connection_group_id = group.get("identifier")
+                                put_success(f"Created new connection group: {connection_group_name} (ID: {connection_group_id})")
+                                break
                 
-                put_success(f"Created connection group: {connection_group_name} (ID: {connection_group_id})")
+                    if not connection_group_id:
+                        raise Exception(f"Could not find or create connection group: {connection_group_name}")
                 
-                # Create connections within the new connection group
-                connections = selected_template["connections"]
-                for connection in connections:
-                    try:
-                        # Use the new prepare_connection_data function
-                        connection_data = prepare_connection_data(
-                            connection=connection,
-                            connection_group_id=connection_group_id,
-                            seat_ip_proxmox=seat_ip_proxmox,
-                            seat=seat
-                        )
+                    put_success(f"Created connection group: {connection_group_name} (ID: {connection_group_id})")
+                
+                    # Create connections within the new connection group
+                    connections = selected_template["connections"]
+                    for connection in connections:
+                        try:
+                            # Use the new prepare_connection_data function
+                            connection_data = prepare_connection_data(
+                                connection=connection,
+                                connection_group_id=connection_group_id,
+                                seat_ip_proxmox=seat_ip_proxmox,
+                                seat=seat
+                            )
                         
-                        # Create connection
-                        response = requests.post(f"{API_BASE_URL}/v2/guacamole/connections", json=connection_data)
-                        response.raise_for_status()
-                        result = response.json()
+                            # Create connection
+                            response = requests.post(f"{API_BASE_URL}/v2/guacamole/connections", json=connection_data)
+                            response.raise_for_status()
+                            result = response.json()
                         
-                        if 'connection_id' in result:
-                            connection_id = result['connection_id']
+                            if 'connection_id' in result:
+                                connection_id = result['connection_id']
                             
-                            # Add connection permission
-                            add_connection_data = {
-                                "username": guacamole_username,
-                                "connection_id": connection_id
-                            }
-                            response = requests.post(f"{API_BASE_URL}/v2/guacamole/add-to-connection", json=add_connection_data)
-                            response.raise_for_status()
+                                # Add connection permission
+                                add_connection_data = {
+                                    "username": guacamole_username,
+                                    "connection_id": connection_id
+                                }
+                                response = requests.post(f"{API_BASE_URL}/v2/guacamole/add-to-connection", json=add_connection_data)
+                                response.raise_for_status()
                             
-                            put_success(f"Connection {connection_data['name']} created and added to user {guacamole_username}")
-                        else:
-                            put_error(f"Failed to create connection {connection_data['name']}")
-                    except requests.RequestException as e:
-                        put_error(f"Failed to create or assign connection {connection_data['name']}: {str(e)}")
+                                put_success(f"Connection {connection_data['name']} created and added to user {guacamole_username}")
+                            else:
+                                put_error(f"Failed to create connection {connection_data['name']}")
+                        except requests.RequestException as e:
+                            put_error(f"Failed to create or assign connection {connection_data['name']}: {str(e)}")
                 
-                # Add user to connection group
-                try:
-                    response = requests.post(f"{API_BASE_URL}/v2/guacamole/add-to-connection-group", json={
-                        "username": guacamole_username,
-                        "connection_group_id": connection_group_id
-                    })
-                    response.raise_for_status()
-                    put_success(f"User {guacamole_username} added to connection group {connection_group_name}")
-                except requests.RequestException as e:
-                    put_error(f"Failed to add user to connection group: {str(e)}")
+                    # Add user to connection group
+                    try:
+                        response = requests.post(f"{API_BASE_URL}/v2/guacamole/add-to-connection-group", json={
+                            "username": guacamole_username,
+                            "connection_group_id": connection_group_id
+                        })
+                        response.raise_for_status()
+                        put_success(f"User {guacamole_username} added to connection group {connection_group_name}")
+                    except requests.RequestException as e:
+                        put_error(f"Failed to add user to connection group: {str(e)}")
                             
-            except Exception as e:
-                put_error(f"An error occurred while creating connection group and connections: {str(e)}")
-        else:
-            put_error(f"No template found for training: {selected_training}")
+                except Exception as e:
+                    put_error(f"An error occurred while creating connection group and connections: {str(e)}")
+            else:
+                put_error(f"No template found for training: {selected_training}")
 
-        time.sleep(2)
-        # After creating the user
-        deployed_users.append(f"{seat['first_name'].lower()}.{seat['last_name'].lower()}")
-        proxmox_uris[f"{seat['first_name'].lower()}.{seat['last_name'].lower()}"] = f"https://proxmox-{seat['first_name'].lower()}-{seat['last_name'].lower()}.student-access.infinigate-labs.com"
+            time.sleep(2)
+            # After creating the user
+            deployed_users.append(f"{seat['first_name'].lower()}.{seat['last_name'].lower()}")
+            proxmox_uris[f"{seat['first_name'].lower()}.{seat['last_name'].lower()}"] = f"https://proxmox-{seat['first_name'].lower()}-{seat['last_name'].lower()}.student-access.infinigate-labs.com"
         
-        # Step 9: Check if VM needs to be shut down
-        current_step += 1
-        put_info(f"Checking if VM needs to be shut down... ({current_step}/{total_steps})")
-
-        start_date = datetime.strptime(training_dates['start_date'], '%d-%m-%Y').date()
-        today = datetime.now().date()
+            # A cloud-init seat has its IP before it boots, so wait for its first boot to finish before it is snapshotted and parked
+            if clone_job.get('ip_address'):
+                put_info(f"Waiting for the guest of VM {vm_name} to finish its first boot...")
+                try:
+                    with put_loading():
+                        response = requests.get(f"{API_BASE_URL}/v1/pve/seat-ready/{vm_name}/wait", params={"timeout": 240})
+                    if response.status_code == 200:
+                        put_success(f"Guest of VM {vm_name} is up.")
+                    else:
+                        put_warning(f"Guest of VM {vm_name} did not report ready, continuing anyway. Error: {response.text}")
+                except requests.RequestException as e:
+                    put_warning(f"Could not check the guest of VM {vm_name}, continuing anyway. Error: {str(e)}")
 
-        if start_date > today:
-            put_info(f"Start date {start_date} is in the future. Attempting to shut down VM {vm_name}...")
+            # Snapshot the deployed seat, so it can later be reset in seconds without redeploying
+            current_step += 1
+            put_info(f"Taking clean snapshot of VM {vm_name}... ({current_step}/{total_steps})")
             try:
-                response = requests.post(f"{API_BASE_URL}/v1/pve/shutdown-vm/{vm_name}")
-                response.raise_for_status()
-                put_success(f"Shutdown command sent for VM {vm_name}.")
+                with put_loading():
+                    response = requests.post(f"{API_BASE_URL}/v1/pve/seats/{vm_name}/clean-snapshot", params={"cohort": ticket_number})
+                if response.status_code == 200:
+                    put_success(f"Clean snapshot of VM {vm_name} taken.")
+                else:
+                    put_warning(f"Could not snapshot VM {vm_name}, it can only be reset by redeploying. Error: {response.text}")
             except requests.RequestException as e:
-                put_error(f"Failed to send shutdown command for VM {vm_name}. Error: {str(e)}")
-        else:
-            put_info(f"Start date {start_date} is today or in the past. Keeping VM {vm_name} running.")
+                put_warning(f"Could not snapshot VM {vm_name}, it can only be reset by redeploying. Error: {str(e)}")
+
+            # Step 9: Check if VM needs to be shut down
+            current_step += 1
+            put_info(f"Checking if VM needs to be shut down... ({current_step}/{total_steps})")
+
+            start_date = datetime.strptime(training_dates['start_date'], '%d-%m-%Y').date()
+            today = datetime.now().date()
+
+            if start_date <= today:
+                put_info(f"Start date {start_date} is today or in the past. Keeping VM {vm_name} running.")
+            else:
+                hibernated = False
+                if park_mode == "hibernate":
+                    put_info(f"Start date {start_date} is in the future. Attempting to hibernate VM {vm_name}...")
+                    try:
+                        response = requests.post(f"{API_BASE_URL}/v1/pve/hibernate-vm/{vm_name}")
+                        response.raise_for_status()
+                        hibernated = True
+                        put_success(f"Hibernate command sent for VM {vm_name}.")
+                    except requests.RequestException as e:
+                        put_warning(f"Failed to hibernate VM {vm_name}, shutting it down instead. Error: {str(e)}")
+                if not hibernated:
+                    put_info(f"Start date {start_date} is in the future. Attempting to shut down VM {vm_name}...")
+                    try:
+                        response = requests.post(f"{API_BASE_URL}/v1/pve/shutdown-vm/{vm_name}")
+                        response.raise_for_status()
+                        put_success(f"Shutdown command sent for VM {vm_name}.")
+                    except requests.RequestException as e:
+                        put_error(f"Failed to send shutdown command for VM {vm_name}. Error: {str(e)}")
             
-        # Step 10: Get VM MAC address
-        current_step += 1
-        put_info(f"Getting MAC address for VM {vm_name}... ({current_step}/{total_steps})")
-        try:
-            with put_loading():
-                response = requests.get(f"{API_BASE_URL}/v1/pve/get-vm-mac-address/{vm_name}")
-            if response.status_code == 200:
-                mac_address = response.json()['mac_address']
-                vm_details[vm_name]['mac_address'] = mac_address
-                put_success(f"MAC address for VM {vm_name}: {mac_address}")
+            # Step 10: Get VM MAC address
+            current_step += 1
+            put_info(f"Getting MAC address for VM {vm_name}... ({current_step}/{total_steps})")
+            if vm_details[vm_name].get('mac_address'):
+                put_success(f"MAC address for VM {vm_name}: {vm_details[vm_name]['mac_address']} (assigned at clone time)")
             else:
-                put_error(f"Failed to get MAC address for VM {vm_name}. Error: {response.text}")
-        except Exception as e:
-            put_error(f"An error occurred while getting MAC address: {str(e)}")
-        
-        time.sleep(10)
+                try:
+                    with put_loading():
+                        response = requests.get(f"{API_BASE_URL}/v1/pve/get-vm-mac-address/{vm_name}")
+                    if response.status_code == 200:
+                        mac_address = response.json()['mac_address']
+                        vm_details[vm_name]['mac_address'] = mac_address
+                        put_success(f"MAC address for VM {vm_name}: {mac_address}")
+                    else:
+                        put_error(f"Failed to get MAC address for VM {vm_name}. Error: {response.text}")
+                except Exception as e:
+                    put_error(f"An error occurred while getting MAC address: {str(e)}")
+            
+                time.sleep(10)
     
-        # Step 11: Create DHCP reservation
-        current_step += 1
-        put_info(f"Creating DHCP reservation for VM {vm_name}... ({current_step}/{total_steps})")
-        try:
-            with put_loading():
-                mac_address = vm_details[vm_name].get('mac_address')
-                if not mac_address:
-                    put_error(f"MAC address not found for VM {vm_name}")
-                    continue  # Skip to the next iteration of the loop
+            # Step 11: Create DHCP reservation
+            current_step += 1
+            put_info(f"Creating DHCP reservation for VM {vm_name}... ({current_step}/{total_steps})")
+            if assigned_ip:
+                put_success(f"DHCP reservation for VM {vm_name} was created before boot: {assigned_ip}")
+            else:
+                try:
+                    with put_loading():
+                        mac_address = vm_details[vm_name].get('mac_address')
+                        if not mac_address:
+                            put_error(f"MAC address not found for VM {vm_name}")
+                            continue  # Skip to the next iteration of the loop
 
-                seat_name = f"{seat['first_name'].lower()}.{seat['last_name'].lower()}"
-                ip_address = vm_details[vm_name]['ip']  # Use the IP address we got from Proxmox
-                
-                # Make a request to the new FastAPI endpoint to create DHCP reservation with known IP
-                response = requests.post(f"{API_BASE_URL}/v1/fortigate/add-dhcp-reservation-known-ip", 
-                    json={
-                        "mac": mac_address,
-                        "seat": seat_name,
-                        "ip": ip_address,
-                        "dhcp_server_id": dhcp_server_id
-                    }
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    assigned_ip = result["assigned_ip"]
-                    vm_details[vm_name]['dhcp_ip'] = assigned_ip
-                    put_success(f"DHCP reservation created for VM {vm_name}: {assigned_ip}")
-                else:
-                    error_detail = response.json().get("detail", "Unknown error")
-                    put_error(f"Failed to create DHCP reservation for VM {vm_name}. Error: {error_detail}")
-        except Exception as e:
-            put_error(f"An error occurred while creating DHCP reservation: {str(e)}")
-            logger.error(f"Error creating DHCP reservation for VM {vm_name}: {str(e)}")
-            logger.error(traceback.format_exc())
-
-        # Add a small delay to allow for DHCP reservation to propagate
-        time.sleep(2)
-
-        # Validate the DHCP reservation
-        try:
-            with put_loading():
-                validate_response = requests.get(f"{API_BASE_URL}/v1/fortigate/validate-dhcp/{seat_name}/{dhcp_server_id}")
+                        ip_address = vm_details[vm_name]['ip']  # Use the IP address we got from Proxmox
+                    
+                        # Make a request to the new FastAPI endpoint to create DHCP reservation with known IP
+                        response = requests.post(f"{API_BASE_URL}/v1/fortigate/add-dhcp-reservation-known-ip", 
+                            json={
+                                "mac": mac_address,
+                                "seat": seat_name,
+                                "ip": ip_address,
+                                "dhcp_server_id": dhcp_server_id
+                            }
+                        )
+                    
+                        if response.status_code == 200:
+                            result = response.json()
+                            assigned_ip = result["assigned_ip"]
+                            vm_details[vm_name]['dhcp_ip'] = assigned_ip
+                            put_success(f"DHCP reservation created for VM {vm_name}: {assigned_ip}")
+                        else:
+                            error_detail = response.json().get("detail", "Unknown error")
+                            put_error(f"Failed to create DHCP reservation for VM {vm_name}. Error: {error_detail}")
+                except Exception as e:
+                    put_error(f"An error occurred while creating DHCP reservation: {str(e)}")
+                    logger.error(f"Error creating DHCP reservation for VM {vm_name}: {str(e)}")
+                    logger.error(traceback.format_exc())
+
+            # Add a small delay to allow for DHCP reservation to propagate
+            time.sleep(2)
+
+            # Validate the DHCP reservation
+            try:
+                with put_loading():
+                    validate_response = requests.get(f"{API_BASE_URL}/v1/fortigate/validate-dhcp/{seat_name}/{dhcp_server_id}")
                 
-                if validate_response.status_code == 200:
-                    validated_ip = validate_response.json()["assigned_ip"]
-                    if validated_ip == assigned_ip:
-                        put_success(f"DHCP reservation for VM {vm_name} validated successfully: {validated_ip}")
+                    if validate_response.status_code == 200:
+                        validated_ip = validate_response.json()["assigned_ip"]
+                        if validated_ip == assigned_ip:
+                            put_success(f"DHCP reservation for VM {vm_name} validated successfully: {validated_ip}")
+                        else:
+                            put_warning(f"DHCP reservation for VM {vm_name} has a mismatch. Assigned: {assigned_ip}, Validated: {validated_ip}")
                     else:
-                        put_warning(f"DHCP reservation for VM {vm_name} has a mismatch. Assigned: {assigned_ip}, Validated: {validated_ip}")
-                else:
-                    put_warning(f"Failed to validate DHCP reservation for VM {vm_name}")
-        except Exception as e:
-            put_error(f"An error occurred while validating DHCP reservation: {str(e)}")
-            logger.error(f"Error validating DHCP reservation for VM {vm_name}: {str(e)}")
-            logger.error(traceback.format_exc())
+                        put_warning(f"Failed to validate DHCP reservation for VM {vm_name}")
+            except Exception as e:
+                put_error(f"An error occurred while validating DHCP reservation: {str(e)}")
+                logger.error(f"Error validating DHCP reservation for VM {vm_name}: {str(e)}")
+                logger.error(traceback.format_exc())
             
-        current_step += 1
+            current_step += 1
 
-        put_info(f"Creating or Updating Reverse Proxy Entry for {vm_name}... ({current_step}/{total_steps})")
-        try:
-            domain_name = f"proxmox-{seat['first_name'].lower()}-{seat['last_name'].lower()}.student-access.infinigate-labs.com"
-            proxy_host_data = {
-                "domain_names": [domain_name],
-                "forward_scheme": "https",
-                "forward_host": seat_ip_proxmox,
-                "forward_port": 8006,
-                "access_list_id": 0,
-                "certificate_id": 16,
-                "ssl_forced": 1,
-                "caching_enabled": 0,
-                "block_exploits": 1,
-                "advanced_config": "",
-                "allow_websocket_upgrade": 1,
-                "http2_support": 1,
-                "hsts_enabled": 0,
-                "hsts_subdomains": 0,
-                "enabled": 1,
-                "locations": [],
-                "meta": {}
-            }
+            put_info(f"Creating or Updating Reverse Proxy Entry for {vm_name}... ({current_step}/{total_steps})")
+            try:
+                domain_name = f"proxmox-{seat['first_name'].lower()}-{seat['last_name'].lower()}.student-access.infinigate-labs.com"
+                proxy_host_data = {
+                    "domain_names": [domain_name],
+                    "forward_scheme": "https",
+                    "forward_host": seat_ip_proxmox,
+                    "forward_port": 8006,
+                    "access_list_id": 0,
+                    "certificate_id": 16,
+                    "ssl_forced": 1,
+                    "caching_enabled": 0,
+                    "block_exploits": 1,
+                    "advanced_config": "",
+                    "allow_websocket_upgrade": 1,
+                    "http2_support": 1,
+                    "hsts_enabled": 0,
+                    "hsts_subdomains": 0,
+                    "enabled": 1,
+                    "locations": [],
+                    "meta": {}
+                }
+
+                # Check for existing proxy host
+                existing_proxy_hosts_response = requests.get(f"{API_BASE_URL}/v1/nginx/list-proxy-hosts")
+                if existing_proxy_hosts_response.status_code == 200:
+                    existing_proxy_hosts = existing_proxy_hosts_response.json().get("proxy_hosts", [])
+                    existing_proxy_host = next((host for host in existing_proxy_hosts if domain_name in host.get("domain_names", [])), None)
+
+                    if existing_proxy_host:
+                        put_warning(f"Existing proxy host found for {domain_name}. Removing...")
+                        proxy_host_id = existing_proxy_host['id']
+                        delete_response = requests.delete(f"{API_BASE_URL}/v1/nginx/proxy-hosts/{proxy_host_id}")
+                        if delete_response.status_code != 200:
+                            put_error(f"Failed to delete existing proxy host. Error: {delete_response.text}")
+                            raise Exception("Failed to delete existing proxy host")
+                        put_success(f"Existing proxy host removed for {domain_name}")
+
+                    # Create new proxy host
+                    with put_loading():
+                        create_response = requests.post(f"{API_BASE_URL}/v1/nginx/create-proxy-host", json=proxy_host_data)
+                    if create_response.status_code == 200:
+                        result = create_response.json()
+                        proxy_host_id = result.get("proxy_host_id")
+                        put_success(f"Reverse Proxy Entry created for {vm_name}. Proxy Host ID: {proxy_host_id}")
+                    else:
+                        put_error(f"Failed to create Reverse Proxy Entry for {vm_name}. Error: {create_response.text}")
+                        raise Exception("Failed to create new proxy host")
 
-            # Check for existing proxy host
-            existing_proxy_hosts_response = requests.get(f"{API_BASE_URL}/v1/nginx/list-proxy-hosts")
-            if existing_proxy_hosts_response.status_code == 200:
-                existing_proxy_hosts = existing_proxy_hosts_response.json().get("proxy_hosts", [])
-                existing_proxy_host = next((host for host in existing_proxy_hosts if domain_name in host.get("domain_names", [])), None)
-
-                if existing_proxy_host:
-                    put_warning(f"Existing proxy host found for {domain_name}. Removing...")
-                    proxy_host_id = existing_proxy_host['id']
-                    delete_response = requests.delete(f"{API_BASE_URL}/v1/nginx/proxy-hosts/{proxy_host_id}")
-                    if delete_response.status_code != 200:
-                        put_error(f"Failed to delete existing proxy host. Error: {delete_response.text}")
-                        raise Exception("Failed to delete existing proxy host")
-                    put_success(f"Existing proxy host removed for {domain_name}")
-
-                # Create new proxy host
-                with put_loading():
-                    create_response = requests.post(f"{API_BASE_URL}/v1/nginx/create-proxy-host", json=proxy_host_data)
-                if create_response.status_code == 200:
-                    result = create_response.json()
-                    proxy_host_id = result.get("proxy_host_id")
-                    put_success(f"Reverse Proxy Entry created for {vm_name}. Proxy Host ID: {proxy_host_id}")
+                    # Update the proxmox_uris dictionary with the new domain
+                    proxmox_uris[f"{seat['first_name'].lower()}.{seat['last_name'].lower()}"] = f"https://{domain_name}"
                 else:
-                    put_error(f"Failed to create Reverse Proxy Entry for {vm_name}. Error: {create_response.text}")
-                    raise Exception("Failed to create new proxy host")
-
-                # Update the proxmox_uris dictionary with the new domain
-                proxmox_uris[f"{seat['first_name'].lower()}.{seat['last_name'].lower()}"] = f"https://{domain_name}"
-            else:
-                put_error(f"Failed to retrieve existing proxy hosts. Status code: {existing_proxy_hosts_response.status_code}")
-                raise Exception("Failed to retrieve existing proxy hosts")
+                    put_error(f"Failed to retrieve existing proxy hosts. Status code: {existing_proxy_hosts_response.status_code}")
+                    raise Exception("Failed to retrieve existing proxy hosts")
 
-        except Exception as e:
-            put_error(f"An error occurred while creating/updating Reverse Proxy Entry: {str(e)}")
+            except Exception as e:
+                put_error(f"An error occurred while creating/updating Reverse Proxy Entry: {str(e)}")
 
-        time.sleep(2)
+            time.sleep(2)
         
-        # Still update the proxmox_uris dictionary with the standard format
-        domain_name = f"proxmox-{seat['first_name'].lower()}-{seat['last_name'].lower()}.student-access.infinigate-labs.com"
-        proxmox_uris[f"{seat['first_name'].lower()}.{seat['last_name'].lower()}"] = f"https://{domain_name}"
+            # Still update the proxmox_uris dictionary with the standard format
+            domain_name = f"proxmox-{seat['first_name'].lower()}-{seat['last_name'].lower()}.student-access.infinigate-labs.com"
+            proxmox_uris[f"{seat['first_name'].lower()}.{seat['last_name'].lower()}"] = f"https://{domain_name}"
+    finally:
+        requests.delete(f"{API_BASE_URL}/v1/pve/vmid-blocks/{ticket_number}")
+        # Seats that ended up without a VM give back their MAC, IP and DHCP reservation
+        for vm_name in seat_macs:
+            if vm_name not in vm_details:
+                try:
+                    requests.delete(f"{API_BASE_URL}/v1/pve/seat-addresses/{vm_name}")
+                except requests.RequestException as e:
+                    logger.error(f"Could not release the address of seat {vm_name}: {str(e)}")
 
     put_success("Training seats creation process completed!")
 
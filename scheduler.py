@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from pve import state_db
+import leader
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+HISTORY_DAYS = 30  # Job runs older than this are pruned at startup
+JOB_LEASE_TTL = 120  # Seconds a crashed run keeps its job blocked; the lease is renewed while the run is alive
+
+jobs = {}  # Format: {name: {'name': str, 'cron': str, 'fields': [set], 'func': callable, 'catch_up': bool, 'running': bool, ...}}
+loop_tasks = []
+run_tasks = set()  # Keeps references to running job tasks until they finish
+
+CRON_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]  # minute, hour, day of month, month, day of week (0 and 7 = Sunday)
+
+def parse_cron(expression):
+    """
+    Parse a five-field cron expression into the set of allowed values per field.
+    Supports '*', numbers, lists ('1,15'), ranges ('1-5') and steps ('*/10', '8-18/2').
+
+    Returns:
+        list: [minutes, hours, days, months, weekdays] as sets of ints
+    """
+    parts = expression.split()
+    if len(parts) != 5:
+        raise ValueError(f"Cron expression needs 5 fields: {expression}")
+
+    fields = []
+    for part, (low, high) in zip(parts, CRON_RANGES):
+        values = set()
+        for item in part.split(','):
+            item_range, _, step = item.partition('/')
+            if item_range == '*':
+                start, end = low, high
+            elif '-' in item_range:
+                start, end = (int(v) for v in item_range.split('-'))
+            else:
+                start = end = int(item_range)
+                if step:
+                    end = high
+            if not low <= start <= end <= high:
+                raise ValueError(f"Cron field '{part}' out of range {low}-{high}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        fields.append(values)
+    if 7 in fields[4]:
+        fields[4].discard(7)
+        fields[4].add(0)
+    return fields
+
+def next_cron_time(fields, after):
+    """Return the first minute strictly after 'after' that matches the parsed cron fields."""
+    minutes, hours, days, months, weekdays = fields
+    candidate = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = candidate + timedelta(days=366 * 4)
+    while candidate < limit:
+        if candidate.month not in months or candidate.day not in days or (candidate.weekday() + 1) % 7 not in weekdays:
+            candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+        elif candidate.hour not in hours:
+            candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+        elif candidate.minute not in minutes:
+            candidate += timedelta(minutes=1)
+        else:
+            return candidate
+    raise ValueError("Cron expression never matches")
+
+def _init_history():
+    with state_db() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS scheduler_jobs (
+                name TEXT PRIMARY KEY,
+                last_scheduled_for REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job TEXT NOT NULL,
+                trigger TEXT NOT NULL,
+                scheduled_for REAL,
+                started_at REAL NOT NULL,
+                duration REAL NOT NULL,
+                outcome TEXT NOT NULL,
+                error TEXT
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_job_runs ON job_runs (job, started_at)")
+        conn.execute("DELETE FROM job_runs WHERE started_at < ?", (time.time() - HISTORY_DAYS * 86400,))
+        return {row['name']: row['last_scheduled_for'] for row in conn.execute("SELECT * FROM scheduler_jobs")}
+
+def _mark_scheduled(name, scheduled_for):
+    with state_db() as conn:
+        conn.execute("INSERT OR REPLACE INTO scheduler_jobs (name, last_scheduled_for) VALUES (?, ?)",
+                     (name, scheduled_for.timestamp()))
+
+def _record_run(job, trigger, scheduled_for, started_at, duration, outcome, error=None):
+    with state_db() as conn:
+        conn.execute("""
+            INSERT INTO job_runs (job, trigger, scheduled_for, started_at, duration, outcome, error)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (job['name'], trigger, scheduled_for.timestamp() if scheduled_for else None, started_at, duration, outcome, error))
+    if scheduled_for is not None:
+        _mark_scheduled(job['name'], scheduled_for)
+
+def add_job(name, cron, func, catch_up=False, leader_only=True):
+    """
+    Register a job. Must be called before start().
+
+    Args:
+        name: Unique job name
+        cron: Five-field cron expression, evaluated in local time
+        func: Blocking callable, run in a worker thread
+        catch_up: Run once when a scheduled run was missed while no leader was up
+        leader_only: Run on the elected leader only, instead of in every worker
+    """
+    jobs[name] = {
+        'name': name,
+        'cron': cron,
+        'fields': parse_cron(cron),
+        'func': func,
+        'catch_up': catch_up,
+        'leader_only': leader_only,
+        'running': False,
+        'next_run_at': None,
+        'last_run': None
+    }
+
+async def _execute(job, trigger, scheduled_for=None):
+    if job['leader_only'] and trigger != 'manual' and not leader.is_leader():
+        return
+    if job['running']:
+        logger.warning(f"Job {job['name']} is still running, skipping {trigger} run")
+        await asyncio.to_thread(_record_run, job, trigger, scheduled_for, time.time(), 0, 'skipped', "previous run still active")
+        return
+    # The lease keeps a manual run in one worker from overlapping the leader's run in another
+    lease = f"job:{job['name']}"
+    if job['leader_only'] and not await asyncio.to_thread(leader.try_acquire_lease, lease, JOB_LEASE_TTL):
+        logger.warning(f"Job {job['name']} is running in another worker, skipping {trigger} run")
+        await asyncio.to_thread(_record_run, job, trigger, scheduled_for, time.time(), 0, 'skipped', "running in another worker")
+        return
+
+    job['running'] = True
+    started_at = time.time()
+    outcome, error = 'success', None
+    logger.info(f"Running job {job['name']} ({trigger})")
+    renewal = asyncio.create_task(_keep_lease(lease)) if job['leader_only'] else None
+    try:
+        await asyncio.to_thread(job['func'])
+    except Exception as e:
+        outcome, error = 'error', str(e)
+        logger.error(f"Job {job['name']} failed: {error}")
+    finally:
+        job['running'] = False
+        if renewal:
+            renewal.cancel()
+            await asyncio.to_thread(leader.release_lease, lease)
+
+    duration = round(time.time() - started_at, 3)
+    job['last_run'] = {'trigger': trigger, 'started_at': datetime.fromtimestamp(started_at).isoformat(),
+                       'duration': duration, 'outcome': outcome, 'error': error}
+    logger.info(f"Job {job['name']} finished in {duration:.1f}s: {outcome}")
+    try:
+        await asyncio.to_thread(_record_run, job, trigger, scheduled_for, started_at, duration, outcome, error)
+    except Exception as e:
+        logger.error(f"Could not record run of job {job['name']}: {str(e)}")
+
+async def _keep_lease(lease):
+    while True:
+        await asyncio.sleep(JOB_LEASE_TTL / 3)
+        try:
+            if not await asyncio.to_thread(leader.try_acquire_lease, lease, JOB_LEASE_TTL):
+                logger.warning(f"Lost lease {lease} while the job is still running")
+        except Exception as e:
+            logger.warning(f"Could not renew lease {lease}: {str(e)}")
+
+def _spawn(job, trigger, scheduled_for=None):
+    task = asyncio.create_task(_execute(job, trigger, scheduled_for))
+    run_tasks.add(task)
+    task.add_done_callback(run_tasks.discard)
+
+async def _job_loop(job):
+    scheduled_for = datetime.now()
+    while True:
+        scheduled_for = next_cron_time(job['fields'], scheduled_for)
+        job['next_run_at'] = scheduled_for
+        delay = (scheduled_for - datetime.now()).total_seconds()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        # Runs are not awaited, so a long run shows up as an overlap instead of silently delaying the next one
+        _spawn(job, 'cron', scheduled_for)
+
+async def catch_up():
+    """Run jobs once whose scheduled run was missed. Leader-only jobs are caught up by the leader only."""
+    last_scheduled = await asyncio.to_thread(_init_history)
+    now = datetime.now()
+    for job in jobs.values():
+        if job['leader_only'] and not leader.is_leader():
+            continue
+        last = last_scheduled.get(job['name'])
+        if last is None:
+            # First start with this job: nothing can have been missed yet
+            await asyncio.to_thread(_mark_scheduled, job['name'], now)
+        elif job['catch_up']:
+            missed = next_cron_time(job['fields'], datetime.fromtimestamp(last))
+            if missed < now:
+                logger.info(f"Job {job['name']} missed its run at {missed.isoformat()}, catching up")
+                _spawn(job, 'catch-up', missed)
+
+async def start():
+    """Catch up on missed runs and start the job loops on the running event loop."""
+    await catch_up()
+    # A worker that becomes leader later catches up on what the previous leader left undone
+    leader.on_acquire(catch_up)
+    for job in jobs.values():
+        loop_tasks.append(asyncio.create_task(_job_loop(job)))
+    logger.info(f"Scheduler started with {len(jobs)} jobs: {', '.join(jobs)}")
+
+async def stop():
+    for task in loop_tasks:
+        task.cancel()
+    await asyncio.gather(*loop_tasks, return_exceptions=True)
+    loop_tasks.clear()
+    logger.info("Scheduler stopped")
+
+async def trigger_job(name):
+    """
+    Run a job now, outside its schedule.
+
+    Returns:
+        dict: message, or error if the job is unknown or already running
+    """
+    job = jobs.get(name)
+    if job is None:
+        return {"error": f"Job {name} not found"}
+    if job['running']:
+        return {"error": f"Job {name} is already running"}
+    _spawn(job, 'manual')
+    return {"message": f"Job {name} started"}
+
+def list_jobs():
+    return [
+        {
+            'name': job['name'],
+            'cron': job['cron'],
+            'catch_up': job['catch_up'],
+            'leader_only': job['leader_only'],
+            'running': job['running'],
+            'next_run_at': job['next_run_at'].isoformat() if job['next_run_at'] else None,
+            'last_run': job['last_run']
+        }
+        for job in jobs.values()
+    ]
+
+def job_history(name=None, limit=50):
+    """Return the most recent runs, optionally of one job only."""
+    query = "SELECT * FROM job_runs"
+    args = []
+    if name:
+        query += " WHERE job = ?"
+        args.append(name)
+    with state_db() as conn:
+        rows = conn.execute(query + " ORDER BY started_at DESC LIMIT ?", args + [limit]).fetchall()
+    return [
+        {
+            'job': row['job'],
+            'trigger': row['trigger'],
+            'scheduled_for': datetime.fromtimestamp(row['scheduled_for']).isoformat() if row['scheduled_for'] else None,
+            'started_at': datetime.fromtimestamp(row['started_at']).isoformat(),
+            'duration': row['duration'],
+            'outcome': row['outcome'],
+            'error': row['error']
+        }
+        for row in rows
+    ]
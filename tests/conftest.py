@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+
+# pve authenticates and opens its state database on import, so the environment has to be set up first
+os.environ.setdefault('PVE_HOST', 'pve.invalid')
+os.environ.setdefault('PVE_TOKEN_ID', 'tests@pve!tests')
+os.environ.setdefault('PVE_TOKEN_SECRET', 'secret')
+os.environ['PVE_STATE_DB'] = os.path.join(tempfile.mkdtemp(prefix='demo-hub-tests-'), 'pve_state.db')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import pve  # Only after the environment above
+
+
+@pytest.fixture
+def cluster(monkeypatch):
+    """An empty cluster with no placement reservations, VMID blocks or timed-out clones."""
+    monkeypatch.setattr(pve, 'get_vm_inventory', lambda force_refresh=False: {})
+    monkeypatch.setattr(pve, 'cluster_vmids', set())
+    with pve.state_db() as conn:
+        for table in ('placement_reservations', 'vmid_blocks', 'pending_vmids', 'timed_out_clones'):
+            conn.execute(f"DELETE FROM {table}")
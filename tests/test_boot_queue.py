@@ -0,0 +1,53 @@
+from datetime import date
+
+import pytest
+
+import pve
+
+
+@pytest.fixture(autouse=True)
+def boots(monkeypatch):
+    started = []
+    def start(vm_name, vmid, node):
+        started.append(vm_name)
+        return {'upid': None, 'resumed': False}
+    monkeypatch.setattr(pve, '_start_vm_on_node', start)
+    monkeypatch.setattr(pve, '_vm_booted', lambda entry, started_at: True)
+    monkeypatch.setattr(pve, '_node_load', lambda node: (0.1, 0.0))
+    monkeypatch.setattr(pve, 'boot_poll_interval', 0.01)
+    monkeypatch.setattr(pve, 'boot_max_wait', 0.2)
+    return started
+
+
+def entry(vmid, node='pve1', start_date=date(2026, 10, 19)):
+    return {'vm_name': f"seat-{vmid}", 'vm_id': vmid, 'node': node, 'start_date': start_date}
+
+
+def test_all_seats_of_a_node_are_started(boots):
+    results = pve.start_vms_staggered([entry(1), entry(2), entry(3, node='pve2')])
+    assert sorted(seat['name'] for seat in results['started']) == ['seat-1', 'seat-2', 'seat-3']
+    assert results['failed'] == []
+
+
+def test_a_node_that_stays_busy_still_gets_its_seats_started(boots, monkeypatch):
+    monkeypatch.setattr(pve, '_node_load', lambda node: (1.0, 1.0))
+    results = pve.start_vms_staggered([entry(1), entry(2), entry(3)])
+    assert sorted(boots) == ['seat-1', 'seat-2', 'seat-3']
+    assert len(results['started']) == 3
+    assert pve.get_boot_state() == {}
+
+
+def test_busy_nodes_hold_back_boots_until_the_throttle_deadline(boots, monkeypatch):
+    monkeypatch.setattr(pve, '_node_load', lambda node: (1.0, 1.0))
+    monkeypatch.setattr(pve, 'boot_max_wait', 0.5)
+    monkeypatch.setattr(pve, '_vm_booted', lambda entry, started_at: False)
+    results = pve.start_vms_staggered([entry(1), entry(2)])
+    # One boot per throttle deadline, each counted as booted once it has had boot_max_wait
+    assert results['boot_seconds']['seat-1'] >= 0.5
+    assert len(results['started']) == 2
+
+
+def test_a_failing_node_queue_reports_its_seats_as_failed(boots):
+    results = pve.start_vms_staggered([entry(1), entry(2, start_date=None), entry(3, node='pve2')])
+    assert [seat['name'] for seat in results['started']] == ['seat-3']
+    assert sorted(seat['name'] for seat in results['failed']) == ['seat-1', 'seat-2']
@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+
+import pytest
+
+import pve
+
+UPID = 'UPID:pve1:0000A1B2:0000C3D4:00000000:qmclone:900:root@pam:'
+
+
+class FakeProxmox:
+    """Just enough of proxmoxer to start a clone task and look it up."""
+
+    def __init__(self):
+        self.clones = []
+        self.task = {'status': 'running', 'exitstatus': None}
+
+    def nodes(self, node):
+        return self
+
+    def qemu(self, vmid):
+        return self
+
+    def post(self, command, **params):
+        self.clones.append(params['newid'])
+        return UPID
+
+    def tasks(self, upid):
+        return SimpleNamespace(status=SimpleNamespace(get=lambda: self.task))
+
+
+@pytest.fixture(autouse=True)
+def clones(cluster, monkeypatch):
+    monkeypatch.setattr(pve, 'invalidate_vm_inventory', lambda: None)
+    monkeypatch.setattr(pve, 'record_vm_origin', lambda vmid, template_id: None)
+    monkeypatch.setattr(pve, '_clone_slot_keys', lambda node, template_id: [('node', node)])
+    monkeypatch.setattr(pve, 'proxmox', FakeProxmox())
+    with pve.clone_lock:
+        pve.clone_jobs.clear()
+    pve.allocate_vmid_block('ticket-1', 3)
+
+
+def run_clone(monkeypatch, task):
+    monkeypatch.setattr(pve, 'await_task', lambda upid, timeout=None: dict(task, upid=upid))
+    job, future = pve.submit_clone('seat-a', 900, 'pve1', owner='ticket-1')
+    return future.result()
+
+
+def used_ids():
+    return pve.list_vmid_blocks()[0]['used']
+
+
+def test_a_finished_clone_keeps_its_vmid(monkeypatch):
+    job = run_clone(monkeypatch, {'status': 'stopped', 'exitstatus': 'OK'})
+    assert job['status'] == 'done'
+    assert used_ids() == [job['vmid']]
+
+
+def test_a_failed_clone_returns_its_vmid(monkeypatch):
+    job = run_clone(monkeypatch, {'status': 'stopped', 'exitstatus': 'clone failed: disk error'})
+    assert job['status'] == 'failed'
+    assert used_ids() == []
+
+
+def test_a_timed_out_clone_keeps_its_vmid_reserved(monkeypatch):
+    job = run_clone(monkeypatch, {'status': 'running', 'exitstatus': None})
+    assert job['status'] == 'timeout'
+    assert used_ids() == [1000]
+
+
+def test_retrying_a_timed_out_clone_waits_for_the_running_task(monkeypatch):
+    run_clone(monkeypatch, {'status': 'running', 'exitstatus': None})
+    monkeypatch.setattr(pve, 'get_task', lambda upid: {'upid': upid, 'status': 'running', 'exitstatus': None})
+    job = run_clone(monkeypatch, {'status': 'stopped', 'exitstatus': 'OK'})
+    assert job['status'] == 'failed'
+    assert pve.proxmox.clones == [1000]
+
+
+def test_retrying_adopts_a_timed_out_clone_that_finished(monkeypatch):
+    run_clone(monkeypatch, {'status': 'running', 'exitstatus': None})
+    monkeypatch.setattr(pve, 'get_task', lambda upid: {'upid': upid, 'status': 'stopped', 'exitstatus': 'OK'})
+    job = run_clone(monkeypatch, {'status': 'stopped', 'exitstatus': 'OK'})
+    assert job['status'] == 'done'
+    assert job['vmid'] == 1000
+    assert pve.proxmox.clones == [1000]
+
+
+def test_retrying_after_a_timed_out_clone_failed_reuses_its_vmid(monkeypatch):
+    run_clone(monkeypatch, {'status': 'running', 'exitstatus': None})
+    monkeypatch.setattr(pve, 'get_task', lambda upid: {'upid': upid, 'status': 'stopped', 'exitstatus': 'clone failed'})
+    job = run_clone(monkeypatch, {'status': 'stopped', 'exitstatus': 'OK'})
+    assert job['status'] == 'done'
+    assert pve.proxmox.clones == [1000, 1000]
+
+
+def test_a_retry_on_another_worker_adopts_the_timed_out_clone(monkeypatch):
+    run_clone(monkeypatch, {'status': 'running', 'exitstatus': None})
+    # Another worker neither has the job nor tracks its task
+    with pve.clone_lock:
+        pve.clone_jobs.clear()
+    monkeypatch.setattr(pve, 'get_task', lambda upid: None)
+    pve.proxmox.task = {'status': 'stopped', 'exitstatus': 'OK'}
+    job = run_clone(monkeypatch, {'status': 'stopped', 'exitstatus': 'OK'})
+    assert job['status'] == 'done'
+    assert job['vmid'] == 1000
+    assert pve.proxmox.clones == [1000]
+
+
+def test_slots_are_taken_all_or_none(monkeypatch):
+    storage = pve.acquire_slot('clone:storage:tests', 1)
+    waits = []
+    def sleep(seconds):
+        # While the storage is busy the node slot must not be held
+        with pve.state_db() as conn:
+            waits.append(conn.execute("SELECT COUNT(*) FROM slot_leases WHERE slot = 'clone:node:tests'").fetchone()[0])
+        pve.release_slot(storage)
+    monkeypatch.setattr(pve.time, 'sleep', sleep)
+    leases = pve._acquire_clone_slots([('clone:node:tests', 2), ('clone:storage:tests', 1)])
+    assert waits == [0]
+    assert len(leases) == 2
+    for lease_id in leases:
+        pve.release_slot(lease_id)
@@ -0,0 +1,135 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import pve
+
+TODAY = date(2026, 10, 19)
+NOW = 1_000_000.0
+
+
+def vm(vmid, start, end=None, status='stopped', lock=None, name=None):
+    tags = f"start-{start:%d-%m-%Y}" + (f";end-{end:%d-%m-%Y}" if end else '')
+    return {'vmid': vmid, 'name': name or f"seat-{vmid}", 'node': 'pve1', 'status': status, 'tags': tags, 'lock': lock}
+
+
+def select(vms, until=TODAY, due_for_deletion=(), attempts=None, now=NOW):
+    return [entry['vm_name'] for entry in
+            pve._select_pending_starts(vms, TODAY, until, set(due_for_deletion), attempts or {}, now)]
+
+
+def attempt(vmid, status, attempts, last_attempt_at, start=TODAY):
+    return {(vmid, start.isoformat()): {'status': status, 'attempts': attempts, 'last_attempt_at': last_attempt_at}}
+
+
+def test_stopped_seats_of_todays_training_are_pending():
+    assert select([vm(1, TODAY, TODAY + timedelta(days=2))]) == ['seat-1']
+
+
+def test_running_seats_and_seats_without_start_tag_are_skipped():
+    untagged = dict(vm(2, TODAY), tags='')
+    assert select([vm(1, TODAY, status='running'), untagged]) == []
+
+
+def test_seats_of_trainings_that_started_earlier_are_skipped():
+    assert select([vm(1, TODAY - timedelta(days=1), TODAY + timedelta(days=2))]) == []
+
+
+def test_seats_past_their_end_date_are_skipped():
+    assert select([vm(1, TODAY - timedelta(days=5), TODAY - timedelta(days=1))]) == []
+
+
+def test_seats_due_for_deletion_are_skipped():
+    assert select([vm(1, TODAY)], due_for_deletion={'seat-1'}) == []
+
+
+def test_future_seats_are_included_up_to_until():
+    vms = [vm(1, TODAY + timedelta(days=1)), vm(2, TODAY + timedelta(days=3))]
+    assert select(vms) == []
+    assert select(vms, until=TODAY + timedelta(days=2)) == ['seat-1']
+
+
+def test_a_seat_is_started_once_per_start_date():
+    assert select([vm(1, TODAY)], attempts=attempt(1, 'started', 1, NOW - 3600)) == []
+    # An attempt for the VMID's earlier start date does not count
+    assert select([vm(1, TODAY)], attempts=attempt(1, 'started', 1, NOW, start=TODAY - timedelta(days=7))) == ['seat-1']
+
+
+def test_failed_starts_are_retried_with_doubling_backoff():
+    backoff = pve.jit_retry_backoff
+    assert select([vm(1, TODAY)], attempts=attempt(1, 'failed', 1, NOW - backoff + 1)) == []
+    assert select([vm(1, TODAY)], attempts=attempt(1, 'failed', 1, NOW - backoff)) == ['seat-1']
+    assert select([vm(1, TODAY)], attempts=attempt(1, 'failed', 2, NOW - backoff)) == []
+    assert select([vm(1, TODAY)], attempts=attempt(1, 'failed', 2, NOW - 2 * backoff)) == ['seat-1']
+
+
+def test_failed_starts_give_up_after_max_attempts():
+    attempts = attempt(1, 'failed', pve.jit_max_attempts, NOW - 86400)
+    assert select([vm(1, TODAY)], attempts=attempts) == []
+
+
+def test_hibernated_seats_are_flagged():
+    entries = pve._select_pending_starts([vm(1, TODAY, lock='suspended')], TODAY, TODAY, set(), {}, NOW)
+    assert entries[0]['hibernated'] is True
+
+
+@pytest.fixture
+def boot_model(monkeypatch):
+    monkeypatch.setattr(pve, 'get_vm_inventory', lambda force_refresh=False: {})
+    monkeypatch.setattr(pve, '_vm_template_id', lambda vmid, vm_config: 900)
+    monkeypatch.setattr(pve, 'get_boot_time_stats', lambda: {900: {'predicted_ready': 120}})
+    monkeypatch.setattr(pve, 'boot_initial_concurrency', 2)
+    monkeypatch.setattr(pve, 'start_margin', timedelta(minutes=15))
+    monkeypatch.setattr(pve, 'default_class_start', datetime.strptime('09:00', '%H:%M').time())
+
+
+def entry(vmid, node='pve1', hibernated=False, start_time=None):
+    return {'vm_name': f"seat-{vmid}", 'vm_id': vmid, 'node': node, 'start_date': TODAY,
+            'start_time': start_time, 'hibernated': hibernated}
+
+
+def start_times(plan):
+    return {e['vm_name']: e['start_at'].strftime('%H:%M') for e in plan}
+
+
+def test_seats_start_their_predicted_boot_time_and_margin_before_class(boot_model):
+    plan = pve.plan_jit_starts([entry(1)])
+    assert plan[0]['class_start'] == datetime(2026, 10, 19, 9, 0)
+    assert start_times(plan) == {'seat-1': '08:43'}
+
+
+def test_seats_beyond_the_boot_concurrency_start_a_wave_earlier(boot_model):
+    plan = pve.plan_jit_starts([entry(1), entry(2), entry(3), entry(4, node='pve2')])
+    assert start_times(plan) == {'seat-1': '08:43', 'seat-2': '08:43', 'seat-3': '08:41', 'seat-4': '08:43'}
+    assert plan[0]['vm_name'] == 'seat-3'
+
+
+def test_hibernated_seats_only_need_their_resume_time(boot_model, monkeypatch):
+    monkeypatch.setattr(pve, 'resume_seconds', 60)
+    plan = pve.plan_jit_starts([entry(1, hibernated=True), entry(2), entry(3), entry(4)])
+    assert start_times(plan) == {'seat-1': '08:44', 'seat-2': '08:43', 'seat-3': '08:43', 'seat-4': '08:41'}
+
+
+def test_class_start_tags_move_the_start(boot_model):
+    plan = pve.plan_jit_starts([entry(1, start_time=datetime.strptime('13:30', '%H:%M').time())])
+    assert start_times(plan) == {'seat-1': '13:13'}
+
+
+def test_templates_without_samples_use_the_default_boot_time(boot_model, monkeypatch):
+    monkeypatch.setattr(pve, 'get_boot_time_stats', lambda: {})
+    monkeypatch.setattr(pve, 'default_boot_seconds', 300)
+    assert start_times(pve.plan_jit_starts([entry(1)])) == {'seat-1': '08:40'}
+
+
+def test_recorded_starts_are_not_pending_again(monkeypatch):
+    today = date.today()
+    inventory = {1: vm(1, today), 2: vm(2, today), 3: vm(3, today)}
+    monkeypatch.setattr(pve, 'get_vm_inventory', lambda force_refresh=False: inventory)
+    monkeypatch.setattr(pve, 'get_deletion_schedule', lambda due_by=None, node=None: {'seat-3': {}})
+    with pve.state_db() as conn:
+        conn.execute("DELETE FROM jit_starts")
+    entries = pve._pending_start_entries(today)
+    assert [e['vm_name'] for e in entries] == ['seat-1', 'seat-2']
+
+    pve._record_jit_starts(entries, {'started': [{'id': 1}], 'failed': [{'id': 2, 'error': 'locked'}]})
+    assert pve._pending_start_entries(today) == []
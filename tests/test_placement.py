@@ -0,0 +1,108 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import pve
+
+GB = 1024**3
+START = date.today() + timedelta(days=7)
+END = START + timedelta(days=4)
+
+
+@pytest.fixture(autouse=True)
+def storage(cluster, monkeypatch):
+    monkeypatch.setattr(pve, 'get_storage_model', lambda force_refresh=False: {})
+    monkeypatch.setattr(pve, 'storage_fits', lambda node, storages, new_clones, days, model=None: (True, {}, None))
+
+
+def forecast(committed_gb, total_gb, days=30):
+    return {
+        'nodes': [f"pve{i + 1}" for i in range(len(committed_gb))],
+        'start_date': date.today(),
+        'committed': np.array([[gb * GB] * days for gb in committed_gb], dtype=float),
+        'total_memory': np.array([gb * GB for gb in total_gb], dtype=float)
+    }
+
+
+def place(vm_names, matrix, seat_gb=10, storages=None):
+    templates = {row: {'vmid': 900 + row} for row in range(len(matrix['nodes']))}
+    seat_memory = {row: seat_gb * GB for row in templates}
+    seat_storages = {row: (storages or {}).get(row, {'local-lvm'}) for row in templates}
+    first = (START - matrix['start_date']).days
+    last = (END - matrix['start_date']).days + 1
+    return pve._place_seats_locked(vm_names, matrix, templates, seat_memory, seat_storages, 30,
+                                   first, last, START, END)
+
+
+def nodes_of(result):
+    return [assignment['node'] for assignment in result['assignments']]
+
+
+def test_seats_go_to_the_node_with_the_lowest_projected_peak():
+    result = place(['seat-a'], forecast([60, 20], [100, 100]))
+    assert nodes_of(result) == ['pve2']
+    assert result['assignments'][0]['peak_load_ratio'] == pytest.approx(0.3)
+
+
+def test_seats_of_one_batch_spread_as_the_chosen_node_fills_up():
+    result = place([f"seat-{i}" for i in range(6)], forecast([40, 20], [100, 100]))
+    assert nodes_of(result) == ['pve2', 'pve2', 'pve1', 'pve2', 'pve1', 'pve2']
+    assert result['nodes']['pve1']['peak_load_ratio_after'] == pytest.approx(0.6)
+    assert result['nodes']['pve2']['peak_load_ratio_after'] == pytest.approx(0.6)
+
+
+def test_load_is_compared_relative_to_node_memory():
+    result = place(['seat-a'], forecast([50, 30], [200, 100]))
+    assert nodes_of(result) == ['pve1']
+
+
+def test_nodes_without_storage_room_are_skipped(monkeypatch):
+    monkeypatch.setattr(pve, 'storage_fits',
+                        lambda node, storages, new_clones, days, model=None: (node != 'pve2', {}, 'thin pool full'))
+    result = place(['seat-a'], forecast([60, 20], [100, 100]))
+    assert nodes_of(result) == ['pve1']
+
+
+def test_seats_without_any_node_are_unplaced(monkeypatch):
+    monkeypatch.setattr(pve, 'storage_fits', lambda node, storages, new_clones, days, model=None: (False, {}, 'full'))
+    result = place(['seat-a', 'seat-b'], forecast([60, 20], [100, 100]))
+    assert result['assignments'] == []
+    assert result['unplaced'] == ['seat-a', 'seat-b']
+
+
+def test_storage_checks_count_the_clones_already_placed_in_the_batch(monkeypatch):
+    calls = []
+    def fits(node, storages, new_clones, days, model=None):
+        calls.append((node, new_clones))
+        return True, {}, None
+    monkeypatch.setattr(pve, 'storage_fits', fits)
+    place(['seat-a', 'seat-b'], forecast([0, 50], [100, 100]))
+    assert calls == [('pve1', 1), ('pve2', 1), ('pve1', 2), ('pve2', 1)]
+
+
+def test_placements_reserve_their_memory():
+    place(['seat-a'], forecast([60, 20], [100, 100]))
+    reservations = pve.get_placement_reservations()
+    assert reservations['seat-a']['node'] == 'pve2'
+    assert reservations['seat-a']['memory'] == 10 * GB
+
+
+def test_claims_of_other_deployments_count_against_a_node():
+    pve.reserve_placement('other-seat', 'pve2', 50 * GB, START, END)
+    result = place(['seat-a'], forecast([60, 20], [100, 100]))
+    assert nodes_of(result) == ['pve1']
+
+
+def test_earlier_claims_of_the_same_seats_are_replaced():
+    pve.reserve_placement('seat-a', 'pve2', 50 * GB, START, END)
+    result = place(['seat-a'], forecast([60, 20], [100, 100]))
+    assert nodes_of(result) == ['pve2']
+    assert pve.get_placement_reservations()['seat-a']['memory'] == 10 * GB
+
+
+def test_reservations_move_with_a_claimed_spare():
+    pve.reserve_placement('seat-a', 'pve1', 10 * GB, START, END)
+    assert pve.move_placement_reservation('seat-a', 'pve2')
+    assert pve.get_placement_reservations()['seat-a']['node'] == 'pve2'
+    assert not pve.move_placement_reservation('seat-a', 'pve2')
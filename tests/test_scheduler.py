@@ -0,0 +1,84 @@
+from datetime import datetime
+
+import pytest
+
+from scheduler import parse_cron, next_cron_time
+
+
+def test_wildcards_cover_the_whole_range():
+    minutes, hours, days, months, weekdays = parse_cron('* * * * *')
+    assert minutes == set(range(60))
+    assert hours == set(range(24))
+    assert days == set(range(1, 32))
+    assert months == set(range(1, 13))
+    assert weekdays == set(range(7))
+
+
+def test_lists_ranges_and_steps():
+    minutes, hours, days, months, weekdays = parse_cron('*/15 8-18/2 1,15 6-8 1-5')
+    assert minutes == {0, 15, 30, 45}
+    assert hours == {8, 10, 12, 14, 16, 18}
+    assert days == {1, 15}
+    assert months == {6, 7, 8}
+    assert weekdays == {1, 2, 3, 4, 5}
+
+
+def test_a_start_with_a_step_runs_to_the_end_of_the_range():
+    assert parse_cron('5/20 * * * *')[0] == {5, 25, 45}
+
+
+@pytest.mark.parametrize('weekday', ['0', '7'])
+def test_zero_and_seven_are_both_sunday(weekday):
+    assert parse_cron(f"0 3 * * {weekday}")[4] == {0}
+
+
+def test_weekday_ranges_may_end_on_seven():
+    assert parse_cron('0 3 * * 5-7')[4] == {0, 5, 6}
+
+
+@pytest.mark.parametrize('expression', [
+    '* * * *',
+    '* * * * * *',
+    '60 * * * *',
+    '* 24 * * *',
+    '* * 0 * *',
+    '* * * 13 *',
+    '* * * * 8',
+    '* * * * 5-2',
+    '* * * * mon',
+])
+def test_invalid_expressions_are_rejected(expression):
+    with pytest.raises(ValueError):
+        parse_cron(expression)
+
+
+def test_next_time_is_strictly_after():
+    fields = parse_cron('*/5 * * * *')
+    assert next_cron_time(fields, datetime(2026, 10, 17, 10, 0)) == datetime(2026, 10, 17, 10, 5)
+    assert next_cron_time(fields, datetime(2026, 10, 17, 10, 3, 59)) == datetime(2026, 10, 17, 10, 5)
+
+
+def test_next_time_rolls_over_to_the_next_day():
+    fields = parse_cron('0 3 * * *')
+    assert next_cron_time(fields, datetime(2026, 10, 17, 3, 0)) == datetime(2026, 10, 18, 3, 0)
+
+
+def test_next_time_on_sunday_written_as_seven():
+    # 17-10-2026 is a Saturday
+    fields = parse_cron('30 2 * * 7')
+    assert next_cron_time(fields, datetime(2026, 10, 17, 12, 0)) == datetime(2026, 10, 18, 2, 30)
+
+
+def test_next_time_on_weekdays_skips_the_weekend():
+    fields = parse_cron('0 9 * * 1-5')
+    assert next_cron_time(fields, datetime(2026, 10, 16, 9, 0)) == datetime(2026, 10, 19, 9, 0)
+
+
+def test_next_time_across_months():
+    fields = parse_cron('0 0 31 * *')
+    assert next_cron_time(fields, datetime(2026, 10, 31, 0, 0)) == datetime(2026, 12, 31, 0, 0)
+
+
+def test_expressions_that_never_match_are_rejected():
+    with pytest.raises(ValueError):
+        next_cron_time(parse_cron('0 0 31 2 *'), datetime(2026, 10, 17))
@@ -0,0 +1,36 @@
+import time
+
+import pytest
+
+import pve
+
+
+def seat(uptime=100, status='running', node='pve1'):
+    return {'vmid': 1000, 'name': 'seat-1', 'node': node, 'status': status, 'uptime': uptime}
+
+
+@pytest.fixture(autouse=True)
+def cached(monkeypatch):
+    monkeypatch.setattr(pve, 'get_seat_address', lambda vm_name: None)
+    monkeypatch.setattr(pve, 'lookup_vm', lambda vm_name: seat())
+    with pve.seat_ip_lock:
+        pve.seat_ip_cache[1000] = {'ip_address': '100.64.0.10', 'node': 'pve1', 'vmid': 1000, 'source': 'agent',
+                                   'booted_at': time.time() - 100}
+    yield
+    pve.invalidate_seat_ip(1000)
+
+
+def test_the_cached_ip_is_returned_without_waiting():
+    assert pve.find_seat_ip_pve('seat-1')['ip_address'] == '100.64.0.10'
+
+
+def test_a_reboot_drops_the_cached_ip():
+    assert pve._cached_seat_ip(seat(uptime=5)) is None
+    assert 1000 not in pve.seat_ip_cache
+
+
+def test_a_stale_entry_takes_the_boot_time_of_the_inventory():
+    with pve.seat_ip_lock:
+        pve.seat_ip_cache[1000]['booted_at'] = None
+    assert pve._cached_seat_ip(seat())['ip_address'] == '100.64.0.10'
+    assert pve.seat_ip_cache[1000]['booted_at'] is not None
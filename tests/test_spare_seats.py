@@ -0,0 +1,45 @@
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+import pve
+
+
+@pytest.fixture(autouse=True)
+def pool(monkeypatch):
+    monkeypatch.setattr(pve, 'get_spare_pool_targets', lambda: {})
+    monkeypatch.setattr(pve, '_reconcile_spares', lambda: None)
+    with pve.state_db() as conn:
+        conn.execute("DELETE FROM spare_seats")
+        conn.execute("INSERT INTO spare_seats (name, template_id, node, vmid, status, created_at) "
+                     "VALUES ('spare-900-a', 900, 'pve1', 1000, 'ready', 0)")
+
+
+def spare_status():
+    with pve.state_db() as conn:
+        return [row['status'] for row in conn.execute("SELECT status FROM spare_seats")]
+
+
+def test_booted_spares_commit_memory_until_claimed():
+    assert pve._forecast_interval({'status': 'running'}, 'spare') == (date.today(), None)
+    assert pve._forecast_interval({'status': 'stopped'}, 'spare') == (None, None)
+
+
+def test_a_spare_that_cannot_be_renamed_is_removed_by_the_next_refill(monkeypatch):
+    def rename(**params):
+        raise RuntimeError('config locked')
+    qemu = SimpleNamespace(config=SimpleNamespace(put=rename))
+    monkeypatch.setattr(pve, 'proxmox', SimpleNamespace(nodes=lambda node: SimpleNamespace(qemu=lambda vmid: qemu)))
+    monkeypatch.setattr(pve, 'lookup_vm', lambda name: {'vmid': 1000, 'name': name, 'node': 'pve1', 'status': 'running'})
+    assert pve.claim_spare_seat('seat-1', {'pve1': 900}, 'pve1') is None
+    assert spare_status() == ['failed']
+
+    removed = []
+    def remove(vm):
+        removed.append(vm.name)
+        return f"VM '{vm.name}' has been stopped and removed"
+    monkeypatch.setattr(pve, 'remove_vm', remove)
+    assert pve.refill_spare_pools() == {'submitted': 0, 'removed': 1}
+    assert removed == ['spare-900-a']
+    assert spare_status() == []
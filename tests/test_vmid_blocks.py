@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import pytest
+
+import pve
+
+
+@pytest.fixture(autouse=True)
+def vmid_range(cluster, monkeypatch):
+    monkeypatch.setattr(pve, 'vmid_range_start', 1000)
+    monkeypatch.setattr(pve, 'vmid_range_end', 1099)
+
+
+def test_blocks_do_not_overlap_each_other_or_existing_vms(monkeypatch):
+    monkeypatch.setattr(pve, 'cluster_vmids', {1002})
+    first = pve.allocate_vmid_block('ticket-1', 2)
+    second = pve.allocate_vmid_block('ticket-2', 3)
+    assert (first['start'], first['end']) == (1000, 1001)
+    assert (second['start'], second['end']) == (1003, 1005)
+
+
+def test_an_owner_gets_its_existing_block_back():
+    first = pve.allocate_vmid_block('ticket-1', 2)
+    assert pve.allocate_vmid_block('ticket-1', 5) == first
+
+
+def test_no_block_when_the_range_is_exhausted(monkeypatch):
+    monkeypatch.setattr(pve, 'vmid_range_end', 1004)
+    assert 'error' in pve.allocate_vmid_block('ticket-1', 6)
+
+
+def test_ids_are_taken_in_order_until_the_block_is_exhausted():
+    pve.allocate_vmid_block('ticket-1', 3)
+    assert [pve.take_vmid('ticket-1') for _ in range(4)] == [1000, 1001, 1002, None]
+
+
+def test_taking_skips_ids_that_appeared_in_the_cluster(monkeypatch):
+    pve.allocate_vmid_block('ticket-1', 3)
+    monkeypatch.setattr(pve, 'cluster_vmids', {1000})
+    assert pve.take_vmid('ticket-1') == 1001
+
+
+def test_unknown_owner_has_no_ids():
+    assert pve.take_vmid('ticket-1') is None
+
+
+def test_returned_ids_are_handed_out_again():
+    pve.allocate_vmid_block('ticket-1', 3)
+    taken = [pve.take_vmid('ticket-1') for _ in range(3)]
+    pve.return_vmid('ticket-1', taken[1])
+    assert pve.take_vmid('ticket-1') == taken[1]
+    assert pve.take_vmid('ticket-1') is None
+
+
+def test_releasing_a_block_reports_used_and_free_ids():
+    pve.allocate_vmid_block('ticket-1', 3)
+    pve.take_vmid('ticket-1')
+    released = pve.release_vmid_block('ticket-1')
+    assert released['used'] == [1000]
+    assert released['free'] == [1001, 1002]
+    assert pve.list_vmid_blocks() == []
+    assert pve.release_vmid_block('ticket-1') is None
+
+
+def test_blocks_expire(monkeypatch):
+    pve.allocate_vmid_block('ticket-1', 3)
+    monkeypatch.setattr(pve, 'vmid_block_ttl', -1)
+    assert pve.take_vmid('ticket-1') is None
+    assert pve.allocate_vmid_block('ticket-2', 1)['start'] == 1000
+
+
+def test_single_ids_skip_blocks_and_earlier_single_ids(monkeypatch):
+    monkeypatch.setattr(pve, 'proxmox', SimpleNamespace(cluster=SimpleNamespace(nextid=SimpleNamespace(get=lambda: '1000'))))
+    pve.allocate_vmid_block('ticket-1', 2)
+    assert pve.allocate_vmid() == 1002
+    assert pve.allocate_vmid() == 1003
+    assert pve.allocate_vmid_block('ticket-2', 1)['start'] == 1004